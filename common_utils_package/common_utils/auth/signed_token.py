@@ -0,0 +1,389 @@
+"""
+Self-contained signed access tokens.
+
+A signed token is a compact HS256 JWT carrying the user id, tenant id and a
+reference to the user's permission set. Services holding SIGNED_TOKEN_SECRET
+can verify it locally: the signature and expiry are checked in-process, the
+permission set is resolved from a process-local cache (Redis is only consulted
+the first time a reference is seen) and revocations are checked against an
+in-memory filter that a background thread refreshes from Redis.
+
+The token also carries the user's permission versions at issue time
+(`perm_version:user:<id>` / `perm_version:global`). When an admin changes
+roles or permissions the version moves, the token no longer matches the
+locally cached version and verification falls back to introspection, which
+rebuilds the permission set.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import secrets
+import threading
+
+import jwt
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SIGNED_TOKEN_SECRET = os.getenv("SIGNED_TOKEN_SECRET", "").strip()
+SIGNED_TOKEN_ALGORITHM = "HS256"
+# How often the revocation filter is refreshed from Redis
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+# Older than this since the last successful refresh, the filter is not trusted
+# and signed tokens are validated through introspection instead
+REVOCATION_MAX_STALENESS_SECONDS = float(os.getenv("REVOCATION_MAX_STALENESS_SECONDS", "60"))
+
+PERMISSION_SET_PREFIX = "perm_set:"
+REVOKED_JTI_KEY = "revoked_jti"
+REVOKED_JTI_VERSION_KEY = "revoked_jti:version"
+
+
+def _redis_client():
+    """Shared Redis client, or None when Redis is not in use"""
+    from .token_validation import RedisTokenManager, USE_REDIS
+
+    manager = RedisTokenManager()
+    if USE_REDIS and manager.is_available():
+        return manager.client
+    return None
+
+
+def signed_tokens_enabled():
+    return bool(SIGNED_TOKEN_SECRET)
+
+
+def is_signed_token(token):
+    """Signed tokens are JWTs (three dot-separated parts); opaque tokens are hex"""
+    return isinstance(token, str) and token.count(".") == 2
+
+
+def permission_set_ref(roles, permissions):
+    """Content hash of a permission set, so identical sets share one reference"""
+    canonical = json.dumps({"roles": roles, "permissions": permissions}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+class PermissionSetCache:
+    """Process-local cache of permission sets keyed by their reference"""
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(PermissionSetCache, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.cache = TTLCache(maxsize=10000, ttl=24 * 3600)
+        self.lock = threading.Lock()
+        self.__initialized = True
+
+    def put(self, ref, roles, permissions, ttl):
+        document = {"roles": roles, "permissions": permissions}
+        with self.lock:
+            self.cache[ref] = document
+
+        client = _redis_client()
+        if client is not None:
+            try:
+                # Keep the shared copy alive for at least as long as the token
+                key = f"{PERMISSION_SET_PREFIX}{ref}"
+                pipe = client.pipeline()
+                pipe.set(key, json.dumps(document), nx=True)
+                pipe.expire(key, int(ttl), gt=True)
+                pipe.expire(key, int(ttl), nx=True)
+                pipe.execute()
+            except Exception as e:
+                logging.error(f"Error storing permission set in Redis: {str(e)}")
+
+    def get(self, ref):
+        with self.lock:
+            document = self.cache.get(ref)
+        if document is not None:
+            return document
+
+        client = _redis_client()
+        if client is None:
+            return None
+        try:
+            raw = client.get(f"{PERMISSION_SET_PREFIX}{ref}")
+        except Exception as e:
+            logging.error(f"Error loading permission set from Redis: {str(e)}")
+            return None
+        if not raw:
+            return None
+
+        document = json.loads(raw)
+        with self.lock:
+            self.cache[ref] = document
+        return document
+
+
+class PermissionVersionCache:
+    """
+    Process-local copy of the permission versions of the users whose signed
+    tokens this process verified recently. A user is loaded from Redis the
+    first time they are seen; after that the revocation filter's refresher
+    reloads every tracked user with one MGET.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(PermissionVersionCache, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.user_versions = TTLCache(maxsize=10000, ttl=3600)
+        self.global_version = None
+        self.lock = threading.Lock()
+        self.__initialized = True
+
+    def get(self, user_id):
+        """[user version, global version], or None when it cannot be read"""
+        from .token_validation import Oauth2AsAccessor, USE_REDIS
+
+        if not USE_REDIS:
+            # Versions only live in this process
+            return Oauth2AsAccessor().get_permission_versions(user_id)
+
+        key = str(user_id)
+        with self.lock:
+            user_version = self.user_versions.get(key)
+            global_version = self.global_version
+        if user_version is not None and global_version is not None:
+            return [user_version, global_version]
+
+        from .token_validation import RedisTokenManager
+
+        versions = RedisTokenManager().get_permission_versions(user_id)
+        if versions is None:
+            return None
+        with self.lock:
+            self.user_versions[key] = versions[0]
+            self.global_version = versions[1]
+        return versions
+
+    def forget(self, user_id=None):
+        """Drop cached versions after a local bump: one user, or everyone"""
+        with self.lock:
+            if user_id is None:
+                self.user_versions.clear()
+                self.global_version = None
+            else:
+                self.user_versions.pop(str(user_id), None)
+
+    def refresh(self, client):
+        from .token_validation import RedisTokenManager
+
+        manager = RedisTokenManager()
+        with self.lock:
+            user_ids = list(self.user_versions)
+        keys = [f"{manager.permission_version_prefix}user:{user_id}" for user_id in user_ids]
+        values = client.mget(keys + [manager.global_permission_version_key])
+        with self.lock:
+            for user_id, value in zip(user_ids, values):
+                if user_id in self.user_versions:
+                    self.user_versions[user_id] = int(value or 0)
+            self.global_version = int(values[-1] or 0)
+
+
+class RevocationFilter:
+    """
+    In-memory set of revoked token ids, kept in sync with Redis.
+
+    Revocations are stored in the `revoked_jti` sorted set (scored by token
+    expiry) and every change bumps `revoked_jti:version`. The refresher thread
+    polls the version and only reloads the set when it moved, so the request
+    path never touches Redis after `start()`, which loads the set once
+    synchronously. Until a load succeeded, or when the last one is older than
+    REVOCATION_MAX_STALENESS_SECONDS, `is_current()` is False. Each refresh
+    also reloads the PermissionVersionCache.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(RevocationFilter, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.revoked = frozenset()
+        # Revocations made by this process, applied before the next refresh
+        self.local = {}
+        self.version = None
+        self.refreshed_at = None  # monotonic time of the last successful refresh
+        self.lock = threading.Lock()
+        self.refresher = None
+        self.__initialized = True
+
+    def start(self):
+        with self.lock:
+            if self.refresher is not None:
+                return
+            self.refresher = threading.Thread(
+                target=self._refresh_forever, name="revocation-filter", daemon=True
+            )
+        # Load before the first verification rather than trusting an empty set
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Error loading token revocation filter: {str(e)}")
+        self.refresher.start()
+
+    def is_current(self):
+        refreshed_at = self.refreshed_at
+        return refreshed_at is not None and time.monotonic() - refreshed_at <= REVOCATION_MAX_STALENESS_SECONDS
+
+    def _refresh_forever(self):
+        while True:
+            time.sleep(REVOCATION_REFRESH_SECONDS)
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing token revocation filter: {str(e)}")
+
+    def refresh(self):
+        from .token_validation import USE_REDIS
+
+        if not USE_REDIS:
+            # Nothing shared to load: only this process's own revocations apply
+            self.refreshed_at = time.monotonic()
+            return
+        client = _redis_client()
+        if client is None:
+            raise ConnectionError("Redis is not available")
+
+        PermissionVersionCache().refresh(client)
+        version = client.get(REVOKED_JTI_VERSION_KEY)
+        if self.refreshed_at is not None and version == self.version:
+            self.refreshed_at = time.monotonic()
+            return
+
+        now = int(time.time())
+        pipe = client.pipeline()
+        pipe.zremrangebyscore(REVOKED_JTI_KEY, "-inf", now)
+        pipe.zrange(REVOKED_JTI_KEY, 0, -1)
+        _, members = pipe.execute()
+
+        with self.lock:
+            self.revoked = frozenset(members)
+            self.local = {jti: exp for jti, exp in self.local.items() if exp > now}
+            self.version = version
+            self.refreshed_at = time.monotonic()
+        logging.info(f"Token revocation filter refreshed: {len(members)} revoked token(s)")
+
+    def is_revoked(self, jti):
+        return jti in self.revoked or jti in self.local
+
+    def revoke(self, revocations):
+        """Revoke {jti: exp} locally and publish the revocations to Redis"""
+        if not revocations:
+            return
+        with self.lock:
+            self.local.update({jti: int(exp) for jti, exp in revocations.items()})
+
+        client = _redis_client()
+        if client is None:
+            return
+        try:
+            publish_revocations(client, revocations)
+        except Exception as e:
+            logging.error(f"Error publishing token revocation to Redis: {str(e)}")
+
+
+def publish_revocations(client, revocations):
+    """Record {jti: exp} revocations in Redis for every verifier to pick up"""
+    if not revocations:
+        return
+    pipe = client.pipeline()
+    pipe.zadd(REVOKED_JTI_KEY, {jti: int(exp) for jti, exp in revocations.items()})
+    pipe.incr(REVOKED_JTI_VERSION_KEY)
+    pipe.execute()
+
+
+def issue_signed_token(user_id, tenant_id, roles, permissions, ttl, perm_version=None):
+    """
+    Issue a signed access token.
+
+    `perm_version` is the user's [user, global] permission version the
+    roles and permissions were read at. Returns (token, claims). The
+    permission set is published under its reference so other services can
+    resolve it.
+    """
+    if not signed_tokens_enabled():
+        raise RuntimeError("SIGNED_TOKEN_SECRET is not configured")
+
+    current_time = int(time.time())
+    ref = permission_set_ref(roles, permissions)
+    PermissionSetCache().put(ref, roles, permissions, ttl)
+
+    claims = {
+        "sub": str(user_id),
+        "tid": str(tenant_id) if tenant_id is not None else "",
+        "psr": ref,
+        "pv": list(perm_version) if perm_version is not None else None,
+        "iat": current_time,
+        "exp": current_time + int(ttl),
+        "jti": secrets.token_hex(8),
+    }
+    token = jwt.encode(claims, SIGNED_TOKEN_SECRET, algorithm=SIGNED_TOKEN_ALGORITHM)
+    return token, claims
+
+
+def verify_signed_token(token):
+    """
+    Verify a signed token locally.
+
+    Returns the token data in the same shape introspection returns, or None
+    when the permission set cannot be resolved locally, the user's
+    permissions changed since the token was issued or the revocation filter
+    is not current (the caller should fall back to regular validation).
+    Raises jwt.InvalidTokenError for bad, expired or revoked
+    tokens.
+    """
+    claims = jwt.decode(
+        token,
+        SIGNED_TOKEN_SECRET,
+        algorithms=[SIGNED_TOKEN_ALGORITHM],
+        options={"require": ["exp", "sub", "psr", "jti"]},
+    )
+
+    revocation_filter = RevocationFilter()
+    revocation_filter.start()
+    if revocation_filter.is_revoked(claims["jti"]):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    if not revocation_filter.is_current():
+        return None
+
+    perm_version = claims.get("pv")
+    if perm_version is None or perm_version != PermissionVersionCache().get(claims["sub"]):
+        return None
+
+    permission_set = PermissionSetCache().get(claims["psr"])
+    if permission_set is None:
+        return None
+
+    return {
+        "user_id": int(claims["sub"]) if claims["sub"].isdigit() else claims["sub"],
+        "tenant_id": int(claims["tid"]) if claims["tid"].isdigit() else claims["tid"],
+        "roles": permission_set["roles"],
+        "permissions": permission_set["permissions"],
+        "token_type": "access",
+        "iat": claims.get("iat"),
+        "exp": claims["exp"],
+        "jti": claims["jti"],
+        "active": True,
+        "source": "signed-token",
+    }
@@ -6,6 +6,15 @@ import httpx
 import json
 from cachetools import TTLCache
 from cachetools.keys import hashkey
+import jwt
+
+from .signed_token import (
+    PermissionVersionCache,
+    RevocationFilter,
+    is_signed_token,
+    signed_tokens_enabled,
+    verify_signed_token,
+)
 
 # # Environment Variables
 # OAUTH2_ENV = os.getenv("OAUTH2_ENV", "dev").strip()
@@ -33,6 +42,9 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
+# Seconds; a slow or partitioned Redis fails fast so callers fall back
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
 USE_REDIS = os.getenv("USE_REDIS", "0").strip() == "1"
 
 
@@ -45,6 +57,15 @@ class OAuthApiAccessorError(Exception):
 class RedisTokenManager:
     """Redis implementation for token storage"""
     _instance = None
+
+    metadata_prefix = "opaque_token_metadata:"
+    basic_prefix = "opaque_token:"
+    # Sorted sets of token -> exp, one per user and one per tenant
+    user_sessions_prefix = "user_sessions:"
+    tenant_sessions_prefix = "tenant_sessions:"
+    # Counters bumped whenever a user's (or everyone's) permissions change
+    permission_version_prefix = "perm_version:"
+    global_permission_version_key = "perm_version:global"
     
     def __new__(cls):
         if not cls._instance:
@@ -63,6 +84,8 @@ class RedisTokenManager:
                 port=REDIS_PORT,
                 db=REDIS_DB,
                 password=REDIS_PASSWORD if REDIS_PASSWORD else None,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
                 decode_responses=True
             )
             # Test connection
@@ -110,6 +133,10 @@ class RedisTokenManager:
             }
             
             self.client.setex(basic_key, int(ttl or 3600), json.dumps(basic_data))
+
+            # Index the token under its user and tenant so sessions can be
+            # listed / revoked without scanning the keyspace
+            self._index_session(token, basic_data)
             
             logging.info(
                 "Token stored in Redis with dual mappings: %s, TTL: %s seconds",
@@ -121,6 +148,38 @@ class RedisTokenManager:
             logging.error(f"Error storing token in Redis: {str(e)}")
             return False
     
+    def update_token_metadata(self, token, data):
+        """
+        Replace the stored metadata of a token that is still active, keeping
+        its TTL. Returns False when the token is missing or was revoked, so a
+        revocation racing the update is never undone (checked with WATCH).
+        """
+        if not self.available:
+            return False
+
+        from redis.exceptions import WatchError
+
+        metadata_key = f"{self.metadata_prefix}{token}"
+        try:
+            for _ in range(3):
+                with self.client.pipeline() as pipe:
+                    try:
+                        pipe.watch(metadata_key)
+                        raw = pipe.get(metadata_key)
+                        current = json.loads(raw) if raw else None
+                        if not isinstance(current, dict) or not current.get("active"):
+                            return False
+                        pipe.multi()
+                        pipe.set(metadata_key, json.dumps(dict(data, active=True)), keepttl=True)
+                        pipe.execute()
+                        return True
+                    except WatchError:
+                        continue  # changed meanwhile: look at it again
+            return False
+        except Exception as e:
+            logging.error(f"Error updating token metadata in Redis: {str(e)}")
+            return False
+
     def get_token_metadata(self, token):
         """
         Retrieve token data from Redis
@@ -171,28 +230,173 @@ class RedisTokenManager:
             logging.error(f"Error retrieving basic token info from Redis: {str(e)}")
             return None
     
+    def _session_index_keys(self, basic_data):
+        """Sorted-set keys a token is indexed under (scored by its expiry)"""
+        keys = []
+        if basic_data.get("user_id") not in (None, ""):
+            keys.append(f"{self.user_sessions_prefix}{basic_data['user_id']}")
+        if basic_data.get("tenant_id") not in (None, ""):
+            keys.append(f"{self.tenant_sessions_prefix}{basic_data['tenant_id']}")
+        return keys
+
+    def _index_session(self, token, basic_data):
+        exp = int(basic_data["exp"])
+        now = int(time.time())
+        pipe = self.client.pipeline()
+        for index_key in self._session_index_keys(basic_data):
+            pipe.zadd(index_key, {token: exp})
+            # Lazily drop members whose tokens have already expired
+            pipe.zremrangebyscore(index_key, "-inf", now)
+            # The index lives as long as its longest-lived token (NX/GT: Redis 7+)
+            pipe.expireat(index_key, exp, nx=True)
+            pipe.expireat(index_key, exp, gt=True)
+        pipe.execute()
+
+    def _live_session_tokens(self, index_key):
+        """Prune expired members of a session index and return the live ones"""
+        now = int(time.time())
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(index_key, "-inf", now)
+        pipe.zrange(index_key, 0, -1, withscores=True)
+        _, members = pipe.execute()
+        return [(token, int(exp)) for token, exp in members]
+
+    def _deactivate_tokens(self, tokens):
+        """
+        Mark tokens inactive in both the metadata and basic mappings and drop
+        them from every session index they belong to.
+
+        Returns the number of tokens that were still active.
+        """
+        if not tokens:
+            return 0
+
+        metadata_keys = [f"{self.metadata_prefix}{token}" for token in tokens]
+        basic_keys = [f"{self.basic_prefix}{token}" for token in tokens]
+        values = self.client.mget(metadata_keys + basic_keys)
+        metadata_values = values[:len(tokens)]
+        basic_values = values[len(tokens):]
+
+        revoked = 0
+        signed_revocations = {}
+        pipe = self.client.pipeline()
+        for token, metadata_key, basic_key, metadata_raw, basic_raw in zip(
+            tokens, metadata_keys, basic_keys, metadata_values, basic_values
+        ):
+            basic_data = json.loads(basic_raw) if basic_raw else {}
+            if basic_data.get("active"):
+                revoked += 1
+            if is_signed_token(token) and metadata_raw:
+                # Signed tokens are verified without reading these keys, so
+                # they also have to land in the revocation filter
+                metadata = json.loads(metadata_raw)
+                signed_revocations[metadata["jti"]] = metadata["exp"]
+
+            for key, raw in ((metadata_key, metadata_raw), (basic_key, basic_raw)):
+                if not raw:
+                    continue
+                parsed_data = json.loads(raw)
+                if isinstance(parsed_data, dict):
+                    parsed_data["active"] = False
+                    pipe.set(key, json.dumps(parsed_data), keepttl=True)
+
+            for index_key in self._session_index_keys(basic_data):
+                pipe.zrem(index_key, token)
+        pipe.execute()
+        RevocationFilter().revoke(signed_revocations)
+        return revoked
+
     def revoke_token(self, token):
         """Mark a token as revoked/inactive in Redis"""
         if not self.available:
             return False
         
         try:
-            prefix = "token:"
-            key = f"{prefix}{token}"
-            data = self.client.get(key)
-            
-            if data:
-                parsed_data = json.loads(data)
-                if isinstance(parsed_data, dict):
-                    parsed_data["active"] = False
-                    ttl = self.client.ttl(key)
-                    if ttl > 0:
-                        self.client.setex(key, ttl, json.dumps(parsed_data))
-                        return True
-            return False
+            return self._deactivate_tokens([token]) > 0
         except Exception as e:
             logging.error(f"Error revoking token in Redis: {str(e)}")
             return False
+
+    def list_user_sessions(self, user_id):
+        """List the live sessions of a user, newest expiry last"""
+        return self._list_sessions(f"{self.user_sessions_prefix}{user_id}")
+
+    def list_tenant_sessions(self, tenant_id):
+        """List the live sessions of every user in a tenant"""
+        return self._list_sessions(f"{self.tenant_sessions_prefix}{tenant_id}")
+
+    def _list_sessions(self, index_key):
+        if not self.available:
+            return []
+
+        try:
+            members = self._live_session_tokens(index_key)
+            if not members:
+                return []
+
+            basic_values = self.client.mget(
+                [f"{self.basic_prefix}{token}" for token, _ in members]
+            )
+            results = []
+            for (token, exp), raw in zip(members, basic_values):
+                if not raw:
+                    continue
+                results.append({"token": token, "exp": exp, "data": json.loads(raw)})
+            return results
+        except Exception as e:
+            logging.error(f"Error listing sessions for {index_key}: {str(e)}")
+            return []
+
+    def revoke_user_sessions(self, user_id):
+        """Revoke every live session of a user. Returns the number revoked."""
+        return self._revoke_sessions(f"{self.user_sessions_prefix}{user_id}")
+
+    def revoke_tenant_sessions(self, tenant_id):
+        """Revoke every live session in a tenant. Returns the number revoked."""
+        return self._revoke_sessions(f"{self.tenant_sessions_prefix}{tenant_id}")
+
+    def _revoke_sessions(self, index_key):
+        if not self.available:
+            return 0
+
+        try:
+            tokens = [token for token, _ in self._live_session_tokens(index_key)]
+            revoked = self._deactivate_tokens(tokens)
+            logging.info(f"Revoked {revoked} session(s) indexed under {index_key}")
+            return revoked
+        except Exception as e:
+            logging.error(f"Error revoking sessions for {index_key}: {str(e)}")
+            return 0
+    
+    def get_permission_versions(self, user_id):
+        """[user version, global version]; a change in either invalidates cached permissions"""
+        if not self.available:
+            return None
+
+        try:
+            user_version, global_version = self.client.mget(
+                f"{self.permission_version_prefix}user:{user_id}",
+                self.global_permission_version_key,
+            )
+            return [int(user_version or 0), int(global_version or 0)]
+        except Exception as e:
+            logging.error(f"Error reading permission versions from Redis: {str(e)}")
+            return None
+
+    def bump_permission_version(self, user_id=None):
+        """Bump the version for one user, or the global version when user_id is None"""
+        if not self.available:
+            return False
+
+        try:
+            if user_id is None:
+                self.client.incr(self.global_permission_version_key)
+            else:
+                self.client.incr(f"{self.permission_version_prefix}user:{user_id}")
+            return True
+        except Exception as e:
+            logging.error(f"Error bumping permission version in Redis: {str(e)}")
+            return False
     
     def list_tokens(self, pattern="*", limit=100):
         """List tokens in Redis matching a pattern (caution: can be expensive with large DBs)"""
@@ -201,27 +405,22 @@ class RedisTokenManager:
         
         try:
             results = []
-            prefix = "token:"
+            prefix = self.basic_prefix
             full_pattern = f"{prefix}{pattern}"
-            
-            cursor = '0'
-            count = 0
-            
-            while cursor != 0 and count < limit:
-                cursor, keys = self.client.scan(cursor=cursor, match=full_pattern, count=10)
-                count += len(keys)
-                
-                for key in keys:
-                    token = key.replace(prefix, "")
-                    data = self.client.get(key)
-                    ttl = self.client.ttl(key)
-                    
-                    if data:
-                        results.append({
-                            "token": token,
-                            "expires_in": ttl,
-                            "data": json.loads(data)
-                        })
+
+            for key in self.client.scan_iter(match=full_pattern, count=1000):
+                token = key[len(prefix):]
+                data = self.client.get(key)
+                ttl = self.client.ttl(key)
+
+                if data:
+                    results.append({
+                        "token": token,
+                        "expires_in": ttl,
+                        "data": json.loads(data)
+                    })
+                if len(results) >= limit:
+                    break
             
             return results
         except Exception as e:
@@ -244,6 +443,10 @@ class Oauth2AsAccessor:
         
         # Initialize memory cache for backward compatibility
         self.cache = TTLCache(maxsize=1000, ttl=3600)
+        # In-memory session index: ("user"|"tenant", id) -> {token: exp}
+        self.session_index = {}
+        # In-memory permission versions: user_id -> version, None -> global
+        self.permission_versions = {}
         
         # Initialize Redis token manager
         self.redis_manager = RedisTokenManager()
@@ -336,6 +539,8 @@ class Oauth2AsAccessor:
         
         self.cache[metadata_key] = (data, expiry_time)
         self.cache[basic_key] = (basic_data, expiry_time)
+        for index_key in self._inmem_index_keys(basic_data):
+            self.session_index.setdefault(index_key, {})[opaque_token] = expiry_time
 
         logging.info(
             "Opaque token cached in memory: %s, TTL: %s seconds",
@@ -369,6 +574,22 @@ class Oauth2AsAccessor:
         self.store_token_inmem_cache(opaque_token,data,ttl)
         return True
 
+    def update_opaque_token(self, opaque_token, data):
+        """
+        Replace the data of a stored token, only if it is still active; its
+        expiry and session indexes are left as they are. Returns False for a
+        missing or revoked token.
+        """
+        if self.use_redis and self.redis_manager.update_token_metadata(opaque_token, data):
+            return True
+
+        cache_key = hashkey(f"opaque_token_metadata:{opaque_token}")
+        cached_item = self.cache.get(cache_key)
+        if not cached_item or not cached_item[0].get("active"):
+            return False
+        self.cache[cache_key] = (dict(data, active=True), cached_item[1])
+        return True
+
     def get_cached_oauth2_token(self, opaque_token, metadata = True):
         # First try Redis if available
         if self.use_redis:
@@ -490,6 +711,40 @@ class Oauth2AsAccessor:
                 detail="Try logging in again! Authentication process failed. Please try again or contact support."
             )
 
+    @staticmethod
+    def _inmem_index_keys(basic_data):
+        keys = []
+        if basic_data.get("user_id") not in (None, ""):
+            keys.append(("user", str(basic_data["user_id"])))
+        if basic_data.get("tenant_id") not in (None, ""):
+            keys.append(("tenant", str(basic_data["tenant_id"])))
+        return keys
+
+    def _inmem_live_sessions(self, index_key):
+        sessions = self.session_index.get(index_key, {})
+        now = time.time()
+        for token in [t for t, exp in sessions.items() if exp < now]:
+            del sessions[token]
+        return dict(sessions)
+
+    def _revoke_inmem_token(self, token):
+        success = False
+        for prefix in ("opaque_token_metadata:", "opaque_token:"):
+            cache_key = hashkey(f"{prefix}{token}")
+            cached_item = self.cache.get(cache_key)
+            if cached_item:
+                data, expiry = cached_item
+                if isinstance(data, dict):
+                    if prefix == "opaque_token:":
+                        for index_key in self._inmem_index_keys(data):
+                            self.session_index.get(index_key, {}).pop(token, None)
+                    elif is_signed_token(token) and data.get("jti"):
+                        RevocationFilter().revoke({data["jti"]: data["exp"]})
+                    success = success or data.get("active", False)
+                    data["active"] = False
+                    self.cache[cache_key] = (data, expiry)
+        return success
+
     def revoke_token(self, token):
         """Mark a token as inactive/revoked"""
         success = False
@@ -499,17 +754,63 @@ class Oauth2AsAccessor:
             success = self.redis_manager.revoke_token(token) or success
         
         # Also try in-memory cache
-        cache_key = hashkey(token)
-        cached_item = self.cache.get(cache_key)
-        if cached_item:
-            data, expiry = cached_item
-            if isinstance(data, dict):
-                data["active"] = False
-                self.cache[cache_key] = (data, expiry)
-                success = True
+        success = self._revoke_inmem_token(token) or success
         
         return success
 
+    def get_permission_versions(self, user_id):
+        """[user version, global version] of a user's permissions"""
+        if self.use_redis:
+            versions = self.redis_manager.get_permission_versions(user_id)
+            if versions is not None:
+                return versions
+
+        return [
+            self.permission_versions.get(str(user_id), 0),
+            self.permission_versions.get(None, 0),
+        ]
+
+    def bump_permission_version(self, user_id=None):
+        """
+        Record that permissions changed, for one user or (user_id=None) for
+        everyone, so cached introspection documents get rebuilt.
+        """
+        key = None if user_id is None else str(user_id)
+        self.permission_versions[key] = self.permission_versions.get(key, 0) + 1
+        PermissionVersionCache().forget(user_id)
+
+        if self.use_redis:
+            return self.redis_manager.bump_permission_version(user_id)
+        return True
+
+    def list_user_sessions(self, user_id):
+        """List a user's live sessions as [{"token", "exp", "data"}]"""
+        if self.use_redis:
+            return self.redis_manager.list_user_sessions(user_id)
+
+        results = []
+        for token, exp in self._inmem_live_sessions(("user", str(user_id))).items():
+            cached_item = self.cache.get(hashkey(f"opaque_token:{token}"))
+            if cached_item:
+                results.append({"token": token, "exp": exp, "data": cached_item[0]})
+        return sorted(results, key=lambda session: session["exp"])
+
+    def revoke_user_sessions(self, user_id):
+        """Revoke every live session of a user ("logout everywhere")"""
+        if self.use_redis:
+            return self.redis_manager.revoke_user_sessions(user_id)
+
+        tokens = self._inmem_live_sessions(("user", str(user_id)))
+        return sum(1 for token in tokens if self._revoke_inmem_token(token))
+
+    def revoke_tenant_sessions(self, tenant_id):
+        """Revoke every live session of every user in a tenant"""
+        if self.use_redis:
+            return self.redis_manager.revoke_tenant_sessions(tenant_id)
+
+        tokens = self._inmem_live_sessions(("tenant", str(tenant_id)))
+        return sum(1 for token in tokens if self._revoke_inmem_token(token))
+
     def list_cached_items(self):
         results = []
         
@@ -548,6 +849,19 @@ def validate_bearer_token(verbosity: int = 40, use_cache: bool = True):
         ):
             token = credentials.credentials
 
+            if is_signed_token(token) and signed_tokens_enabled():
+                # Verified locally; falls through to the regular path only if
+                # the permission set is unknown to this process and to Redis
+                try:
+                    validation_result = verify_signed_token(token)
+                except jwt.InvalidTokenError:
+                    raise HTTPException(
+                        status_code=401,
+                        detail="Invalid or expired token. Please authenticate again.",
+                    )
+                if validation_result is not None:
+                    return validation_result
+
             try:
                 validation_result = access_token_validator(token, verbosity, use_cache)
                 if not validation_result["active"]:
@@ -9,7 +9,7 @@ setup(
         "python-jose>=3.3.0",
         "sqlalchemy>=1.4.23",
         "httpx>=0.19.0",
-        "redis>=4.0.2",
+        "redis>=4.2.0",  # EXPIREAT NX/GT (the server needs Redis 7+)
     ],
     author="MadhuSIT",
     author_email="madhu@example.com",
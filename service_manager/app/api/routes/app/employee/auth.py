@@ -2,16 +2,19 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException, Request, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from typing import Optional, List, Annotated, Dict
 import hashlib
 import jwt
 import traceback
-from app.database.database import get_db
+from app.database.database import get_async_db
 from app.crud import crud
 from app.api.schemas.schemas import EmployeeLoginResponse, EmployeeResponse
-from common_utils.auth.utils import hash_password , verify_password
+from app.utils.password_hasher import get_password_hasher
+from app.utils.rate_limit import RateLimiter
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/employees/auth", tags=["employee Authentication"])
 
@@ -21,17 +24,25 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-def authenticate_user(db: Session, email: str, password: str):
-    employee = get_employee_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    employee = await get_employee_by_email(db, email)
     if not employee:
         print(f"Employee with email {email} not found")
         return None
-    if not verify_password(hash_password(password), employee.hashed_password):
+    valid, new_hash = await get_password_hasher().averify_and_update(password, employee.hashed_password)
+    if not valid:
         print(f"Incorrect password for email {email}")
         return None
+    if new_hash:
+        # Legacy or under-cost hash: upgrade it now that we know the password
+        employee.hashed_password = new_hash
+        await db.commit()
     return employee
-def get_employee_by_email(db: Session, email: str) -> Optional[EmployeeResponse]:
-    return db.query(Employee).filter(Employee.email == email).first()
+async def get_employee_by_email(db: AsyncSession, email: str) -> Optional[EmployeeResponse]:
+    # Department is needed for the token claims; load it up front (no lazy loads on AsyncSession)
+    return await db.scalar(
+        select(Employee).options(joinedload(Employee.department)).where(Employee.email == email)
+    )
     
 def create_access_token(
     employee_id: str,
@@ -62,7 +73,7 @@ class PermissionChecker:
     def __init__(self, required_permissions: List[str]):
         self.required_permissions = required_permissions
 
-    def __call__(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Dict:
+    def __call__(self, token: str = Depends(oauth2_scheme)) -> Dict:
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             employee_id = payload.get("employee_id")
@@ -86,17 +97,26 @@ class PermissionChecker:
 from app.database.models import Device, Employee  # or wherever your Device model is
 from sqlalchemy.exc import SQLAlchemyError
 
-@router.post("/employee/login", response_model=EmployeeLoginResponse)
-def employee_login(
+@router.post(
+    "/employee/login",
+    response_model=EmployeeLoginResponse,
+    dependencies=[
+        # Per address and username; the wider per-address bucket stops one
+        # client spraying many usernames (offices share an address, so it is generous)
+        Depends(RateLimiter("employee_login", 10, 60, scope="login")),
+        Depends(RateLimiter("employee_login_ip", 100, 60, scope="ip")),
+    ],
+)
+async def employee_login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     device_uuid: str = Body(...),
     device_name: Optional[str] = Body(None),
     fcm_token: Optional[str] = Body(None),
     force_logout: Optional[bool] = Body(False),
 ):
-    employee = authenticate_user(db, form_data.username, form_data.password)
+    employee = await authenticate_user(db, form_data.username, form_data.password)
     if not employee:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
@@ -105,7 +125,7 @@ def employee_login(
 
     try:
         # 🔍 Check existing device for this user
-        existing_device = db.query(Device).filter(Device.employee_id == employee.employee_id).first()
+        existing_device = await db.scalar(select(Device).where(Device.employee_id == employee.employee_id))
 
         # Generate access token
         access_token = create_access_token(
@@ -130,7 +150,7 @@ def employee_login(
             existing_device.device_name = device_name
             existing_device.fcm_token = fcm_token
             existing_device.access_token = access_token
-            db.commit()
+            await db.commit()
         else:
             # No device exists for user — insert new
             new_device = Device(
@@ -141,10 +161,9 @@ def employee_login(
                 access_token=access_token,
             )
             db.add(new_device)
-            db.commit()
+            await db.commit()
 
-        employee = db.query(Employee).filter(Employee.employee_id == employee.employee_id).first()  # Fetch employee
-        department = employee.department if employee else None
+        department = employee.department
 
         return EmployeeLoginResponse(
             access_token=access_token,
@@ -157,16 +176,16 @@ def employee_login(
         )
 
     except HTTPException as e:
-        db.rollback()
+        await db.rollback()
         print("HTTPException:", str(e.detail))
         raise e
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print("SQLAlchemyError:", str(e))
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Device login failed")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print("General Exception:", str(e))
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Unexpected error during login")
@@ -1,23 +1,33 @@
 import datetime
 import logging
 
-from anyio import current_time
-from app.database.database import get_db
+from app.database.database import get_async_db
+from app.database.session_router import get_async_read_db
 from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database.models import Booking, Cutoff, Employee, Tenant # Add additional imports
 from app.api.schemas.schemas import ShiftResponse   
 from app.api.routes.app.employee.auth import PermissionChecker
 from app.database.models import Shift
+from app.utils.rate_limit import RateLimiter
+from app.utils.weekday_mask import covers, mask_from_dates, names_from_mask
+from app.crud.bookings import booking_locations, booking_rows, existing_booking_dates, insert_bookings, load_booking_context
 router = APIRouter(tags=["employee Booking"])
 logger = logging.getLogger(__name__)
-@router.post("/employee/create_booking/")
-def create_booking(
-    token_data: dict = Depends(PermissionChecker([])),
+create_booking_auth = PermissionChecker([])
+
+
+@router.post(
+    "/employee/create_booking/",
+    dependencies=[Depends(RateLimiter("create_booking", 30, 60, scope="user", auth=create_booking_auth))],
+)
+async def create_booking(
+    token_data: dict = Depends(create_booking_auth),
     dates: str = Body(..., embed=True),
     shift_id: int = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         logger.info("Starting booking process.")
@@ -43,114 +53,50 @@ def create_booking(
         if len(set(booking_dates)) != len(booking_dates):
             raise HTTPException(status_code=400, detail="Duplicate dates are not allowed.")
 
-        # Fetch the shift
-        shift = db.query(Shift).filter(Shift.id == shift_id, Shift.tenant_id == tenant_id).first()
+        # Shift, tenant and cutoff from the config cache, employee in one query
+        shift, tenant, employee, cutoff_time = await load_booking_context(db, tenant_id, employee_id, shift_id)
         if not shift:
             raise HTTPException(status_code=404, detail="Shift not found")
-
-        logger.info("Fetching tenant details.")
-        tenant = db.query(Tenant).filter(Tenant.tenant_id == tenant_id).first()
         if not tenant:
             raise HTTPException(status_code=404, detail="Tenant not found")
-
-        # Fetch cutoff time for booking
-        cutoff_time = db.query(tenant.cutoff.booking_cutoff).scalar()
-        current_time = datetime.datetime.now().time()
-        # Fetch employee details
-        logger.info("Fetching employee details.")
-        employee = db.query(Employee).filter(Employee.employee_id == employee_id).first()
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
+        if cutoff_time is None:
+            raise HTTPException(status_code=404, detail="Booking cutoff not configured for tenant")
 
         # Determine pickup and drop-off locations
-        if shift.log_type == "in":
-            pickup_location = employee.address
-            pickup_location_latitude = employee.latitude
-            pickup_location_longitude = employee.longitude
-            drop_location = tenant.address
-            drop_latitude = tenant.latitude
-            drop_longitude = tenant.longitude
-        elif shift.log_type == "out":
-            pickup_location = tenant.address
-            pickup_location_latitude = tenant.latitude
-            pickup_location_longitude = tenant.longitude
-            drop_location = employee.address
-            drop_latitude = employee.latitude
-            drop_longitude = employee.longitude
-        else:
+        locations = booking_locations(shift.log_type, employee, tenant)
+        if locations is None:
             raise HTTPException(status_code=400, detail="Invalid shift type")
 
-        # Validate existing bookings and cutoff
-        logger.info("Validating existing bookings and cutoff times.")
+        # Validate cutoff and shift days
+        logger.info("Validating cutoff times and shift days.")
+        current_time = datetime.datetime.now().time()
+        today = datetime.datetime.now().date()
         for booking_date in booking_dates:
-            if booking_date <= datetime.datetime.now().date() and current_time >= datetime.time(cutoff_time):
+            if booking_date <= today and current_time >= datetime.time(cutoff_time):
                 raise HTTPException(status_code=400, detail=f"Unable to book for {booking_date}, cutoff time exceeded.")
-                # Check if booking dates match the shift's days
-        logger.info(f"Raw shift.day value from DB: {shift.day}")
-        logger.info(f"Raw shift.day value from DB: {shift.day}")
-        cleaned_day_str = shift.day.strip("{}")
-        valid_days = [day.strip().lower() for day in cleaned_day_str.split(",")]
-        logger.info(f"Computed valid_days: {valid_days}")
 
-        for booking_date in booking_dates:
-            weekday = booking_date.strftime('%A').lower()
-            logger.info(f"Computed valid_days: {valid_days}")
-            logger.info(f"Booking date: {booking_date}, weekday: {weekday}")
-
-            if weekday not in valid_days:
-                raise HTTPException(status_code=400, detail=f"Booking date {booking_date} does not match shift days {shift.day}.")
-
-
-            existing_booking = db.query(Booking).filter(
-                Booking.employee_id == employee_id,
-                Booking.shift_id == shift_id,
-                Booking.booking_date == booking_date
-            ).first()
-
-            if existing_booking and existing_booking.status != "cancelled":
-                raise HTTPException(status_code=400, detail=f"Existing booking for {booking_date}, not cancelled.")
-
-            # Determine pickup and drop-off locations
-            if shift.log_type == "in":
-                pickup_location = employee.address
-                pickup_location_latitude = employee.latitude
-                pickup_location_longitude = employee.longitude
-                drop_location = tenant.address
-                drop_latitude = tenant.latitude
-                drop_longitude = tenant.longitude
-            elif shift.log_type == "out":
-                pickup_location = tenant.address
-                pickup_location_latitude = tenant.latitude
-                pickup_location_longitude = tenant.longitude
-                drop_location = employee.address
-                drop_latitude = employee.latitude
-                drop_longitude = employee.longitude
-            else:
-                raise HTTPException(status_code=400, detail="Invalid shift type")
-
-            # Create booking
-            booking = Booking(
-                employee_id=employee_id,
-                employee_code=employee.employee_code,
-                tenant_id=tenant_id,
-                shift_id=shift_id,
-                department_id=employee.department_id,
-                pickup_location=pickup_location,
-                pickup_location_latitude=pickup_location_latitude,
-                pickup_location_longitude=pickup_location_longitude,
-                drop_location=drop_location,
-                drop_location_latitude=drop_latitude,
-                drop_location_longitude=drop_longitude,
-                booking_date=booking_date,
-                status="pending",
-                created_at=datetime.datetime.now(),
-                updated_at=datetime.datetime.now(),
-            )
-
-            db.add(booking)
-
-        logger.info("Committing booking to the database.")
-        db.commit()
+        if not covers(shift.weekday_mask, mask_from_dates(booking_dates)):
+            booking_date = next(d for d in booking_dates if not shift.runs_on(d))
+            raise HTTPException(status_code=400, detail=f"Booking date {booking_date} does not match shift days {shift.day}.")
+
+        # One existence check for all dates
+        existing_dates = await existing_booking_dates(db, employee_id, shift_id, booking_dates)
+        if existing_dates:
+            raise HTTPException(status_code=400, detail=f"Existing booking for {existing_dates[0]}, not cancelled.")
+
+        # One multi-row insert; the partial unique index settles races
+        rows = booking_rows(employee, tenant_id, shift_id, locations, booking_dates)
+        inserted = await insert_bookings(db, rows)
+        if len(inserted) != len(rows):
+            await db.rollback()
+            inserted_dates = {booking_date for _, _, _, booking_date in inserted}
+            conflict = min(d for d in booking_dates if d not in inserted_dates)
+            raise HTTPException(status_code=400, detail=f"Existing booking for {conflict}, not cancelled.")
+
+        logger.info(f"Committing {len(inserted)} bookings to the database.")
+        await db.commit()
         logger.info("Bookings created successfully for provided dates.")
         return {"detail": "Bookings created for all provided dates successfully"}
     
@@ -158,18 +104,19 @@ def create_booking(
         raise e  # This re-raises caught HTTPExceptions
 
     except Exception as exc:
+        await db.rollback()
         logger.exception("Unexpected error occurred during booking.")
         raise HTTPException(status_code=500, detail="An error occurred while creating the booking.")
     
 
 
 @router.get("/employee/bookings/")
-def get_all_bookings(
+async def get_all_bookings(
     token_data: dict = Depends(PermissionChecker([])),
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     logger.info("Fetching all bookings for tenant.")
     try:
@@ -180,23 +127,26 @@ def get_all_bookings(
             raise HTTPException(status_code=400, detail="Invalid token data")
         logger.info(f"Tenant ID: {tenant_id}")
 
-        # Fetch all bookings for the tenant
-        query = db.query(Booking).filter(Booking.tenant_id == tenant_id)
+        # Fetch all bookings for the tenant together with their shift
+        query = (
+            select(Booking, Shift)
+            .join(Shift, Shift.id == Booking.shift_id)
+            .where(Booking.tenant_id == tenant_id)
+        )
 
         if status:
             logger.info(f"Filtering by status: {status}")
-            query = query.filter(Booking.status == status)
+            query = query.where(Booking.status == status)
 
-        bookings = query.offset(skip).limit(limit).all()
-        if not bookings:
+        rows = (await db.execute(query.order_by(Booking.booking_id).offset(skip).limit(limit))).all()
+        if not rows:
             logger.info("No bookings found.")
             return {"detail": "No bookings found"}
-        logger.info(f"Found {len(bookings)} bookings.")
+        logger.info(f"Found {len(rows)} bookings.")
 
         # Format booking data
         booking_list = []
-        for booking in bookings:
-            shift = db.query(Shift).filter(Shift.id == booking.shift_id).first()
+        for booking, shift in rows:
             booking_list.append({
                 "booking_id": booking.booking_id,
                 "employee_id": booking.employee_id,
@@ -231,20 +181,20 @@ def get_all_bookings(
         raise HTTPException(status_code=500, detail="An error occurred while fetching bookings.")
 
 @router.post("/employee/cancel-booking/{booking_id}/")
-def cancel_booking(
+async def cancel_booking(
     booking_id: int,
     token_data: dict = Depends(PermissionChecker([])),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         # Fetch the booking
-        booking = db.query(Booking).filter(Booking.booking_id == booking_id).first()
+        booking = await db.scalar(select(Booking).where(Booking.booking_id == booking_id))
         if not booking:
             raise HTTPException(status_code=404, detail="Booking not found")
 
         # Fetch cutoff time for cancellation
         tenant_id = token_data.get("tenant_id")
-        cutoff_time = db.query(Cutoff.cancellation_cutoff).filter(Cutoff.tenant_id == tenant_id).scalar()
+        cutoff_time = await db.scalar(select(Cutoff.cancellation_cutoff).where(Cutoff.tenant_id == tenant_id))
 
         # Check if the booking can be canceled based on the cutoff
         current_time = datetime.datetime.now().time()
@@ -253,7 +203,7 @@ def cancel_booking(
 
         # Cancel the booking
         booking.status = "cancelled"
-        db.commit()
+        await db.commit()
 
         return {"detail": "Booking canceled successfully"}
 
@@ -262,21 +212,17 @@ def cancel_booking(
         raise e
 
     except Exception as exc:
+        await db.rollback()
         logger.exception("Error while canceling booking")
         raise HTTPException(status_code=500, detail="An error occurred while canceling the booking.")
 
 @router.post("/employee/common-shifts/")
-def get_common_shifts_for_dates(
+async def get_common_shifts_for_dates(
     dates: List[str] = Body(..., embed=True),
     log_type: str = Body(..., embed=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     token_data: dict = Depends(PermissionChecker([])),
 ):
-    import datetime
-    import calendar
-    from app.database.models import Shift
-    from fastapi.logger import logger
-
     try:
         tenant_id = token_data.get("tenant_id")
         if not tenant_id:
@@ -305,9 +251,9 @@ def get_common_shifts_for_dates(
             }
 
         today = datetime.date.today()
-        days = set()
+        date_objs = []
 
-        # Parse input dates and get their weekdays
+        # Parse input dates
         for date_str in dates:
             try:
                 date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
@@ -319,49 +265,30 @@ def get_common_shifts_for_dates(
                 logger.warning(f"Past date provided: {date_str}")
                 raise HTTPException(status_code=400, detail=f"Date {date_str} is in the past.")
 
-            weekday = calendar.day_name[date_obj.weekday()].lower()
-            days.add(weekday)
-            logger.info(f"Parsed date: {date_str} → weekday: {weekday}")
+            date_objs.append(date_obj)
 
+        required = mask_from_dates(date_objs)
+        days = names_from_mask(required)
         logger.info(f"Final weekday set from input dates: {days}")
 
-        # Query all shifts for tenant with given log_type
-        shifts = (
-            db.query(Shift)
-            .filter(
-                Shift.tenant_id == tenant_id,
-                Shift.log_type == log_type
+        # Shifts of this log_type that run on ALL requested weekdays
+        matched_shifts = (
+            await db.scalars(
+                select(Shift).where(
+                    Shift.tenant_id == tenant_id,
+                    Shift.log_type == log_type,
+                    Shift.weekday_mask.op("&")(required) == required,
+                ).order_by(Shift.id)
             )
-            .all()
-        )
-
-        logger.info(f"Found {len(shifts)} shifts for tenant_id={tenant_id}, log_type={log_type}")
-
-        # Match shifts based on days
-        matched_shifts = []
-        for shift in shifts:
-            if not shift.day:
-                logger.warning(f"Shift ID {shift.id} has no day defined. Skipping.")
-                continue
-
-            # Clean and parse shift day string
-            cleaned_day_str = shift.day.strip("{}").lower().replace(" ", "")
-            shift_days = set(cleaned_day_str.split(","))
-            logger.debug(f"Shift ID {shift.id} has days: {shift_days}")
-
+        ).all()
 
-            # NEW: shift must cover ALL requested days
-            if days <= shift_days:
-                logger.info(f"Shift ID {shift.id} fully covers all input days: {days}")
-                matched_shifts.append(shift)
-            else:
-                logger.info(f"Shift ID {shift.id} skipped. Does not cover all input days: required={days}, shift_has={shift_days}")
+        logger.info(f"Found {len(matched_shifts)} shifts for tenant_id={tenant_id}, log_type={log_type} covering {days}")
 
         # Build base response
         response = {
             "your_dates": dates,
             "count": len(matched_shifts),
-            "days_matched": list(days),
+            "days_matched": days,
         }
 
         if matched_shifts:
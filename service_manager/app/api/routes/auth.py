@@ -2,15 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, Header, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Annotated
 from sqlalchemy.orm import Session
-import os, secrets, json, time
+import os, secrets, json, time, hashlib, hmac
 from app.database.database import get_db   
 from app.api.schemas.schemas import TokenResponse
 from app.crud import crud
-from common_utils.auth.utils import create_access_token, hash_password , verify_password
+from common_utils.auth.utils import create_access_token
 from common_utils.auth.permission_checker import PermissionChecker
 from common_utils.auth.token_validation import Oauth2AsAccessor, validate_bearer_token
+from common_utils.auth.signed_token import issue_signed_token, signed_tokens_enabled
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.controller.user_controller import UserController
+from app.utils.password_hasher import get_password_hasher
+from app.utils.rate_limit import RateLimiter
 
 security = HTTPBearer()
 router = APIRouter()
@@ -18,27 +21,57 @@ router = APIRouter()
 # Token configuration
 TOKEN_EXPIRY_HOURS = int(os.getenv("TOKEN_EXPIRY_HOURS", "1"))
 X_INTROSPECT_SECRET = os.getenv("X_Introspect_Secret","Testing_").strip()
+# Issue self-contained signed access tokens instead of opaque ones
+SIGNED_ACCESS_TOKENS = os.getenv("SIGNED_ACCESS_TOKENS", "0").strip() == "1"
 
 def authenticate_user(db: Session, email: str, password: str):
     user = crud.get_user_by_email(db, email)
     if not user:
         print(f"User with email {email} not found")
         return None
-    if not verify_password(hash_password(password), user.hashed_password):
+    valid, new_hash = get_password_hasher().verify_and_update(password, user.hashed_password)
+    if not valid:
         print(f"Password for email {email} is incorrect")
         return None
+    if new_hash:
+        # Legacy or under-cost hash: upgrade it now that we know the password
+        user.hashed_password = new_hash
+        db.commit()
     return user
 
 
+def build_introspection_document(db: Session, user, tenant_id, iat: int, exp: int, jti: str):
+    """
+    The document served by /introspect. Built at login and cached with the
+    token, so it only has to be rebuilt when the user's permissions change.
+    """
+    # Read the version first so a concurrent change forces another rebuild
+    perm_version = Oauth2AsAccessor().get_permission_versions(user.user_id)
+    return {
+        "user_id": user.user_id,
+        "tenant_id": tenant_id,
+        "email": user.email,
+        "roles": crud.get_user_roles(db, user.user_id),
+        "permissions": crud.get_user_permissions(db, user.user_id),
+        "token_type": "access",
+        "iat": iat,
+        "exp": exp,
+        "jti": jti,
+        "perm_version": perm_version,
+    }
+
+
 @router.post("/introspect")
-async def introspect(x_introspect_secret: str = Header(...,alias="X_Introspect_Secret"), authorization: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+def introspect(x_introspect_secret: str = Header(...,alias="X_Introspect_Secret"), authorization: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     """
     Validate and introspect a token, returning its associated data if valid.
     
     The token should be provided in the Authorization header as 'Bearer <token>'.
+    The precomputed document stored at login is served as-is unless the user's
+    permission version moved, so steady-state calls do not touch the database.
     """
     
-    if x_introspect_secret != X_INTROSPECT_SECRET:
+    if not hmac.compare_digest(x_introspect_secret.encode("utf-8"), X_INTROSPECT_SECRET.encode("utf-8")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are not authorized"
@@ -47,42 +80,40 @@ async def introspect(x_introspect_secret: str = Header(...,alias="X_Introspect_S
     token = authorization.credentials
 
     try:
-        # First check if token exists in Redis cache
         oauth_accessor = Oauth2AsAccessor()
-        token_data = oauth_accessor.get_cached_oauth2_token(token, metadata=False)
+        token_data = oauth_accessor.get_cached_oauth2_token(token, metadata=True)
         
         if (not isinstance(token_data, dict)) or (not token_data.get("active", False)) or time.time() > token_data.get("exp", 000):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token Expired or invalid"
             )
-        
-        user_id = token_data["user_id"]
-        tenant_id = token_data.get("tenant_id", "")
-        
-        # Get user's roles and permissions
-        user = UserController().get_user(user_id, db)
-        roles = crud.get_user_roles(db, user_id)
-        permissions = crud.get_user_permissions(db, user_id)
-        
-        # Create full token payload
-        current_time = int(time.time())
-        expiry_time = token_data.get("exp", current_time + (TOKEN_EXPIRY_HOURS * 3600))
-        
-        token_payload = {
-            "user_id": user_id,
-            "tenant_id": tenant_id,
-            "email": user.username,
-            "roles": roles,
-            "permissions": permissions,
-            "token_type": "access",
-            "iat": token_data.get("iat", current_time),
-            "exp": expiry_time,
-            "active": True,
-            "jti": token_data.get("jti", secrets.token_hex(8)),
-        }
-            
-        return token_payload
+
+        document = {key: value for key, value in token_data.items() if key != "source"}
+        user_id = document["user_id"]
+
+        if document.get("perm_version") != oauth_accessor.get_permission_versions(user_id):
+            # Permissions changed since the document was built (or it predates
+            # cached documents): rebuild once and store it back with the token
+            current_time = int(time.time())
+            user = UserController().get_user(user_id, db)
+            document = build_introspection_document(
+                db,
+                user,
+                document.get("tenant_id", ""),
+                iat=document.get("iat", current_time),
+                exp=document.get("exp", current_time + (TOKEN_EXPIRY_HOURS * 3600)),
+                jti=document.get("jti", secrets.token_hex(8)),
+            )
+            if not oauth_accessor.update_opaque_token(token, dict(document)):
+                # Revoked (or expired) while the document was being rebuilt
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token Expired or invalid"
+                )
+            document["active"] = True
+
+        return document
     
     except HTTPException as e:
         raise e
@@ -120,41 +151,143 @@ async def revoke_token(authorization: str = Header(...)):
         )
 
 
+def _session_id(token: str) -> str:
+    """Stable, non-secret handle for a token so sessions can be listed safely"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+@router.get("/sessions")
+async def list_sessions(
+    authorization: HTTPAuthorizationCredentials = Depends(security),
+    token_data: dict = Depends(validate_bearer_token()),
+):
+    """
+    List the caller's live sessions (one per issued access token).
+    """
+    current_session = _session_id(authorization.credentials)
+    sessions = Oauth2AsAccessor().list_user_sessions(token_data["user_id"])
+
+    return {
+        "sessions": [
+            {
+                "session_id": _session_id(session["token"]),
+                "tenant_id": session["data"].get("tenant_id"),
+                "exp": session["exp"],
+                "active": session["data"].get("active", False),
+                "current": _session_id(session["token"]) == current_session,
+            }
+            for session in sessions
+        ]
+    }
+
+
+@router.post("/sessions/revoke-all")
+async def revoke_all_sessions(token_data: dict = Depends(validate_bearer_token())):
+    """
+    Log the caller out everywhere by revoking every session of their user.
+    """
+    revoked = Oauth2AsAccessor().revoke_user_sessions(token_data["user_id"])
+    return {"message": "Sessions revoked successfully", "revoked": revoked}
+
+
+@router.post("/users/{user_id}/sessions/revoke-all")
+def revoke_user_sessions(
+    user_id: int,
+    db: Session = Depends(get_db),
+    token_data: dict = Depends(PermissionChecker(["user_management.update"])),
+):
+    """
+    Revoke every session of a user in the caller's tenant.
+    """
+    user = UserController().get_user(user_id, db)
+    if int(user.tenant_id) != int(token_data["tenant_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this tenant is forbidden"
+        )
+
+    revoked = Oauth2AsAccessor().revoke_user_sessions(user_id)
+    return {"message": "Sessions revoked successfully", "revoked": revoked}
+
+
+@router.post("/tenants/{tenant_id}/sessions/revoke-all")
+async def revoke_tenant_sessions(
+    tenant_id: int,
+    token_data: dict = Depends(PermissionChecker(["tenant_management.update"])),
+):
+    """
+    Revoke every session of every user in the caller's tenant.
+    """
+    if int(tenant_id) != int(token_data["tenant_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this tenant is forbidden"
+        )
+
+    revoked = Oauth2AsAccessor().revoke_tenant_sessions(tenant_id)
+    return {"message": "Sessions revoked successfully", "revoked": revoked}
+
+
+@router.get("/hashing-metrics")
+async def hashing_metrics(
+    token_data: dict = Depends(PermissionChecker(["user_management.read"]))
+):
+    """
+    Latency metrics of the password hashing pool (per worker process).
+    """
+    return get_password_hasher().metrics.snapshot()
+
+
 @router.get("/me")
 async def get_me(       
     user: dict = Depends(PermissionChecker(["user_management.read"]))
 ):
     return {"user": user}
 
-@router.post("/login", response_model=TokenResponse)
+@router.post(
+    "/login",
+    response_model=TokenResponse,
+    dependencies=[Depends(RateLimiter("login", 10, 60, scope="ip"))],
+)
 def login_user(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    # Get user's roles and permissions
+    # Get user's roles and permissions (version read first, see /introspect)
+    perm_version = Oauth2AsAccessor().get_permission_versions(user.user_id)
     roles = crud.get_user_roles(db, user.user_id)
     permissions = crud.get_user_permissions(db, user.user_id)
     
-    # Generate an opaque token to return to the client
-    opaque_token = secrets.token_hex(16)
-    
     # Create token payload with metadata
     current_time = int(time.time())
     expiry_time = current_time + (TOKEN_EXPIRY_HOURS * 3600)
+    jti = secrets.token_hex(8)  # JWT ID for uniqueness
+
+    if SIGNED_ACCESS_TOKENS and signed_tokens_enabled():
+        # Verifiable locally by every service; still stored below so
+        # introspection, session listing and revocation keep working
+        opaque_token, claims = issue_signed_token(
+            user.user_id, user.tenant_id, roles, permissions, expiry_time - current_time, perm_version
+        )
+        current_time, expiry_time, jti = claims["iat"], claims["exp"], claims["jti"]
+    else:
+        # Generate an opaque token to return to the client
+        opaque_token = secrets.token_hex(16)
     
-    # Full metadata payload
+    # Full metadata payload, served directly by /introspect
     token_payload = {
         "user_id": user.user_id,
         "tenant_id": user.tenant_id,
-        "email": form_data.username,
+        "email": user.email,
         "roles": roles,
         "permissions": permissions,
         "token_type": "access",
         "iat": current_time,
         "exp": expiry_time,
-        "jti": secrets.token_hex(8),  # JWT ID for uniqueness
+        "jti": jti,
+        "perm_version": perm_version,
     }
     
     # Store the mapping between opaque token and JWT payload in Redis
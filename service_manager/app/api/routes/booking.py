@@ -12,6 +12,26 @@ from sqlalchemy.orm import joinedload
 from app.database.models import Booking, BookingStatus, RouteStatus, Shift, ShiftRoute, ShiftRouteStop, Vendor, Vendor
 from common_utils.auth.permission_checker import PermissionChecker
 from app.database.database import get_db
+from app.database.session_router import get_async_read_db
+from app.utils.rate_limit import RateLimiter
+from app.crud.tenant_config import aget_tenant_config, get_tenant_config
+from app.crud.shift_routes import (
+    bulk_update_routes,
+    confirm_bookings,
+    confirmed_booking_ids,
+    duplicates,
+    first_free_route_number,
+    insert_routes,
+    insert_stops,
+    load_bookings,
+    load_routes,
+    load_stops,
+    lock_shift_routes,
+    replace_stops,
+    route_fingerprint,
+    set_bookings_status,
+    stop_rows,
+)
 router = APIRouter(tags=["Admin Bookings"])
 logger = logging.getLogger(__name__)
 import traceback
@@ -132,12 +152,14 @@ from app.database.models import Shift, Booking
 from app.api.schemas.schemas import ShiftsByDateResponse, BookingOut
 from common_utils.auth.permission_checker import PermissionChecker
 from app.database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 @router.get("/admin/shift-bookings/")
-def get_shift_bookings_by_date(
+async def get_shift_bookings_by_date(
     date: str = Query(..., description="Date to filter bookings, format: YYYY-MM-DD"),
     token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Admin endpoint to fetch all shifts with bookings for a specific date.
@@ -155,8 +177,9 @@ def get_shift_bookings_by_date(
             logger.error(f"[{request_id}] Invalid date format: {date}")
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        # Fetch all shifts for this tenant
-        shifts = db.query(Shift).filter(Shift.tenant_id == tenant_id).all()
+        # All shifts of this tenant, from the config cache
+        config = await aget_tenant_config(tenant_id)
+        shifts = list(config.shifts.values()) if config else []
         if not shifts:
             logger.warning(f"[{request_id}] No shifts configured for tenant_id={tenant_id}")
             raise HTTPException(status_code=404, detail="No shifts configured for this tenant")
@@ -165,17 +188,18 @@ def get_shift_bookings_by_date(
         shifts_data = []
         total_bookings = 0
 
-        # Loop over shifts and count bookings directly
-        for shift in shifts:
-            booking_count = (
-                db.query(Booking)
-                .filter(
-                    Booking.tenant_id == tenant_id,
-                    Booking.shift_id == shift.id,
-                    Booking.booking_date == filter_date
-                )
-                .count()
+        # Count bookings for every shift in one grouped query
+        counts = dict((await db.execute(
+            select(Booking.shift_id, func.count(Booking.booking_id))
+            .where(
+                Booking.tenant_id == tenant_id,
+                Booking.booking_date == filter_date
             )
+            .group_by(Booking.shift_id)
+        )).all())
+
+        for shift in shifts:
+            booking_count = counts.get(shift.id, 0)
 
             if booking_count > 0:
                 total_bookings += booking_count
@@ -210,7 +234,7 @@ def get_shift_bookings_by_date(
         }
 
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"[{request_id}] IntegrityError: {str(e.orig)}")
         return {
             "status": "error",
@@ -220,7 +244,7 @@ def get_shift_bookings_by_date(
             "data": {}
         }
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"[{request_id}] SQLAlchemyError: {str(e)}")
         return {
             "status": "error",
@@ -250,13 +274,13 @@ def get_shift_bookings_by_date(
 
 
 @router.get("/admin/shift-booking-details/")
-def get_shift_booking_details(
+async def get_shift_booking_details(
     shift_id: int = Query(..., description="ID of the shift"),
     date: str = Query(..., description="Date to filter bookings, format: YYYY-MM-DD"),
     page: int = Query(1, ge=1, description="Page number (starting from 1)"),
     limit: int = Query(10, ge=1, le=100, description="Number of bookings per page"),
     token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Admin endpoint to fetch bookings for a specific shift and date with pagination.
@@ -274,30 +298,36 @@ def get_shift_booking_details(
             logger.error(f"[{request_id}] Invalid date format: {date}")
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        # Fetch shift and verify it belongs to tenant
-        shift = db.query(Shift).filter(Shift.id == shift_id, Shift.tenant_id == tenant_id).first()
+        # Shift of this tenant, from the config cache
+        config = await aget_tenant_config(tenant_id)
+        shift = config.shift(shift_id) if config else None
         if not shift:
             logger.warning(f"[{request_id}] Shift not found for tenant_id={tenant_id}, shift_id={shift_id}")
             raise HTTPException(status_code=404, detail="Shift not found for this tenant")
 
-        # Base query for bookings
-        bookings_query = (
-            db.query(Booking)
-            .options(joinedload(Booking.employee))
-            .filter(
-                Booking.shift_id == shift_id,
-                Booking.booking_date == filter_date
-            )
+        # Base filter for bookings
+        booking_filter = (
+            Booking.shift_id == shift_id,
+            Booking.booking_date == filter_date
         )
 
-        total_bookings_count = bookings_query.count()
+        total_bookings_count = await db.scalar(
+            select(func.count(Booking.booking_id)).where(*booking_filter)
+        )
 
         if total_bookings_count == 0:
             logger.info(f"[{request_id}] No bookings found for shift_id={shift_id} on date={date}")
             raise HTTPException(status_code=200, detail="No bookings found for this shift on the selected date")
 
         # Apply pagination
-        bookings = bookings_query.offset((page - 1) * limit).limit(limit).all()
+        bookings = (await db.scalars(
+            select(Booking)
+            .options(joinedload(Booking.employee))
+            .where(*booking_filter)
+            .order_by(Booking.booking_id)
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )).all()
 
         # Prepare bookings data
         booking_list = [
@@ -345,7 +375,7 @@ def get_shift_booking_details(
         }
 
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"[{request_id}] IntegrityError: {str(e.orig)}")
         return {
             "status": "error",
@@ -355,7 +385,7 @@ def get_shift_booking_details(
             "data": {}
         }
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"[{request_id}] SQLAlchemyError: {str(e)}")
         return {
             "status": "error",
@@ -389,18 +419,26 @@ import uuid
 import math
 from datetime import date, datetime
 
+from functools import lru_cache
+
 import requests
-import numpy as np
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-# If sklearn is unavailable, we will gracefully fallback to pure-python clustering
-try:
-    from sklearn.cluster import DBSCAN
-    _SKLEARN_AVAILABLE = True
-except Exception:
-    _SKLEARN_AVAILABLE = False
+
+@lru_cache(maxsize=None)
+def _dbscan():
+    """
+    sklearn's DBSCAN, imported on the first clustering (sklearn and scipy take
+    over a second to import). None if sklearn is unavailable, in which case we
+    gracefully fallback to pure-python clustering.
+    """
+    try:
+        from sklearn.cluster import DBSCAN
+        return DBSCAN
+    except Exception:
+        return None
 
 # ---- Config knobs (env overrideable) ----
 CAR_CAPACITY: int = int(os.getenv("ROUTE_CAR_CAPACITY", "3"))                # vehicle seats
@@ -510,6 +548,8 @@ def _cluster_bookings(bookings: List, capacity: int, max_radius_km: float, logge
     if not bookings:
         return []
 
+    import numpy as np
+
     coords = np.array([_coords_of(b) for b in bookings], dtype=float)
     # Filter out invalid coords proactively
     valid_mask = np.array([
@@ -521,7 +561,8 @@ def _cluster_bookings(bookings: List, capacity: int, max_radius_km: float, logge
     if not bookings:
         return []
 
-    if _SKLEARN_AVAILABLE:
+    DBSCAN = _dbscan()
+    if DBSCAN is not None:
         # DBSCAN expects radians for haversine metric
         db = DBSCAN(
             eps=max_radius_km / KMS_PER_RADIAN,
@@ -620,11 +661,53 @@ def _build_google_route(group: List, drop_lat: float, drop_lng: float, api_key:
 
     return ordered, total_distance_km, total_duration_min
 
+def _plan_route(group: List, route_number: int, drop_lat: float, drop_lng: float, drop_addr: str,
+                request_id: str) -> RouteSuggestion:
+    """
+    RouteSuggestion for bookings (with valid pickup coordinates) in Google's
+    order; keeps the given order when Google fails. Call it outside any
+    route lock: it makes a network round trip.
+    """
+    try:
+        ordered_group, total_km, total_min = _build_google_route(group, drop_lat, drop_lng, GOOGLE_MAPS_API_KEY)
+    except HTTPException as e:
+        logger.warning(f"[{request_id}] Google route failure: {e.detail}")
+        ordered_group, total_km, total_min = group, 0.0, 0
+
+    return RouteSuggestion(
+        route_number=route_number,
+        booking_ids=[str(b.booking_id) for b in ordered_group],
+        pickups=[
+            PickupDetail(
+                booking_id=str(b.booking_id),
+                employee_name=(b.employee.name if b.employee else None),
+                latitude=float(b.pickup_location_latitude),
+                longitude=float(b.pickup_location_longitude),
+                address=b.pickup_location,
+                landmark=(b.employee.landmark if b.employee else None),
+            )
+            for b in ordered_group
+        ],
+        estimated_distance_km=round(total_km, 2),
+        estimated_duration_min=int(total_min),
+        drop_lat=drop_lat,
+        drop_lng=drop_lng,
+        drop_address=drop_addr,
+    )
+
+
 # ---- Endpoint ----
-@router.post("/admin/routes/suggest", response_model=RouteSuggestionResponse)
+suggest_routes_auth = PermissionChecker(["cutoff.create"])
+
+
+@router.post(
+    "/admin/routes/suggest",
+    response_model=RouteSuggestionResponse,
+    dependencies=[Depends(RateLimiter("suggest_routes", 10, 60, scope="tenant", auth=suggest_routes_auth))],
+)
 def suggest_routes(
     payload: RouteSuggestionRequest,
-    token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
+    token_data: dict = Depends(suggest_routes_auth),
     db: Session = Depends(get_db)
 ):
     """
@@ -635,7 +718,7 @@ def suggest_routes(
     tenant_id = token_data.get("tenant_id")
     logger.info(
         f"[{request_id}] RouteSuggest init: tenant_id={tenant_id}, shift_id={payload.shift_id}, date={payload.date}, "
-        f"capacity={CAR_CAPACITY}, radius_km={MAX_RADIUS_KM}, sklearn={_SKLEARN_AVAILABLE}"
+        f"capacity={CAR_CAPACITY}, radius_km={MAX_RADIUS_KM}, sklearn={_dbscan() is not None}"
     )
 
     try:
@@ -647,20 +730,14 @@ def suggest_routes(
         if filter_date < date.today():
             raise HTTPException(status_code=400, detail="Date cannot be in the past")
 
-        # Fetch shift & tenant
-        shift = db.query(Shift).filter(
-            Shift.id == payload.shift_id,
-            Shift.tenant_id == tenant_id
-        ).first()
-        if not shift or not shift.tenant:
+        # Shift & tenant from the config cache
+        tenant = get_tenant_config(tenant_id)
+        shift = tenant.shift(payload.shift_id) if tenant else None
+        if not shift:
             raise HTTPException(status_code=404, detail="Shift or tenant not found")
-
-        tenant = shift.tenant
-        try:
-            DROP_LAT = float(tenant.latitude)
-            DROP_LNG = float(tenant.longitude)
-        except (TypeError, ValueError):
+        if tenant.office_lat is None or tenant.office_lng is None:
             raise HTTPException(status_code=400, detail="Invalid tenant location data")
+        DROP_LAT, DROP_LNG = tenant.office_lat, tenant.office_lng
 
         # Fetch bookings for the date
         bookings: List[Booking] = db.query(Booking).filter(
@@ -673,14 +750,17 @@ def suggest_routes(
         # Get all confirmed booking IDs for this shift/date
         confirmed_booking_ids = {
             str(bid) for (bid,) in db.query(ShiftRouteStop.booking_id)
-            .join(ShiftRoute, ShiftRouteStop.shift_route_id == ShiftRoute.id)
+            .join(ShiftRoute, (ShiftRouteStop.shift_route_id == ShiftRoute.id)
+                  & (ShiftRouteStop.route_date == ShiftRoute.route_date))
             .filter(
                 ShiftRoute.shift_id == payload.shift_id,
                 ShiftRoute.route_date == filter_date,
+                ShiftRouteStop.route_date == filter_date,
                 ShiftRoute.status == RouteStatus.CONFIRMED
             ).all()
         }
-        logger.info(f"[{request_id}] Confirmed booking_ids excluded: {confirmed_booking_ids}")
+        logger.info(f"[{request_id}] Confirmed bookings excluded: {len(confirmed_booking_ids)}")
+        logger.debug(f"[{request_id}] Confirmed booking_ids excluded: {confirmed_booking_ids}")
 
         # Filter out confirmed bookings & invalid coords
         valid_bookings: List[Booking] = [
@@ -689,7 +769,9 @@ def suggest_routes(
             and _validate_coord(getattr(b, "pickup_location_latitude", None))
             and _validate_coord(getattr(b, "pickup_location_longitude", None))
         ]
-        logger.info(f"[{request_id}] Valid bookings for clustering: {[b.booking_id for b in valid_bookings]}")
+        logger.info(f"[{request_id}] Valid bookings for clustering: {len(valid_bookings)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[{request_id}] Valid booking_ids for clustering: {[b.booking_id for b in valid_bookings]}")
 
         if not valid_bookings:
             raise HTTPException(status_code=400, detail="No valid bookings available for route suggestion")
@@ -717,7 +799,7 @@ def suggest_routes(
                 ordered_group, total_km, total_min = group, 0.0, 0
 
             booking_ids = [str(b.booking_id) for b in ordered_group]
-            logger.info(f"[{request_id}] Suggested route #{route_idx} booking_ids: {booking_ids}")
+            logger.debug(f"[{request_id}] Suggested route #{route_idx} booking_ids: {booking_ids}")
 
             suggested_routes.append(
                 RouteSuggestion(
@@ -822,18 +904,15 @@ def confirm_routes(
         if route_date < date.today():
             raise HTTPException(status_code=400, detail="Date cannot be in the past")
 
-        # 2) Validate shift & tenant
-        shift = db.query(Shift).filter(Shift.id == payload.shift_id, Shift.tenant_id == tenant_id).first()
-        if not shift or not shift.tenant:
+        # 2) Validate shift & tenant (config cache)
+        tenant = get_tenant_config(tenant_id)
+        shift = tenant.shift(payload.shift_id) if tenant else None
+        if not shift:
             raise HTTPException(status_code=404, detail="Shift or tenant not found")
-
-        tenant = shift.tenant
-        try:
-            default_drop_lat = float(tenant.latitude)
-            default_drop_lng = float(tenant.longitude)
-            default_drop_addr = tenant.address or "Office"
-        except (TypeError, ValueError):
+        if tenant.office_lat is None or tenant.office_lng is None:
             raise HTTPException(status_code=400, detail="Invalid tenant location data")
+        default_drop_lat, default_drop_lng = tenant.office_lat, tenant.office_lng
+        default_drop_addr = tenant.address or "Office"
 
         # 3) Collect booking IDs from payload
         all_ids = []
@@ -843,56 +922,41 @@ def confirm_routes(
             all_ids.extend([str(b) for b in r.booking_ids])
 
         # 4) Ensure no duplicates in request
-        if len(all_ids) != len(set(all_ids)):
-            dupes = sorted({bid for bid in all_ids if all_ids.count(bid) > 1})
+        dupes = duplicates(all_ids)
+        if dupes:
             raise HTTPException(status_code=400, detail=f"Duplicate booking(s) in request: {', '.join(dupes)}")
 
-        # 5) Check for already confirmed bookings
-        existing_conflicts = (
-            db.query(ShiftRouteStop.booking_id)
-            .join(ShiftRoute, ShiftRouteStop.shift_route_id == ShiftRoute.id)
-            .filter(
-                ShiftRoute.shift_id == payload.shift_id,
-                ShiftRoute.route_date == route_date,
-                ShiftRoute.status == RouteStatus.CONFIRMED,
-                ShiftRouteStop.booking_id.in_(set(all_ids)),
-            )
-            .all()
-        )
-        if existing_conflicts:
-            already = [bid for (bid,) in existing_conflicts]
-            raise HTTPException(status_code=400, detail=f"Bookings already confirmed in another route: {already}")
+        try:
+            booking_ids = [int(bid) for bid in all_ids]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="booking_ids must be integers")
 
-        # 6) Fetch bookings
+        # 5) Fetch bookings
         bookings_map: Dict[str, Booking] = {
             str(b.booking_id): b
             for b in db.query(Booking)
+            .options(joinedload(Booking.employee))
             .filter(
-                Booking.booking_id.in_(set(all_ids)),
+                Booking.booking_id.in_(booking_ids),
                 Booking.shift_id == payload.shift_id,
                 Booking.booking_date == route_date,
             )
             .all()
         }
-        if len(bookings_map) != len(set(all_ids)):
-            missing = [bid for bid in set(all_ids) if bid not in bookings_map]
+        if len(bookings_map) != len(all_ids):
+            missing = [bid for bid in all_ids if bid not in bookings_map]
             raise HTTPException(status_code=400, detail=f"Unknown booking_ids for this shift/date: {missing}")
+        # Release the connection during the Google calls; the loaded bookings
+        # (and their employees) stay readable once detached
+        db.close()
 
         # Helper to validate coords
         def _ok(b: Booking) -> bool:
             return _validate_coord(getattr(b, "pickup_location_latitude", None)) and \
                    _validate_coord(getattr(b, "pickup_location_longitude", None))
 
+        # 6) Order and build every route, outside the lock; numbered below
         out_routes: List[RouteSuggestion] = []
-        now = datetime.utcnow()
-
-        # 7) Get max route_number already used for this shift/date
-        max_route_number = db.query(func.coalesce(func.max(ShiftRoute.route_number), 0)) \
-                             .filter(ShiftRoute.shift_id == payload.shift_id,
-                                     ShiftRoute.route_date == route_date).scalar()
-        next_route_number = max_route_number + 1
-
-        # 8) Process each route
         for item in payload.routes:
             drop_lat = item.drop_lat if item.drop_lat is not None else default_drop_lat
             drop_lng = item.drop_lng if item.drop_lng is not None else default_drop_lng
@@ -909,71 +973,41 @@ def confirm_routes(
             if invalid_ids:
                 raise HTTPException(status_code=400, detail=f"Invalid coords: {invalid_ids}")
 
-            # Optional: Google optimization
-            group = raw_group
-            try:
-                ordered_group, total_km, total_min = _build_google_route(group, drop_lat, drop_lng, GOOGLE_MAPS_API_KEY)
-            except HTTPException as e:
-                logger.warning(f"[{request_id}] Google route failure: {e.detail}")
-                ordered_group, total_km, total_min = group, 0.0, 0
-
-            dto = RouteSuggestion(
-                route_number=next_route_number,
-                booking_ids=[str(b.booking_id) for b in ordered_group],
-                pickups=[
-                    PickupDetail(
-                        booking_id=str(b.booking_id),
-                        employee_name=(b.employee.name if b.employee else None),
-                        latitude=float(b.pickup_location_latitude),
-                        longitude=float(b.pickup_location_longitude),
-                        address=b.pickup_location,
-                        landmark=(b.employee.landmark if b.employee else None),
-                    )
-                    for b in ordered_group
-                ],
-                estimated_distance_km=round(total_km, 2),
-                estimated_duration_min=int(total_min),
-                drop_lat=drop_lat,
-                drop_lng=drop_lng,
-                drop_address=drop_addr,
-            )
-
-            # Insert ShiftRoute
-            route_row = ShiftRoute(
-                shift_id=payload.shift_id,
-                route_date=route_date,
-                route_number=next_route_number,
-                route_data=jsonable_encoder(dto),
-                status=RouteStatus.CONFIRMED,
-            )
-            db.add(route_row)
-            db.flush()
-            logger.info(f"[{request_id}] ShiftRoute created with ID={route_row.id}, route_number={next_route_number}")
-
-            # Insert stops
-            for pos, b in enumerate(dto.pickups, start=1):
-                db.add(
-                    ShiftRouteStop(
-                        shift_route_id=route_row.id,
-                        position=pos,
-                        booking_id=b.booking_id,
-                        employee_name=b.employee_name,
-                        pickup_lat=b.latitude,
-                        pickup_lng=b.longitude,
-                        pickup_address=b.address,
-                        landmark=b.landmark,
-                    )
-                )
-                logger.info(f"[{request_id}] ShiftRouteStop added booking_id={b.booking_id}, pos={pos}")
+            out_routes.append(_plan_route(raw_group, 0, drop_lat, drop_lng, drop_addr, request_id))
 
-            # Update booking status → CONFIRMED
-            for b in ordered_group:
-                b.status = BookingStatus.CONFIRMED
-                b.updated_at = now
-                logger.info(f"[{request_id}] Booking status updated CONFIRMED booking_id={b.booking_id}")
+        # 7) Serialise confirms for this shift/date, then check for already confirmed bookings
+        now = datetime.utcnow()
+        lock_shift_routes(db, payload.shift_id, route_date)
+        already = confirmed_booking_ids(db, payload.shift_id, route_date, booking_ids)
+        if already:
+            raise HTTPException(status_code=400, detail=f"Bookings already confirmed in another route: {already}")
 
-            out_routes.append(dto)
-            next_route_number += 1  # Increment for next route
+        # 8) Next free route_number; stable while the lock is held
+        first_number = first_free_route_number(db, payload.shift_id, route_date)
+        for offset, dto in enumerate(out_routes):
+            dto.route_number = first_number + offset
+
+        # 9) Write routes, stops and booking status as three statements
+        route_ids = insert_routes(db, [
+            {
+                "shift_id": payload.shift_id,
+                "route_date": route_date,
+                "route_number": dto.route_number,
+                "route_data": jsonable_encoder(dto),
+                "status": RouteStatus.CONFIRMED,
+            }
+            for dto in out_routes
+        ])
+        insert_stops(db, [
+            row
+            for (route_id, _), dto in zip(route_ids, out_routes)
+            for row in stop_rows(route_id, route_date, dto.pickups)
+        ])
+        confirm_bookings(db, route_date, booking_ids, now)
+        logger.info(
+            f"[{request_id}] Confirmed {len(out_routes)} routes with {len(all_ids)} bookings, "
+            f"route_numbers={[number for _, number in route_ids]}"
+        )
 
         db.commit()
 
@@ -1010,14 +1044,14 @@ from math import ceil
 
 
 @router.get("/admin/routes/", response_model=RouteSuggestionResponse)
-def get_routes(
+async def get_routes(
     shift_id: int = Query(..., description="Filter by shift ID"),
     route_number: Optional[int] = Query(None, description="Filter by route number"),
     route_date: date = Query(..., description="Filter by route date in YYYY-MM-DD"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of routes per page"),
     token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get confirmed routes with all booking details.
@@ -1032,37 +1066,53 @@ def get_routes(
     )
 
     try:
-        # Validate tenant and shift
-        shift = db.query(Shift).filter(Shift.id == shift_id, Shift.tenant_id == tenant_id).first()
+        # Validate tenant and shift (config cache)
+        config = await aget_tenant_config(tenant_id)
+        shift = config.shift(shift_id) if config else None
         if not shift:
             raise HTTPException(status_code=404, detail="Shift not found for this tenant")
 
-        # Base query
-        query = db.query(ShiftRoute).filter(
+        # Base filter
+        route_filter = [
             ShiftRoute.shift_id == shift_id,
             ShiftRoute.status == RouteStatus.CONFIRMED,
             ShiftRoute.route_date == route_date
-        )
+        ]
 
         if route_number:
-            query = query.filter(ShiftRoute.route_number == route_number)
+            route_filter.append(ShiftRoute.route_number == route_number)
 
         # Pagination
-        total_routes = query.count()
+        total_routes = await db.scalar(select(func.count(ShiftRoute.id)).where(*route_filter))
         total_pages = ceil(total_routes / page_size) if total_routes else 1
         offset = (page - 1) * page_size
 
-        routes: List[ShiftRoute] = query.order_by(
-            ShiftRoute.route_date.desc(),
-            ShiftRoute.route_number.asc()
-        ).offset(offset).limit(page_size).all()
+        routes: List[ShiftRoute] = (await db.scalars(
+            select(ShiftRoute)
+            .where(*route_filter)
+            .order_by(ShiftRoute.route_date.desc(), ShiftRoute.route_number.asc())
+            .offset(offset)
+            .limit(page_size)
+        )).all()
+
+        # Load the stops of every route on the page in one query
+        stops_by_route = {route.id: [] for route in routes}
+        if routes:
+            page_stops = await db.scalars(
+                select(ShiftRouteStop)
+                .where(
+                    ShiftRouteStop.route_date.in_({route.route_date for route in routes}),
+                    ShiftRouteStop.shift_route_id.in_(stops_by_route.keys()),
+                )
+                .order_by(ShiftRouteStop.shift_route_id, ShiftRouteStop.position)
+            )
+            for stop in page_stops:
+                stops_by_route[stop.shift_route_id].append(stop)
 
         response_routes: List[RouteSuggestion] = []
 
         for route in routes:
-            stops = db.query(ShiftRouteStop).filter(
-                ShiftRouteStop.shift_route_id == route.id
-            ).order_by(ShiftRouteStop.position).all()
+            stops = stops_by_route[route.id]
 
             pickups = []
             booking_ids = []
@@ -1142,69 +1192,52 @@ def update_route(
         if route_date < date.today():
             raise HTTPException(status_code=400, detail="Date cannot be in the past")
 
-        # Validate shift & tenant
-        shift = db.query(Shift).filter(
-            Shift.id == payload.shift_id, Shift.tenant_id == tenant_id
-        ).first()
+        # Validate shift & tenant (config cache)
+        tenant = get_tenant_config(tenant_id)
+        shift = tenant.shift(payload.shift_id) if tenant else None
         if not shift:
             raise HTTPException(status_code=404, detail="Shift not found")
-        tenant = shift.tenant
-        try:
-            default_drop_lat = float(tenant.latitude)
-            default_drop_lng = float(tenant.longitude)
-            default_drop_addr = tenant.address or "Office"
-        except (TypeError, ValueError):
+        if tenant.office_lat is None or tenant.office_lng is None:
             raise HTTPException(status_code=400, detail="Invalid tenant location data")
-
+        default_drop_lat, default_drop_lng = tenant.office_lat, tenant.office_lng
+        default_drop_addr = tenant.address or "Office"
+
+        # Validate the edit as a whole before touching the database
+        route_numbers = [item.route_number for item in payload.routes]
+        dupes = duplicates(route_numbers)
+        if dupes:
+            raise HTTPException(status_code=400, detail=f"Duplicate route_number(s) in request: {dupes}")
+        dupes = duplicates(bid for item in payload.routes for bid in item.booking_ids)
+        if dupes:
+            raise HTTPException(status_code=400, detail=f"Duplicate booking(s) in request: {dupes}")
+
+        # Load routes, their stops and the requested bookings
+        routes = load_routes(db, payload.shift_id, route_date, route_numbers)
+        missing_routes = [number for number in route_numbers if number not in routes]
+        if missing_routes:
+            raise HTTPException(status_code=404, detail=f"Route {missing_routes[0]} not found")
+        stops = load_stops(db, route_date, [route.id for route in routes.values()])
+        fingerprint = route_fingerprint(routes, stops)
+        new_booking_ids = {bid for item in payload.routes for bid in item.booking_ids}
+        bookings_map = load_bookings(db, payload.shift_id, route_date, new_booking_ids)
+        missing_ids = new_booking_ids - set(bookings_map)
+        if missing_ids:
+            raise HTTPException(status_code=400, detail=f"Unknown booking_ids: {sorted(missing_ids)}")
+        # Release the connection during the Google calls; the loaded rows
+        # stay readable once detached
+        db.close()
+
+        # Compute the new state in memory, outside the lock
         now = datetime.utcnow()
         out_routes: List[RouteSuggestion] = []
-
+        route_rows, stop_values = [], []
         for item in payload.routes:
-            # Ensure route_number is provided
-            if not hasattr(item, "route_number"):
-                raise HTTPException(status_code=400, detail="route_number missing in payload item")
+            route_row = routes[item.route_number]
 
-            # Fetch existing route
-            route_row = db.query(ShiftRoute).filter(
-                ShiftRoute.shift_id == payload.shift_id,
-                ShiftRoute.route_date == route_date,
-                ShiftRoute.route_number == item.route_number
-            ).first()
-            if not route_row:
-                raise HTTPException(status_code=404, detail=f"Route {item.route_number} not found")
-
-            # Current bookings
-            current_stops = db.query(ShiftRouteStop).filter(
-                ShiftRouteStop.shift_route_id == route_row.id
-            ).all()
-            current_booking_ids = {str(s.booking_id) for s in current_stops}
-            new_booking_ids = {str(bid) for bid in item.booking_ids}
-
-            # Reset removed bookings to PENDING
-            removed_ids = current_booking_ids - new_booking_ids
-            if removed_ids:
-                db.query(Booking).filter(Booking.booking_id.in_([int(bid) for bid in removed_ids])).update(
-                    {Booking.status: BookingStatus.PENDING},
-                    synchronize_session=False
-                )
-                logger.info(f"[{request_id}] Reset removed bookings: {removed_ids}")
-
-            # Fetch and map all new bookings
-            bookings_map = {
-                str(b.booking_id): b for b in db.query(Booking).filter(
-                    Booking.booking_id.in_([int(bid) for bid in new_booking_ids]),
-                    Booking.shift_id == payload.shift_id,
-                    Booking.booking_date == route_date
-                ).all()
-            }
-            missing_ids = new_booking_ids - set(bookings_map.keys())
-            if missing_ids:
-                raise HTTPException(status_code=400, detail=f"Unknown booking_ids: {missing_ids}")
-
-            # Validate coordinates
+            # Validate coordinates, keeping the admin's order
             valid_bookings = []
             invalid_ids = []
-            for bid in new_booking_ids:
+            for bid in item.booking_ids:
                 b = bookings_map[bid]
                 if _validate_coord(getattr(b, "pickup_location_latitude", None)) and \
                    _validate_coord(getattr(b, "pickup_location_longitude", None)):
@@ -1218,54 +1251,37 @@ def update_route(
             drop_lat = getattr(item, "drop_lat", None) or default_drop_lat
             drop_lng = getattr(item, "drop_lng", None) or default_drop_lng
             drop_addr = getattr(item, "drop_address", None) or default_drop_addr
-            try:
-                ordered_group, total_km, total_min = _build_google_route(valid_bookings, drop_lat, drop_lng, GOOGLE_MAPS_API_KEY)
-            except HTTPException:
-                ordered_group, total_km, total_min = valid_bookings, 0.0, 0
-
-            # Clear previous stops
-            db.query(ShiftRouteStop).filter(ShiftRouteStop.shift_route_id == route_row.id).delete()
-
-            # Insert updated stops & mark as CONFIRMED
-            for pos, b in enumerate(ordered_group, start=1):
-                db.add(
-                    ShiftRouteStop(
-                        shift_route_id=route_row.id,
-                        position=pos,
-                        booking_id=b.booking_id,
-                        employee_name=(b.employee.name if b.employee else None),
-                        pickup_lat=float(b.pickup_location_latitude),
-                        pickup_lng=float(b.pickup_location_longitude),
-                        pickup_address=b.pickup_location,
-                        landmark=(b.employee.landmark if b.employee else None)
-                    )
-                )
-                b.status = BookingStatus.CONFIRMED
-                b.updated_at = now
-
-            # Update route metadata
-            route_row.route_data = jsonable_encoder(RouteSuggestion(
-                route_number=item.route_number,
-                booking_ids=[str(b.booking_id) for b in ordered_group],
-                pickups=[
-                    PickupDetail(
-                        booking_id=str(b.booking_id),
-                        employee_name=(b.employee.name if b.employee else None),
-                        latitude=float(b.pickup_location_latitude),
-                        longitude=float(b.pickup_location_longitude),
-                        address=b.pickup_location,
-                        landmark=(b.employee.landmark if b.employee else None)
-                    )
-                    for b in ordered_group
-                ],
-                estimated_distance_km=round(total_km, 2),
-                estimated_duration_min=int(total_min),
-                drop_lat=drop_lat,
-                drop_lng=drop_lng,
-                drop_address=drop_addr
-            ))
-            db.flush()
-            out_routes.append(route_row.route_data)
+            dto = _plan_route(valid_bookings, item.route_number, drop_lat, drop_lng, drop_addr, request_id)
+            route_rows.append({"id": route_row.id, "route_data": jsonable_encoder(dto)})
+            stop_values.extend(stop_rows(route_row.id, route_date, dto.pickups))
+            out_routes.append(dto)
+
+        # Lock, then make sure nothing changed since the routes were loaded
+        lock_shift_routes(db, payload.shift_id, route_date)
+        locked_routes = load_routes(db, payload.shift_id, route_date, route_numbers)
+        locked_stops = load_stops(db, route_date, [route.id for route in locked_routes.values()])
+        if route_fingerprint(locked_routes, locked_stops) != fingerprint:
+            raise HTTPException(status_code=409, detail="Routes were changed by another request; reload and retry")
+        already = confirmed_booking_ids(
+            db, payload.shift_id, route_date, list(new_booking_ids),
+            exclude_route_ids=[route.id for route in routes.values()],
+        )
+        if already:
+            raise HTTPException(status_code=400, detail=f"Bookings already confirmed in another route: {sorted(already)}")
+
+        # Bookings dropped from every edited route go back to PENDING
+        current_booking_ids = {s.booking_id for route_stops in stops.values() for s in route_stops}
+        removed_ids = sorted(current_booking_ids - new_booking_ids)
+
+        # Apply: routes, stops, then booking status
+        bulk_update_routes(db, route_date, route_rows, updated_at=now)
+        replace_stops(db, route_date, [row["id"] for row in route_rows], stop_values)
+        set_bookings_status(db, route_date, removed_ids, BookingStatus.PENDING, now)
+        confirm_bookings(db, route_date, sorted(new_booking_ids), now)
+        logger.info(
+            f"[{request_id}] Updated {len(route_rows)} routes, {len(stop_values)} stops; "
+            f"reset removed bookings: {removed_ids}"
+        )
 
         db.commit()
 
@@ -1325,15 +1341,9 @@ def assign_vendor_to_routes(
     logger.info(f"[{request_id}] Assigning vendor for shift_id={payload.shift_id}, date={payload.date}")
 
     try:
-        vendor = db.query(Vendor).filter(Vendor.id == payload.vendor_id).first()
-        if not vendor:
-            logger.warning(f"[{request_id}] Vendor {payload.vendor_id} not found")
-            raise HTTPException(status_code=404, detail="Vendor not found")
-        # Validate shift & tenant
-        shift = db.query(Shift).filter(
-            Shift.id == payload.shift_id,
-            Shift.tenant_id == tenant_id
-        ).first()
+        # Validate shift & tenant (config cache)
+        tenant = get_tenant_config(tenant_id)
+        shift = tenant.shift(payload.shift_id) if tenant else None
         if not shift:
             raise HTTPException(status_code=404, detail="Shift not found for this tenant")
 
@@ -1341,58 +1351,75 @@ def assign_vendor_to_routes(
         if route_date < date.today():
             raise HTTPException(status_code=400, detail="Date cannot be in the past")
 
-        out_routes: List[RouteSuggestion] = []
-
-        for item in payload.routes:
-            # Fetch route by route_number instead of route_id
-            route_row = db.query(ShiftRoute).filter(
-                ShiftRoute.shift_id == payload.shift_id,
-                ShiftRoute.route_date == route_date,
-                ShiftRoute.route_number == item.route_number
-            ).first()
-
-            if not route_row:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Route number {item.route_number} not found for shift {payload.shift_id} on {route_date}"
-                )
+        route_numbers = [item.route_number for item in payload.routes]
+        dupes = duplicates(route_numbers)
+        if dupes:
+            raise HTTPException(status_code=400, detail=f"Duplicate route_number(s) in request: {dupes}")
+
+        # All vendors of the request in one query
+        vendor_ids = {item.vendor_id for item in payload.routes}
+        found_vendor_ids = set(db.scalars(
+            select(Vendor.vendor_id).where(Vendor.vendor_id.in_(vendor_ids), Vendor.tenant_id == tenant_id)
+        ).all())
+        missing_vendors = sorted(vendor_ids - found_vendor_ids)
+        if missing_vendors:
+            logger.warning(f"[{request_id}] Vendor {missing_vendors[0]} not found")
+            raise HTTPException(status_code=404, detail="Vendor not found")
 
-            # Assign vendor/driver/vehicle
-            route_row.vendor_id = item.vendor_id
-            route_row.driver_id = item.driver_id
-            route_row.vehicle_id = item.vehicle_id
-            route_row.status = RouteStatus.ASSIGNED_TO_VENDOR
-            route_row.updated_at = datetime.utcnow()
-
-            logger.info(
-                f"[{request_id}] Route {route_row.route_number} "
-                f"(id={route_row.id}) assigned to vendor={item.vendor_id}, "
-                f"driver={item.driver_id}, vehicle={item.vehicle_id}"
+        # Routes and their stops: two queries
+        lock_shift_routes(db, payload.shift_id, route_date)
+        routes = load_routes(db, payload.shift_id, route_date, route_numbers)
+        missing_routes = [number for number in route_numbers if number not in routes]
+        if missing_routes:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Route number {missing_routes[0]} not found for shift {payload.shift_id} on {route_date}"
             )
+        stops = load_stops(db, route_date, [route.id for route in routes.values()])
+
+        # Assign vendor/driver/vehicle with one UPDATE ... FROM (VALUES ...)
+        bulk_update_routes(
+            db,
+            route_date,
+            [
+                {
+                    "id": routes[item.route_number].id,
+                    "vendor_id": item.vendor_id,
+                    "driver_id": item.driver_id,
+                    "vehicle_id": item.vehicle_id,
+                }
+                for item in payload.routes
+            ],
+            status=RouteStatus.ASSIGNED_TO_VENDOR,
+            updated_at=datetime.utcnow(),
+        )
+        logger.info(
+            f"[{request_id}] Routes {route_numbers} assigned: "
+            + ", ".join(f"{item.route_number}->vendor={item.vendor_id}/driver={item.driver_id}/vehicle={item.vehicle_id}"
+                        for item in payload.routes)
+        )
 
-            # Rebuild route response
-            stops = db.query(ShiftRouteStop).filter(
-                ShiftRouteStop.shift_route_id == route_row.id
-            ).order_by(ShiftRouteStop.position).all()
-
-            pickups = [
-                PickupDetail(
-                    booking_id=str(s.booking_id),
-                    employee_name=s.employee_name,
-                    latitude=s.pickup_lat,
-                    longitude=s.pickup_lng,
-                    address=s.pickup_address,
-                    landmark=s.landmark
-                )
-                for s in stops
-            ]
-
+        # Rebuild the response from what was loaded
+        out_routes: List[RouteSuggestion] = []
+        for item in payload.routes:
+            route_row = routes[item.route_number]
+            route_stops = stops.get(route_row.id, [])
             route_data = route_row.route_data or {}
             out_routes.append(
                 VendorRouteSuggestion(
                     route_number=route_row.route_number,
-                    booking_ids=[str(s.booking_id) for s in stops],
-                    pickups=pickups,
+                    booking_ids=[str(s.booking_id) for s in route_stops],
+                    pickups=[
+                        PickupDetail(
+                            booking_id=str(s.booking_id),
+                            employee_name=s.employee_name,
+                            latitude=s.pickup_lat,
+                            longitude=s.pickup_lng,
+                            address=s.pickup_address,
+                            landmark=s.landmark
+                        )
+                        for s in route_stops
+                    ],
                     estimated_distance_km=route_data.get("estimated_distance_km", 0.0),
                     estimated_duration_min=route_data.get("estimated_duration_min", 0),
                     drop_lat=route_data.get("drop_lat", 0.0),
@@ -1445,4 +1472,66 @@ def assign_vendor_to_routes(
             message="Unexpected error while updating routes",
             meta={"request_id": request_id, "generated_at": datetime.utcnow().isoformat()},
             data=None
-        )
\ No newline at end of file
+        )
+
+from fastapi import BackgroundTasks, File, Response, UploadFile
+from app.crud.roster_import import (
+    ROSTER_IMPORT_JOB,
+    roster_report_csv,
+    run_roster_import_job,
+    start_roster_import_job,
+)
+from app.utils.job_store import get_job_store
+
+
+def _get_roster_import_job(job_id: str, tenant_id: int) -> dict:
+    job = get_job_store().get(job_id)
+    if not job or job["kind"] != ROSTER_IMPORT_JOB or job["tenant_id"] != tenant_id:
+        raise HTTPException(status_code=404, detail="Roster import job not found.")
+    return job
+
+
+@router.post("/admin/roster-imports", status_code=202)
+def start_roster_import(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(..., description="CSV/XLSX with employee_code, shift_code, start_date[, end_date, weekdays]"),
+    token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
+):
+    """
+    Queue a roster upload that creates bookings in bulk.
+    Poll /admin/roster-imports/{job_id} for progress.
+    """
+    tenant_id = token_data.get("tenant_id")
+    try:
+        job, path = start_roster_import_job(file, tenant_id)
+        background_tasks.add_task(run_roster_import_job, job["job_id"], tenant_id, path)
+        logger.info(f"Queued roster import job {job['job_id']} for tenant_id={tenant_id}")
+    except HTTPException as e:
+        raise e
+    except Exception:
+        logger.exception("Failed to queue roster import job")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred while starting the roster import.")
+    return {**job, "status_url": f"/api/admin/roster-imports/{job['job_id']}"}
+
+
+@router.get("/admin/roster-imports/{job_id}")
+def get_roster_import(
+    job_id: str,
+    token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
+):
+    job = _get_roster_import_job(job_id, token_data.get("tenant_id"))
+    return {**job, "report_url": f"/api/admin/roster-imports/{job_id}/report"}
+
+
+@router.get("/admin/roster-imports/{job_id}/report")
+def download_roster_import_report(
+    job_id: str,
+    token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
+):
+    """Outcome of every roster row as CSV"""
+    _get_roster_import_job(job_id, token_data.get("tenant_id"))
+    return Response(
+        content=roster_report_csv(get_job_store().get_report(job_id)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="roster_import_{job_id}_report.csv"'},
+    )
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database.database import get_db
+from app.database.session_router import get_read_db
 from app.controller.department_controller import DepartmentController
 from app.api.schemas.schemas import DepartmentCreate, DepartmentRead, DepartmentUpdate, DepartmentDeleteResponse, DepartmentWithCountResponse
 from common_utils.auth.permission_checker import PermissionChecker
@@ -37,7 +38,7 @@ async def create_department(
 
 @router.get("/", response_model=List[DepartmentWithCountResponse])
 async def get_departments(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["department_management.read"])),
     skip: int = 0,
     limit: int = 100
@@ -1,22 +1,25 @@
 import traceback
-from fastapi import APIRouter, Depends, status, Form, UploadFile, File, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, status, Form, UploadFile, File, HTTPException
 from pydantic import EmailStr
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from app.api.schemas.schemas import DriverCreate, DriverOut, DriverUpdate,StatusUpdate
+from app.database.session_router import get_read_db
+from app.api.schemas.schemas import DRIVER_DOCUMENT_FIELDS, DRIVER_IMAGE_DERIVATIVES, DriverCreate, DriverOut, DriverUpdate, DriverVendorOut, StatusUpdate
+from app.utils.fieldsets import FIELDS_DESCRIPTION, Fieldset
+from app.utils.serialization import json_response
+from app.storage.derivatives import add_derivative_urls, warm_derivatives
+from app.storage.documents import resolve_document_urls, store_document
+from app.utils.uploads import IMAGE_TYPES, PDF_TYPES, validate_upload
 from app.database.models import Driver, User, Vendor
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from uuid import uuid4
 from typing import Annotated, Optional
 from datetime import date
-import os
-import shutil
 import logging
 from common_utils.auth.permission_checker import PermissionChecker
 # services/driver_service.py or similar
-from common_utils.auth.utils import hash_password
+from app.utils.password_hasher import get_password_hasher
 from typing import Callable, Optional
-import io
 from sqlalchemy import or_
 from fastapi import Query
 from typing import List, Optional
@@ -25,28 +28,50 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 from sqlalchemy.orm import joinedload
 
+# DriverOut field -> column; only the requested ones are selected
+DRIVER_FIELDS = Fieldset(
+    DriverOut,
+    Driver,
+    columns={
+        name: (
+            {field: getattr(Vendor, field) for field in DriverVendorOut.model_fields}
+            if name == "vendor" else getattr(Driver, name)
+        )
+        for name in DriverOut.model_fields
+    },
+    joins={Vendor: Driver.vendor_id == Vendor.vendor_id},
+    always=("driver_id",),
+)
+
+
+def driver_rows(rows: List[dict]) -> List[dict]:
+    """Document keys of list rows -> download and thumbnail URLs"""
+    return resolve_document_urls(add_derivative_urls(rows, DRIVER_IMAGE_DERIVATIVES), DRIVER_DOCUMENT_FIELDS)
+
 @router.get("/tenants/drivers/", response_model=List[DriverOut])
 def get_all_drivers_by_tenant(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["driver_management.read"])),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, le=500)
-) -> List[DriverOut]:
+    limit: int = Query(100, le=500),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
     tenant_id = token_data.get("tenant_id")
-    logger.info(f"[DRIVER_FETCH] Start - tenant_id={tenant_id}, skip={skip}, limit={limit}")
+    logger.info(f"[DRIVER_FETCH] Start - tenant_id={tenant_id}, skip={skip}, limit={limit}, fields={fields}")
 
+    names = DRIVER_FIELDS.parse(fields)
     try:
-        drivers = (
-            db.query(Driver)
-            .join(Driver.vendor)
-            .filter(Vendor.tenant_id == tenant_id)
+        statement = (
+            DRIVER_FIELDS.select(names, Vendor)
+            .where(Vendor.tenant_id == tenant_id)
             .offset(skip)
             .limit(limit)
-            .all()
         )
+        # Rows from our own database: build without validation and send as is
+        drivers = driver_rows(DRIVER_FIELDS.rows(names, db.execute(statement)))
 
         logger.info(f"[DRIVER_FETCH] Success - tenant_id={tenant_id}, count={len(drivers)}")
-        return [DriverOut.model_validate(driver) for driver in drivers]
+        return json_response(drivers)
 
     except SQLAlchemyError as db_err:
         logger.exception(f"[DRIVER_FETCH] DB error - tenant_id={tenant_id}, error={db_err}")
@@ -56,72 +81,17 @@ def get_all_drivers_by_tenant(
         logger.exception(f"[DRIVER_FETCH] Unexpected error - tenant_id={tenant_id}, error={err}")
         raise HTTPException(status_code=500, detail="Unexpected server error.")
 
-async def file_size_validator(
-    file: UploadFile,
-    allowed_types: list[str],
-    max_size_mb: int = 5,
-    required: bool = True
-) -> UploadFile:
-    if not file or not file.filename:
-        if required:
-            raise HTTPException(status_code=422, detail=f"'{file.filename}' file is required.")
-        return None
-
-    logger.info(f"Validating file: {file.filename}")
-
-    if file.content_type not in allowed_types:
-        logger.warning(f"{file.filename} has invalid type '{file.content_type}'. Allowed types: {allowed_types}")
-        raise HTTPException(
-            status_code=415,
-            detail=f"{file.filename} has invalid type '{file.content_type}'. Allowed types: {allowed_types}"
-        )
-
-    contents = await file.read()
-    size_mb = len(contents) / (1024 * 1024)
-    if size_mb > max_size_mb:
-        raise HTTPException(
-            status_code=413,
-            detail=f"{file.filename} is too large. Max allowed size is {max_size_mb}MB."
-        )
-
-    # Reset file pointer so it can be read again later
-    file.file = io.BytesIO(contents)
-    return file
-
-from pathlib import Path
-
-
-ROOT_DIR = Path(__file__).resolve().parent.parent.parent  # adjust if needed
-UPLOADS_DIR = ROOT_DIR / "uploaded_files"
-
-def save_file(
+async def save_file(
     file: Optional[UploadFile],
     vendor_id: int,
     driver_code: str,
     doc_type: str
 ) -> Optional[str]:
     if file and file.filename:
-        # Get file extension from original filename
-        _, ext = os.path.splitext(file.filename)
-        ext = ext.lower().strip()
-
-        # Construct safe filename: {driver_code}_{doc_type}.{ext}
-        safe_filename = f"{driver_code.strip()}_{doc_type.strip()}{ext}"
-
-        folder_path = UPLOADS_DIR / "vendors" / str(vendor_id) / "drivers" / driver_code.strip() / doc_type
-        folder_path.mkdir(parents=True, exist_ok=True)
-
-        file_path = folder_path / safe_filename
-
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        logger.info(f"{doc_type.upper()} document saved at: {file_path.resolve()}")
-        # return str(file_path.resolve())
-        relative_path = file_path.relative_to(ROOT_DIR)
-        logger.info(f"Relative path for {doc_type}: {relative_path}")
-        return str(relative_path).replace("\\", "/")  # ensure forward slashes
-
+        # Content-addressed: the same document uploaded again is stored once
+        key = await store_document(file)
+        logger.info(f"{doc_type.upper()} document of driver {driver_code.strip()} (vendor {vendor_id}) stored as {key}")
+        return key
 
     logger.debug(f"No file provided for {doc_type}")
     return None
@@ -129,6 +99,7 @@ def save_file(
 @router.post("/{vendor_id}/drivers/", response_model=DriverOut, status_code=status.HTTP_201_CREATED)
 async def create_driver(
     vendor_id: int,
+    background_tasks: BackgroundTasks,
     # form_data: DriverCreate = Depends(),
     driver_code: str = Form(...),
     name: str = Form(...),
@@ -212,20 +183,20 @@ async def create_driver(
 
        # Validate file sizes if present
         # For PDF documents
-        bgv_doc_file = await file_size_validator(bgv_doc_file, allowed_types=["application/pdf"])
-        police_verification_doc_file = await file_size_validator(police_verification_doc_file, allowed_types=["application/pdf"])
-        medical_verification_doc_file = await file_size_validator(medical_verification_doc_file, allowed_types=["application/pdf"])
-        training_verification_doc_file = await file_size_validator(training_verification_doc_file, allowed_types=["application/pdf"])
-        eye_test_verification_doc_file = await file_size_validator(eye_test_verification_doc_file, allowed_types=["application/pdf"])
-        license_doc_file = await file_size_validator(license_doc_file, allowed_types=["application/pdf"])
-        induction_doc_file = await file_size_validator(induction_doc_file, allowed_types=["application/pdf"])
-        badge_doc_file = await file_size_validator(badge_doc_file, allowed_types=["application/pdf"])
-        alternate_govt_id_doc_file = await file_size_validator(alternate_govt_id_doc_file, allowed_types=["application/pdf"])
+        bgv_doc_file = await validate_upload(bgv_doc_file, allowed_types=PDF_TYPES)
+        police_verification_doc_file = await validate_upload(police_verification_doc_file, allowed_types=PDF_TYPES)
+        medical_verification_doc_file = await validate_upload(medical_verification_doc_file, allowed_types=PDF_TYPES)
+        training_verification_doc_file = await validate_upload(training_verification_doc_file, allowed_types=PDF_TYPES)
+        eye_test_verification_doc_file = await validate_upload(eye_test_verification_doc_file, allowed_types=PDF_TYPES)
+        license_doc_file = await validate_upload(license_doc_file, allowed_types=PDF_TYPES)
+        induction_doc_file = await validate_upload(induction_doc_file, allowed_types=PDF_TYPES)
+        badge_doc_file = await validate_upload(badge_doc_file, allowed_types=PDF_TYPES)
+        alternate_govt_id_doc_file = await validate_upload(alternate_govt_id_doc_file, allowed_types=PDF_TYPES)
 
         # For photo image (jpeg/png)
-        photo_image = await file_size_validator(
+        photo_image = await validate_upload(
             photo_image,
-            allowed_types=["image/jpeg", "image/jpg", "image/png"]
+            allowed_types=IMAGE_TYPES
         )
 
 
@@ -244,8 +215,7 @@ async def create_driver(
             "photo": photo_image,
         }.items():
             if file:
-                logger.info(f"{label}: {file.filename} ({len(await file.read()) / (1024 * 1024):.2f} MB)")
-                file.file.seek(0)  # Reset after reading for logging
+                logger.info(f"{label}: {file.filename} ({(file.size or 0) / (1024 * 1024):.2f} MB)")
 
 
 
@@ -284,36 +254,38 @@ async def create_driver(
         if db.query(Driver).filter_by(vendor_id=vendor_id, driver_code=driver_code.strip()).first():
             raise HTTPException(status_code=409, detail=f"Driver code '{driver_code}' already exists for this vendor.")
 
-        bgv_doc_url = save_file(bgv_doc_file, vendor_id, driver_code, "bgv")
+        bgv_doc_url = await save_file(bgv_doc_file, vendor_id, driver_code, "bgv")
         if bgv_doc_url:
             logger.info(f"BGV document saved at: {bgv_doc_url}")
-        police_verification_doc_file_url = save_file(police_verification_doc_file, vendor_id, driver_code, "police_verification")
+        police_verification_doc_file_url = await save_file(police_verification_doc_file, vendor_id, driver_code, "police_verification")
         if police_verification_doc_file_url:
             logger.info(f"Police verification document saved at: {police_verification_doc_file_url}")
-        medical_verification_doc_file_url = save_file(medical_verification_doc_file, vendor_id, driver_code, "medical_verification")
+        medical_verification_doc_file_url = await save_file(medical_verification_doc_file, vendor_id, driver_code, "medical_verification")
         if medical_verification_doc_file_url:
             logger.info(f"Medical verification document saved at: {medical_verification_doc_file_url}")
-        training_verification_doc_file_url = save_file(training_verification_doc_file, vendor_id, driver_code, "training_verification")
+        training_verification_doc_file_url = await save_file(training_verification_doc_file, vendor_id, driver_code, "training_verification")
         if training_verification_doc_file_url:
             logger.info(f"Training verification document saved at: {training_verification_doc_file_url}")
-        eye_test_verification_doc_file_url = save_file(eye_test_verification_doc_file, vendor_id, driver_code, "eye_test_verification")
+        eye_test_verification_doc_file_url = await save_file(eye_test_verification_doc_file, vendor_id, driver_code, "eye_test_verification")
         if eye_test_verification_doc_file_url:
             logger.info(f"Eye test verification document saved at: {eye_test_verification_doc_file_url}")
-        license_doc_file_url = save_file(license_doc_file, vendor_id, driver_code, "license")
+        license_doc_file_url = await save_file(license_doc_file, vendor_id, driver_code, "license")
         if license_doc_file_url:
             logger.info(f"License document saved at: {license_doc_file_url}")
-        induction_doc_file_url = save_file(induction_doc_file, vendor_id, driver_code, "induction")
+        induction_doc_file_url = await save_file(induction_doc_file, vendor_id, driver_code, "induction")
         if induction_doc_file_url:
             logger.info(f"Induction document saved at: {induction_doc_file_url}")
-        badge_doc_file_url = save_file(badge_doc_file, vendor_id, driver_code, "badge")
+        badge_doc_file_url = await save_file(badge_doc_file, vendor_id, driver_code, "badge")
         if badge_doc_file_url:
             logger.info(f"Badge document saved at: {badge_doc_file_url}")
-        alternate_govt_id_doc_file_url = save_file(alternate_govt_id_doc_file, vendor_id, driver_code, "alternate_govt_id")
+        alternate_govt_id_doc_file_url = await save_file(alternate_govt_id_doc_file, vendor_id, driver_code, "alternate_govt_id")
         if alternate_govt_id_doc_file_url:
             logger.info(f"Alternate government ID document saved at: {alternate_govt_id_doc_file_url}")
-        photo_image_url = save_file(photo_image, vendor_id, driver_code, "photo")
+        photo_image_url = await save_file(photo_image, vendor_id, driver_code, "photo")
         if photo_image_url:
             logger.info(f"Photo image saved at: {photo_image_url}")
+            # Thumbnails are rendered after the response is sent
+            background_tasks.add_task(warm_derivatives, photo_image_url)
 
         # Create Driver
         new_driver = Driver(
@@ -321,7 +293,7 @@ async def create_driver(
             email=email.strip(),
             driver_code=driver_code.strip(),
             mobile_number=mobile_number.strip(),
-            hashed_password=hash_password(hashed_password.strip()),
+            hashed_password=await get_password_hasher().ahash(hashed_password.strip()),
             vendor_id=vendor_id,
             alternate_mobile_number=alternate_mobile_number,
             city=city,
@@ -410,6 +382,7 @@ async def update_driver(
     # form_data: DriverUpdate = Depends(),  # reuse schema, all fields should be Optional
     driver_id: int,
     vendor_id: int,
+    background_tasks: BackgroundTasks,
     name: Optional[str] = Form(None),
     email: Optional[EmailStr] = Form(None),
     hashed_password: Optional[str] = Form(None),
@@ -487,31 +460,33 @@ async def update_driver(
 
         # Handle password
         if hashed_password:
-            driver.hashed_password = hash_password(hashed_password)
+            driver.hashed_password = await get_password_hasher().ahash(hashed_password)
 
         # File handler
         async def process_file(doc_file, doc_type, allowed_types):
             if doc_file:
-                validated = await file_size_validator(doc_file, allowed_types=allowed_types)
-                doc_file.file.seek(0)  # ensure stream reset
-                file_url = save_file(doc_file, vendor_id, driver.driver_code, doc_type)
+                validated = await validate_upload(doc_file, allowed_types=allowed_types)
+                file_url = await save_file(doc_file, vendor_id, driver.driver_code, doc_type)
                 logger.info(f"{doc_type} document updated at: {file_url}")
                 return file_url
             return None
 
         # Save files if provided
         file_updates = {
-            "bgv_doc_url": await process_file(bgv_doc_file, "bgv", ["application/pdf"]),
-            "police_verification_doc_url": await process_file(police_verification_doc_file, "police_verification", ["application/pdf"]),
-            "medical_verification_doc_url": await process_file(medical_verification_doc_file, "medical_verification", ["application/pdf"]),
-            "training_verification_doc_url": await process_file(training_verification_doc_file, "training_verification", ["application/pdf"]),
-            "eye_test_verification_doc_url": await process_file(eye_test_verification_doc_file, "eye_test_verification", ["application/pdf"]),
-            "license_doc_url": await process_file(license_doc_file, "license", ["application/pdf"]),
-            "induction_doc_url": await process_file(induction_doc_file, "induction", ["application/pdf"]),
-            "badge_doc_url": await process_file(badge_doc_file, "badge", ["application/pdf"]),
-            "alternate_govt_id_doc_url": await process_file(alternate_govt_id_doc_file, "alternate_govt_id", ["application/pdf"]),
-            "photo_url": await process_file(photo_image, "photo", ["image/jpeg", "image/jpg", "image/png"]),
+            "bgv_doc_url": await process_file(bgv_doc_file, "bgv", PDF_TYPES),
+            "police_verification_doc_url": await process_file(police_verification_doc_file, "police_verification", PDF_TYPES),
+            "medical_verification_doc_url": await process_file(medical_verification_doc_file, "medical_verification", PDF_TYPES),
+            "training_verification_doc_url": await process_file(training_verification_doc_file, "training_verification", PDF_TYPES),
+            "eye_test_verification_doc_url": await process_file(eye_test_verification_doc_file, "eye_test_verification", PDF_TYPES),
+            "license_doc_url": await process_file(license_doc_file, "license", PDF_TYPES),
+            "induction_doc_url": await process_file(induction_doc_file, "induction", PDF_TYPES),
+            "badge_doc_url": await process_file(badge_doc_file, "badge", PDF_TYPES),
+            "alternate_govt_id_doc_url": await process_file(alternate_govt_id_doc_file, "alternate_govt_id", PDF_TYPES),
+            "photo_url": await process_file(photo_image, "photo", IMAGE_TYPES),
         }
+        if file_updates["photo_url"]:
+            # Thumbnails are rendered after the response is sent
+            background_tasks.add_task(warm_derivatives, file_updates["photo_url"])
 
         # Update normal fields
         update_fields = {
@@ -578,48 +553,50 @@ def get_drivers_by_vendor(
     search: Optional[str] = Query(None, description="Search by username or email"),
     driver_id: Optional[int] = None,
     driver_code: Optional[str] = None,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["driver_management.create", "driver_management.read"]))
 ):
     try:
         logger.info(
             f"Fetching drivers for vendor_id={vendor_id} with filters: skip={skip}, "
             f"limit={limit}, bgv_status={bgv_status}, search={search}, "
-            f"driver_id={driver_id}, driver_code={driver_code}"
+            f"driver_id={driver_id}, driver_code={driver_code}, fields={fields}"
         )
 
+        names = DRIVER_FIELDS.parse(fields)
+
         vendor = db.query(Vendor).filter_by(vendor_id=vendor_id).first()
         if not vendor:
             raise HTTPException(status_code=404, detail="Vendor not found.")
 
-        query = db.query(Driver).filter(Driver.vendor_id == vendor_id)
+        statement = DRIVER_FIELDS.select(names).where(Driver.vendor_id == vendor_id)
 
         if driver_id:
-            query = query.filter(Driver.driver_id == driver_id)
+            statement = statement.where(Driver.driver_id == driver_id)
 
         if driver_code:
-            query = query.filter(Driver.driver_code == driver_code)
+            statement = statement.where(Driver.driver_code == driver_code)
 
         if bgv_status:
-            query = query.filter(Driver.bgv_status == bgv_status)
+            statement = statement.where(Driver.bgv_status == bgv_status)
 
         if search:
             search_term = f"%{search.strip()}%"
-            query = query.filter(
+            statement = statement.where(
                 or_(
                     Driver.driver_name.ilike(search_term),
                     Driver.email.ilike(search_term)
                 )
             )
 
-        drivers = query.offset(skip).limit(limit).all()
-        
+        drivers = driver_rows(DRIVER_FIELDS.rows(names, db.execute(statement.offset(skip).limit(limit))))
 
         if not drivers:
             logger.warning("No drivers found for given filters.")
             raise HTTPException(status_code=404, detail="No drivers found for the given filters.")
 
-        return drivers
+        return json_response(drivers)
     except HTTPException as e:
         raise e  # Allow FastAPI to handle it properly (don't override with 500)
     except SQLAlchemyError as e:
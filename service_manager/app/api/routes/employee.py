@@ -1,22 +1,24 @@
 from typing import Optional
 from uuid import uuid4
 from venv import logger
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Response, UploadFile
 from app.database.models import Employee
 from sqlalchemy.orm import Session
 from app.api.schemas.schemas import EmployeeCreate, EmployeeRead, EmployeeStatusUpdate, EmployeeUpdate ,EmployeeDeleteRead, EmployeeUpdateResponse, EmployeesByDepartmentResponse, EmployeesByTenantResponse, Meta, EmployeeUpdate, StatusUpdate
 from app.controller.employee_controller import EmployeeController
 from app.database.database import get_db
+from app.database.session_router import get_read_db
 from common_utils.auth.permission_checker import PermissionChecker
 
 from app.utils.response import build_response
+from app.utils.serialization import json_response
 
 router = APIRouter()
 
 controller = EmployeeController()
 
 @router.post("/", response_model=EmployeeRead)
-async def create_employee(
+def create_employee(
     employee: EmployeeCreate,
     db: Session = Depends(get_db),
     token_data: dict = Depends(PermissionChecker(["employee_management.create"]))
@@ -29,13 +31,46 @@ def bulk_create_employee(
     token_data: dict = Depends(PermissionChecker(["employee_management.create"]))
 ):
     return controller.controller_bulk_create_employees(file, db, token_data["tenant_id"])
+
+
+@router.post("/bulk/jobs", status_code=202)
+def start_bulk_employee_import(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    token_data: dict = Depends(PermissionChecker(["employee_management.create"]))
+):
+    """Queue an import; poll /bulk/jobs/{job_id} for progress."""
+    job = controller.start_bulk_import_job(file, background_tasks, token_data["tenant_id"])
+    return {**job, "status_url": f"/api/employees/bulk/jobs/{job['job_id']}"}
+
+
+@router.get("/bulk/jobs/{job_id}")
+def get_bulk_employee_import(
+    job_id: str,
+    token_data: dict = Depends(PermissionChecker(["employee_management.create"]))
+):
+    job = controller.get_bulk_import_job(job_id, token_data["tenant_id"])
+    return {**job, "errors_url": f"/api/employees/bulk/jobs/{job_id}/errors"}
+
+
+@router.get("/bulk/jobs/{job_id}/errors")
+def download_bulk_employee_import_errors(
+    job_id: str,
+    token_data: dict = Depends(PermissionChecker(["employee_management.create"]))
+):
+    report = controller.get_bulk_import_errors_csv(job_id, token_data["tenant_id"])
+    return Response(
+        content=report,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="employee_import_{job_id}_errors.csv"'},
+    )
 @router.get("/department/{department_id}", response_model=EmployeesByDepartmentResponse)
-async def get_employee(
+def get_employee(
     department_id: int,
     is_active: Optional[bool] = Query(None, description="Filter employees by active status"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Items per page"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["employee_management.read"]))
 ):
     return controller.get_employee_by_department(
@@ -48,16 +83,17 @@ async def get_employee(
     )
 
 @router.get("/tenant", response_model=EmployeesByTenantResponse)
-async def get_employee(
-    db: Session = Depends(get_db),
+def get_employee(
+    db: Session = Depends(get_read_db),
     page: int = Query(1, ge=1, description="Page number (starting from 1)"),
     limit: int = Query(10, ge=1, le=100, description="Number of bookings per page"),
     token_data: dict = Depends(PermissionChecker(["employee_management.read"]))
 ):
-    return controller.get_employee_by_tenant(db, token_data["tenant_id"], page, limit)
+    # Built from trusted rows; sent without re-validation
+    return json_response(controller.get_employee_by_tenant(db, token_data["tenant_id"], page, limit))
 
 @router.get("/{employee_code}", response_model=EmployeeRead)
-async def get_employee(
+def get_employee(
     employee_code: str,
     db: Session = Depends(get_db),
     token_data: dict = Depends(PermissionChecker(["employee_management.read"]))
@@ -71,7 +107,7 @@ async def get_employee(
     
 
 @router.put("/{employee_code}", response_model=EmployeeUpdateResponse)
-async def update_employee(
+def update_employee(
     employee_code: str,
     employee: EmployeeUpdate,
     db: Session = Depends(get_db),
@@ -81,7 +117,7 @@ async def update_employee(
 
 
 @router.delete("/{employee_code}", response_model=EmployeeDeleteRead)
-async def delete_employee(
+def delete_employee(
     employee_code: str,
     db: Session = Depends(get_db),
     token_data: dict = Depends(PermissionChecker(["employee_management.delete"]))
@@ -0,0 +1,108 @@
+# app/api/routes/exports.py
+"""
+Streaming admin exports. Every endpoint takes `format=csv|xlsx|ndjson` and
+streams rows straight from a server-side cursor (see app.utils.exports).
+"""
+import logging
+import os
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.crud.exports import bookings_export, drivers_export, employees_export, routes_export
+from app.database.models import BookingStatus
+from app.database.session_router import get_read_db
+from app.utils.exports import export_response
+from common_utils.auth.permission_checker import PermissionChecker
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/admin/exports", tags=["Admin Exports"])
+
+EXPORT_MAX_DAYS = int(os.getenv("EXPORT_MAX_DAYS", "366"))
+
+
+def _check_range(start_date: date, end_date: date):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= EXPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Export at most {EXPORT_MAX_DAYS} days at a time")
+
+
+@router.get("/bookings")
+def export_bookings(
+    start_date: date = Query(..., description="First booking date, YYYY-MM-DD"),
+    end_date: date = Query(..., description="Last booking date, YYYY-MM-DD"),
+    shift_id: Optional[int] = Query(None),
+    status: Optional[BookingStatus] = Query(None),
+    export_format: str = Query("csv", alias="format"),
+    db: Session = Depends(get_read_db),
+    token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
+):
+    _check_range(start_date, end_date)
+    tenant_id = token_data.get("tenant_id")
+    logger.info(f"Exporting bookings tenant_id={tenant_id} {start_date}..{end_date} as {export_format}")
+    return export_response(
+        db,
+        bookings_export(tenant_id, start_date, end_date, shift_id=shift_id, status=status),
+        export_format,
+        f"bookings_{start_date}_{end_date}",
+    )
+
+
+@router.get("/routes")
+def export_routes(
+    start_date: date = Query(..., description="First route date, YYYY-MM-DD"),
+    end_date: date = Query(..., description="Last route date, YYYY-MM-DD"),
+    shift_id: Optional[int] = Query(None),
+    export_format: str = Query("csv", alias="format"),
+    db: Session = Depends(get_read_db),
+    token_data: dict = Depends(PermissionChecker(["cutoff.create"])),
+):
+    """Confirmed routes, one row per stop"""
+    _check_range(start_date, end_date)
+    tenant_id = token_data.get("tenant_id")
+    logger.info(f"Exporting routes tenant_id={tenant_id} {start_date}..{end_date} as {export_format}")
+    return export_response(
+        db,
+        routes_export(tenant_id, start_date, end_date, shift_id=shift_id),
+        export_format,
+        f"routes_{start_date}_{end_date}",
+    )
+
+
+@router.get("/employees")
+def export_employees(
+    department_id: Optional[int] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    export_format: str = Query("csv", alias="format"),
+    db: Session = Depends(get_read_db),
+    token_data: dict = Depends(PermissionChecker(["employee_management.read"])),
+):
+    tenant_id = token_data.get("tenant_id")
+    logger.info(f"Exporting employees tenant_id={tenant_id} as {export_format}")
+    return export_response(
+        db,
+        employees_export(tenant_id, department_id=department_id, is_active=is_active),
+        export_format,
+        "employees",
+    )
+
+
+@router.get("/drivers")
+def export_drivers(
+    vendor_id: Optional[int] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    export_format: str = Query("csv", alias="format"),
+    db: Session = Depends(get_read_db),
+    token_data: dict = Depends(PermissionChecker(["driver_management.read"])),
+):
+    tenant_id = token_data.get("tenant_id")
+    logger.info(f"Exporting drivers tenant_id={tenant_id} as {export_format}")
+    return export_response(
+        db,
+        drivers_export(tenant_id, vendor_id=vendor_id, is_active=is_active),
+        export_format,
+        "drivers",
+    )
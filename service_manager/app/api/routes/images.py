@@ -0,0 +1,45 @@
+# app/api/routes/images.py
+"""
+Image derivatives (see app.storage.derivatives):
+
+    GET /api/images/{variant}/{key}   e.g. /api/images/thumb/blobs/3f/3fa9...e1.jpg
+
+Public like the uploaded files themselves: the key is the SHA-256 of the
+image. Responses carry a strong ETag and are cacheable forever; a matching
+If-None-Match is answered with 304 without touching the cache.
+"""
+import logging
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.storage.derivatives import VARIANTS, DerivativeNotAvailable, get_derivative_cache, is_image_key
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/images", tags=["Images"])
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{variant}/{key:path}")
+async def get_image_derivative(variant: str, key: str, request: Request):
+    spec = VARIANTS.get(variant)
+    if spec is None or not is_image_key(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = spec.etag(key)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        path, _ = await run_in_threadpool(get_derivative_cache().get, key, variant)
+    except DerivativeNotAvailable as e:
+        logger.info(f"Derivative not available: {e}")
+        raise HTTPException(status_code=404, detail="Image not found")
+    except Exception as e:
+        logger.exception(f"Failed to render {variant} derivative of {key}: {e}")
+        raise HTTPException(status_code=422, detail="Image could not be processed")
+
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
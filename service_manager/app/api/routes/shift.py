@@ -3,6 +3,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database.database import get_db
+from app.database.session_router import get_read_db
 from app.controller.shift_controller import ShiftController
 from app.api.schemas.schemas import ShiftCreate, ShiftRead , ShiftUpdate , LogType
 from common_utils.auth.permission_checker import PermissionChecker
@@ -26,7 +27,7 @@ async def create_shift(
 @router.get("/log-type", response_model=List[ShiftRead])
 async def get_shifts_by_log_type(
     log_type: LogType,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["shift_management.read"])),
     skip: int = 0,
     limit: int = 100
@@ -42,7 +43,7 @@ async def get_shifts_by_log_type(
     
 @router.get("/", response_model=List[ShiftRead])
 async def fetch_shifts(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["shift_management.read"])),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=500)
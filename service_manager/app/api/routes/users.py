@@ -5,7 +5,7 @@ from app.database.database import get_db
 from app.api.schemas.schemas import UserCreate, UserRead
 from app.controller.user_controller import UserController
 from common_utils.auth.permission_checker import PermissionChecker
-from common_utils.auth.utils import hash_password
+from app.utils.password_hasher import get_password_hasher
 
 router = APIRouter()
 user_controller = UserController()
@@ -18,7 +18,7 @@ async def create_user(
     token_data: dict = Depends(PermissionChecker(["user_management.create"]))
 ):
     try:
-        user.hashed_password = hash_password(user.hashed_password)
+        user.hashed_password = await get_password_hasher().ahash(user.hashed_password)
         return user_controller.create_user(user, db)
     except HTTPException as e:
         raise e
@@ -1,7 +1,4 @@
-import io
 import logging
-import os
-import shutil
 from typing import Optional
 from fastapi import HTTPException, Response, UploadFile
 import traceback
@@ -9,86 +6,40 @@ from fastapi import APIRouter, Depends, status, Form, UploadFile, File, HTTPExce
 from pydantic import EmailStr
 from sqlalchemy.orm import Session
 from app.database.database import get_db
-from app.api.schemas.schemas import VehicleOut
-from app.database.models import Driver, Vehicle, Vendor
+from app.database.session_router import get_read_db
+from app.api.schemas.schemas import VEHICLE_DOCUMENT_FIELDS, VehicleOut
+from app.utils.fieldsets import FIELDS_DESCRIPTION, Fieldset
+from app.utils.serialization import json_response
+from app.storage.documents import resolve_document_urls, store_document
+from app.utils.uploads import PDF_TYPES, validate_upload
+from app.database.models import Driver, Vehicle, VehicleType, Vendor
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from uuid import uuid4
 from typing import Annotated, Optional
 from datetime import date
-import os
-import shutil
 import logging
 from common_utils.auth.permission_checker import PermissionChecker
 # services/driver_service.py or similar
-from common_utils.auth.utils import hash_password
 from typing import Callable, Optional
-import io
-from sqlalchemy import func, or_
+from sqlalchemy import func, null, or_, select
 from fastapi import Query
 from typing import List, Optional
 from sqlalchemy.orm import selectinload
 router = APIRouter()
-from sqlalchemy.orm import joinedload
 
 
 logger = logging.getLogger(__name__)
-async def file_size_validator(
-    file: Optional[UploadFile],
-    allowed_types: list[str],
-    max_size_mb: int = 5
-) -> Optional[UploadFile]:
-    if not file or not file.filename:
-        logger.info("No file uploaded, skipping validation.")
-        return None
-
-    logger.info(f"Validating file: {file.filename}")
-
-    if file.content_type not in allowed_types:
-        logger.warning(f"{file.filename} has invalid type '{file.content_type}'. Allowed types: {allowed_types}")
-        raise HTTPException(
-            status_code=415,
-            detail=f"{file.filename} has invalid type '{file.content_type}'. Allowed types: {allowed_types}"
-        )
-
-    contents = await file.read()
-    file.file = io.BytesIO(contents)  # reset file pointer
-
-    size_mb = len(contents) / (1024 * 1024)
-    if size_mb > max_size_mb:
-        raise HTTPException(
-            status_code=413,
-            detail=f"{file.filename} is too large. Max allowed size is {max_size_mb}MB."
-        )
-
-    return file
-def save_file(
+async def save_file(
     file: Optional[UploadFile],
     vendor_id: int,
     vehicle_code: str,
     doc_type: str
 ) -> Optional[str]:
     if file and file.filename:
-        # Get file extension from original filename
-        _, ext = os.path.splitext(file.filename)
-        ext = ext.lower().strip()  # normalize extension
-
-        # Construct safe filename: {vehicle_code}_{doc_type}.{ext}
-        safe_filename = f"{vehicle_code.strip()}_{doc_type.strip()}{ext}"
-
-        # New path: uploaded_files/vendors/{vendor_id}/vehicles/{vehicle_code}/{doc_type}/{filename}
-        folder_path = os.path.join("uploaded_files", "vendors", str(vendor_id), "vehicles", vehicle_code.strip(), doc_type)
-        os.makedirs(folder_path, exist_ok=True)
-
-        file_path = os.path.join(folder_path, safe_filename)
-
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        rel_path = os.path.relpath(file_path, start="uploaded_files")
-        abs_path = os.path.abspath(file_path)
-
-        logger.info(f"{doc_type.upper()} document saved at: {abs_path}")
-        return rel_path
+        # Content-addressed: the same document uploaded again is stored once
+        key = await store_document(file)
+        logger.info(f"{doc_type.upper()} document of vehicle {vehicle_code.strip()} (vendor {vendor_id}) stored as {key}")
+        return key
     else:
         logger.debug(f"No file provided for {doc_type}")
     return None
@@ -160,16 +111,16 @@ async def create_vehicle(
 
         async def process_file(doc_file, doc_type, allowed_types, vehicle_code):
             if doc_file:
-                validated = await file_size_validator(doc_file, allowed_types=allowed_types)
-                return  save_file(doc_file, vendor_id, vehicle_code, doc_type)
+                validated = await validate_upload(doc_file, allowed_types=allowed_types)
+                return await save_file(doc_file, vendor_id, vehicle_code, doc_type)
             return None
         # Save documents
-        rc_card_url = await process_file(rc_card_file, "rc_card", allowed_types=["application/pdf"], vehicle_code=vehicle_code)
-        permit_url = await process_file(permit_file, "permit", allowed_types=["application/pdf"], vehicle_code=vehicle_code)
-        tax_receipt_url = await process_file(tax_receipt_file, "tax_receipt", allowed_types=["application/pdf"], vehicle_code=vehicle_code)
-        insurance_url = await process_file(insurance_file, "insurance", allowed_types=["application/pdf"], vehicle_code=vehicle_code)
-        pollution_url = await process_file(pollution_file, "pollution", allowed_types=["application/pdf"], vehicle_code=vehicle_code)
-        fitness_url = await process_file(fitness_file, "fitness", allowed_types=["application/pdf"], vehicle_code=vehicle_code)
+        rc_card_url = await process_file(rc_card_file, "rc_card", allowed_types=PDF_TYPES, vehicle_code=vehicle_code)
+        permit_url = await process_file(permit_file, "permit", allowed_types=PDF_TYPES, vehicle_code=vehicle_code)
+        tax_receipt_url = await process_file(tax_receipt_file, "tax_receipt", allowed_types=PDF_TYPES, vehicle_code=vehicle_code)
+        insurance_url = await process_file(insurance_file, "insurance", allowed_types=PDF_TYPES, vehicle_code=vehicle_code)
+        pollution_url = await process_file(pollution_file, "pollution", allowed_types=PDF_TYPES, vehicle_code=vehicle_code)
+        fitness_url = await process_file(fitness_file, "fitness", allowed_types=PDF_TYPES, vehicle_code=vehicle_code)
 
 
         # Create Vehicle object
@@ -315,8 +266,8 @@ async def update_vehicle(
         # File processing helper
         async def process_file(doc_file, doc_type, allowed_types, vehicle_code):
             if doc_file:
-                validated = await file_size_validator(doc_file, allowed_types=allowed_types)
-                return save_file(doc_file, vendor_id, vehicle_code, doc_type)
+                validated = await validate_upload(doc_file, allowed_types=allowed_types)
+                return await save_file(doc_file, vendor_id, vehicle_code, doc_type)
             return None
 
         # Update fields
@@ -383,7 +334,31 @@ async def update_vehicle(
         db.rollback()
         logger.exception("Unhandled error in vehicle update: %s", str(e))
         raise HTTPException(status_code=500, detail="Unexpected error while updating vehicle.")
-from sqlalchemy.orm import joinedload
+
+# VehicleOut field -> column; the lookups are joined only when one of their
+# columns is requested
+VEHICLE_FIELDS = Fieldset(
+    VehicleOut,
+    Vehicle,
+    columns={
+        **{
+            name: getattr(Vehicle, name)
+            for name in VehicleOut.model_fields
+            if name in Vehicle.__table__.columns
+        },
+        "vehicle_type_name": VehicleType.name,
+        "vendor_name": Vendor.vendor_name,
+        "driver_name": Driver.name,
+        "contract_type": null(),
+        "garage_name": null(),
+    },
+    joins={
+        Vendor: Vehicle.vendor_id == Vendor.vendor_id,
+        VehicleType: Vehicle.vehicle_type_id == VehicleType.vehicle_type_id,
+        Driver: Vehicle.driver_id == Driver.driver_id,
+    },
+    always=("vehicle_id",),
+)
 
 @router.get("/vehicles/", response_model=List[VehicleOut])
 def get_vehicles(
@@ -393,84 +368,49 @@ def get_vehicles(
     vehicle_code: Optional[str] = Query(None),
     vehicle_type_id: Optional[int] = Query(None),
     status: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
 
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["vehicle_management.read"]))
 ):
     tenant_id = token_data.get("tenant_id")
 
     try:
-        logger.info("Fetching vehicles with filters")
+        logger.info(f"Fetching vehicles with filters, fields={fields}")
 
-        query = (
-            db.query(Vehicle)
-            .join(Vendor)
-            .filter(Vendor.tenant_id == tenant_id)
-            .options(
-                joinedload(Vehicle.vendor),
-                joinedload(Vehicle.driver),
-                joinedload(Vehicle.vehicle_type),
-            )
-        )
+        names = VEHICLE_FIELDS.parse(fields)
+        filters = [Vendor.tenant_id == tenant_id]
 
         # Apply filters
         if vendor_id is not None:
-            query = query.filter(Vehicle.vendor_id == vendor_id)
+            filters.append(Vehicle.vendor_id == vendor_id)
         if driver_id is not None:
-            query = query.filter(Vehicle.driver_id == driver_id)
+            filters.append(Vehicle.driver_id == driver_id)
         if vehicle_id is not None:
-            query = query.filter(Vehicle.vehicle_id == vehicle_id)
+            filters.append(Vehicle.vehicle_id == vehicle_id)
         if vehicle_code is not None:
-            query = query.filter(Vehicle.vehicle_code.ilike(f"%{vehicle_code.strip()}%"))
+            filters.append(Vehicle.vehicle_code.ilike(f"%{vehicle_code.strip()}%"))
         if vehicle_type_id is not None:
-            query = query.filter(Vehicle.vehicle_type_id == vehicle_type_id)
+            filters.append(Vehicle.vehicle_type_id == vehicle_type_id)
         if status is not None:
-            query = query.filter(Vehicle.status == status)
+            filters.append(Vehicle.status == status)
 
-        total = query.count()
-        vehicles = query.offset(offset).limit(limit).all()
+        total = db.execute(
+            select(func.count()).select_from(Vehicle).join(Vendor, Vehicle.vendor_id == Vendor.vendor_id).where(*filters)
+        ).scalar()
+        statement = VEHICLE_FIELDS.select(names, Vendor).where(*filters).offset(offset).limit(limit)
+        # Rows from our own database: build without validation and send as is
+        vehicles = resolve_document_urls(VEHICLE_FIELDS.rows(names, db.execute(statement)), VEHICLE_DOCUMENT_FIELDS)
 
         if not vehicles:
             logger.warning("No vehicles found")
             raise HTTPException(status_code=404, detail="No vehicles found")
 
         logger.info(f"Found {len(vehicles)} vehicles out of {total}")
-        
-        # Transform into response with extra fields
-        result = []
-        for v in vehicles:
-            result.append(VehicleOut(
-                vehicle_id=v.vehicle_id,
-                vendor_id=v.vendor_id,
-                vehicle_code=v.vehicle_code,
-                reg_number=v.reg_number,
-                vehicle_type_id=v.vehicle_type_id,
-                driver_id=v.driver_id,
-                status=v.status,
-                description=v.description,
-                rc_expiry_date=v.rc_expiry_date,
-                insurance_expiry_date=v.insurance_expiry_date,
-                permit_expiry_date=v.permit_expiry_date,
-                pollution_expiry_date=v.pollution_expiry_date,
-                fitness_expiry_date=v.fitness_expiry_date,
-                tax_receipt_date=v.tax_receipt_date,
-                rc_card_url=v.rc_card_url,
-                insurance_url=v.insurance_url,
-                permit_url=v.permit_url,
-                pollution_url=v.pollution_url,
-                fitness_url=v.fitness_url,
-                tax_receipt_url=v.tax_receipt_url,
-                vehicle_type_name=v.vehicle_type.name if v.vehicle_type else None,
-                vendor_name=v.vendor.vendor_name if v.vendor else None,
-                driver_name=v.driver.name if v.driver else None,
-                contract_type=v.contract_type if hasattr(v, "contract_type") else None,
-                garage_name=None
-            ))
-        
-        return result
+        return json_response(vehicles)
 
     except HTTPException as e:
         raise e
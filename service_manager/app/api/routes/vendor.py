@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.controller.vendor_controller import VendorController
 from app.database.database import get_db
+from app.database.session_router import get_read_db
 from app.api.schemas.schemas import VendorCreate, VendorOut, VendorUpdate
 from common_utils.auth.permission_checker import PermissionChecker
 
@@ -48,7 +49,7 @@ async def get_vendors(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, le=1000),
     is_active: Optional[bool] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token_data: dict = Depends(PermissionChecker(["vendor_management.read"]))
 ):
     tenant_id = token_data["tenant_id"]
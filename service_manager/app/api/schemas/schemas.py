@@ -1,8 +1,10 @@
-from pydantic import BaseModel, ConfigDict, Field, constr, validator
+from pydantic import BaseModel, ConfigDict, Field, computed_field, constr, field_serializer, validator
 from typing import Any, List, Optional, Dict, Union
 from datetime import date, datetime ,time
 from typing_extensions import Literal
 from enum import Enum
+from app.storage.derivatives import derivative_url
+from app.storage.documents import document_url
 class TenantCreate(BaseModel):
     tenant_name: str
     tenant_metadata: Optional[Dict] = None
@@ -598,6 +600,21 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True
 
+# Document columns: storage keys in the database, download URLs in responses
+DRIVER_DOCUMENT_FIELDS = (
+    "bgv_doc_url", "police_verification_doc_url", "medical_verification_doc_url",
+    "training_verification_doc_url", "eye_test_verification_doc_url", "license_doc_url",
+    "photo_url", "induction_doc_url", "badge_doc_url", "alternate_govt_id_doc_url",
+)
+VEHICLE_DOCUMENT_FIELDS = (
+    "rc_card_url", "insurance_url", "permit_url", "pollution_url", "fitness_url", "tax_receipt_url",
+)
+# Resized variants of an image document: response field -> (document field, variant)
+DRIVER_IMAGE_DERIVATIVES = {
+    "photo_thumb_url": ("photo_url", "thumb"),
+    "photo_web_url": ("photo_url", "web"),
+}
+
 class DriverVendorOut(BaseModel):
     vendor_id: int
     vendor_name: Optional[str] = None
@@ -668,6 +685,21 @@ class DriverOut(BaseModel):
         from_attributes=True,
         json_encoders={UUID: lambda v: str(v)}
     )
+
+    @field_serializer(*DRIVER_DOCUMENT_FIELDS)
+    def serialize_document_url(self, value: Optional[str]) -> Optional[str]:
+        return document_url(value)
+
+    @computed_field
+    @property
+    def photo_thumb_url(self) -> Optional[str]:
+        return derivative_url(self.photo_url, "thumb")
+
+    @computed_field
+    @property
+    def photo_web_url(self) -> Optional[str]:
+        return derivative_url(self.photo_url, "web")
+
 class VehicleOut(BaseModel):
     vehicle_id: int
     vendor_id: int
@@ -701,6 +733,10 @@ class VehicleOut(BaseModel):
     class Config:
         from_attributes = True
 
+    @field_serializer(*VEHICLE_DOCUMENT_FIELDS)
+    def serialize_document_url(self, value: Optional[str]) -> Optional[str]:
+        return document_url(value)
+
 class EmployeeLoginResponse(BaseModel):
     access_token: str
     token_type: str
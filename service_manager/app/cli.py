@@ -0,0 +1,129 @@
+# app/cli.py
+"""
+Schema, seed data and startup diagnostics, for deployments that boot the API
+with APP_STARTUP_MODE=fast (no create_all or seeding in the lifespan):
+
+    python -m app.cli migrate            # alembic upgrade head + upcoming partitions
+    python -m app.cli seed [--iam]       # development seed data (idempotent)
+    python -m app.cli init-db            # create_all, for throwaway databases without Alembic
+    python -m app.cli startup-report     # where worker boot time goes
+
+`startup-report` profiles `import app.main` in a fresh interpreter
+(python -X importtime) and lists the packages costing the most import time,
+then runs the application lifespan once and prints the time of each startup
+phase. With --max-ms it exits non-zero when import plus startup exceed the
+budget, and it always fails if one of LAZY_MODULES got imported at boot.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+
+# Imported on first use only; loading one of them at boot is a regression
+LAZY_MODULES = ("sklearn", "scipy", "pandas", "firebase_admin", "boto3", "PIL")
+
+
+def migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    from app.database.database import engine
+    from app.database.partitions import ensure_partitions
+
+    command.upgrade(Config(str(SERVICE_DIR / "alembic.ini")), "head")
+    with engine.begin() as conn:
+        names = ensure_partitions(conn)
+    print(f"Migrated; created {len(names)} partitions: {', '.join(names) or '-'}")
+
+
+def import_profile(module: str = "app.main") -> Tuple[float, Dict[str, float]]:
+    """(cumulative seconds of `module`, self seconds by package) in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVICE_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total = 0.0
+    by_package: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        parts = name.split(".")
+        # Our own code by subpackage (app.api, app.crud, ...), the rest by distribution
+        package = ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+        by_package[package] += int(self_us) / 1e6
+        if name == module:
+            total = int(cumulative_us) / 1e6
+    return total, by_package
+
+
+async def _run_lifespan() -> Dict[str, float]:
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        return dict(app.state.startup_timings)
+
+
+def startup_report(top: int, max_ms: float = None) -> int:
+    total, by_package = import_profile()
+    print(f"import app.main: {total * 1000:.0f} ms (python -X importtime, self time by package)")
+    ranked: List[Tuple[str, float]] = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    for package, seconds in ranked[:top]:
+        print(f"  {package:<32} {seconds * 1000:8.1f} ms")
+
+    eager = [name for name in LAZY_MODULES if name in by_package]
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+
+    timings = asyncio.run(_run_lifespan())
+    startup = sum(timings.values())
+    print(f"startup (APP_STARTUP_MODE={os.getenv('APP_STARTUP_MODE', 'full')}): {startup * 1000:.0f} ms")
+    for phase, seconds in timings.items():
+        print(f"  {phase:<32} {seconds * 1000:8.1f} ms")
+
+    over_budget = max_ms is not None and startup * 1000 > max_ms
+    if over_budget:
+        print(f"FAIL: startup over the {max_ms:.0f} ms budget")
+    return 1 if eager or over_budget else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service manager schema, seed and startup tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("migrate", help="alembic upgrade head and create upcoming partitions")
+    seed = subcommands.add_parser("seed", help="insert development seed data")
+    seed.add_argument("--iam", action="store_true", help="seed IAM services, roles and policies instead")
+    subcommands.add_parser("init-db", help="create tables with create_all (no Alembic)")
+    report = subcommands.add_parser("startup-report", help="break down import and startup time")
+    report.add_argument("--top", type=int, default=15, help="packages to list")
+    report.add_argument("--max-ms", type=float, help="fail when import + startup take longer")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate()
+    elif args.command == "seed":
+        from app.database.database import seed_data, seed_iam
+        if args.iam:
+            seed_iam()
+        else:
+            seed_data()
+    elif args.command == "init-db":
+        from app.database.database import init_db
+        init_db()
+    else:
+        sys.exit(startup_report(args.top, args.max_ms))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,5 +1,7 @@
 from fastapi import HTTPException
 from app.crud.crud import create_employee , get_employee as get_employee_service, update_employee, delete_employee , get_employee_by_department , bulk_create_employees,get_employee_by_tenant
+from app.crud.employee_import import EMPLOYEE_IMPORT_JOB, error_report_csv, run_employee_import_job, start_employee_import_job
+from app.utils.job_store import get_job_store
 import traceback
 import logging
 
@@ -28,6 +30,28 @@ class EmployeeController:
         except Exception:
             raise HTTPException(status_code=500, detail="Unexpected error occurred while creating employees.")
 
+    def start_bulk_import_job(self, file, background_tasks, tenant_id):
+        try:
+            job, path = start_employee_import_job(file, tenant_id)
+            background_tasks.add_task(run_employee_import_job, job["job_id"], tenant_id, path)
+            logger.info(f"Queued employee import job {job['job_id']} for tenant_id={tenant_id}")
+            return job
+        except HTTPException as e:
+            raise e
+        except Exception:
+            logger.exception("Failed to queue employee import job")
+            raise HTTPException(status_code=500, detail="Unexpected error occurred while starting the import.")
+
+    def get_bulk_import_job(self, job_id, tenant_id):
+        job = get_job_store().get(job_id)
+        if not job or job["kind"] != EMPLOYEE_IMPORT_JOB or job["tenant_id"] != tenant_id:
+            raise HTTPException(status_code=404, detail="Import job not found.")
+        return job
+
+    def get_bulk_import_errors_csv(self, job_id, tenant_id):
+        self.get_bulk_import_job(job_id, tenant_id)
+        return error_report_csv(get_job_store().get_report(job_id))
+
     def get_employee(self, employee_code, db, tenant_id):
         try:
             return get_employee_service(db, employee_code, tenant_id)
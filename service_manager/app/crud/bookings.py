@@ -0,0 +1,126 @@
+# app/crud/bookings.py
+"""
+Booking write path.
+
+A booking request for N dates costs a fixed number of round trips:
+one query loading the employee (shift, tenant and cutoff come from the
+tenant config cache), one existence query for all requested dates, and
+one batched INSERT ... ON CONFLICT DO NOTHING against the partial unique index on
+(employee_id, shift_id, booking_date) for live bookings. The index, not the
+existence check, is what prevents double booking under concurrency.
+"""
+import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.tenant_config import aget_tenant_config
+from app.database.models import Booking, BookingStatus, Employee
+
+# Must match the predicate of uq_bookings_employee_shift_date_active
+ACTIVE_BOOKING_PREDICATE = text("status <> 'CANCELLED'")
+
+
+async def load_booking_context(db: AsyncSession, tenant_id: int, employee_id: int, shift_id: int):
+    """
+    Shift and tenant from the tenant config cache, plus the employee.
+
+    Returns (shift, tenant, employee, booking_cutoff) with `shift` and `tenant`
+    as ShiftConfig / TenantConfig snapshots; any of them may be None when
+    missing so the caller can report which one.
+    """
+    config = await aget_tenant_config(tenant_id)
+    employee = await db.scalar(select(Employee).where(Employee.employee_id == employee_id))
+    if config is None:
+        return None, None, employee, None
+    return config.shift(shift_id), config, employee, config.booking_cutoff
+
+
+def booking_locations(log_type: str, employee, tenant) -> Optional[dict]:
+    """Pickup/drop fields for a shift direction; None for an unknown log type"""
+    employee_point = (employee.address, employee.latitude, employee.longitude)
+    office_point = (tenant.address, tenant.latitude, tenant.longitude)
+    if log_type == "in":
+        pickup, drop = employee_point, office_point
+    elif log_type == "out":
+        pickup, drop = office_point, employee_point
+    else:
+        return None
+    return {
+        "pickup_location": pickup[0],
+        "pickup_location_latitude": pickup[1],
+        "pickup_location_longitude": pickup[2],
+        "drop_location": drop[0],
+        "drop_location_latitude": drop[1],
+        "drop_location_longitude": drop[2],
+    }
+
+
+def booking_rows(employee, tenant_id: int, shift_id: int, locations: dict,
+                 booking_dates: Iterable[datetime.date]) -> List[dict]:
+    return [
+        {
+            "employee_id": employee.employee_id,
+            "employee_code": employee.employee_code,
+            "tenant_id": tenant_id,
+            "shift_id": shift_id,
+            "department_id": employee.department_id,
+            "booking_date": booking_date,
+            "status": BookingStatus.PENDING,
+            **locations,
+        }
+        for booking_date in booking_dates
+    ]
+
+
+def active_bookings_query(employee_id: int, shift_id: int, booking_dates: Iterable[datetime.date]):
+    """Dates among `booking_dates` the employee already holds a live booking for"""
+    return (
+        select(Booking.booking_date)
+        .where(
+            Booking.employee_id == employee_id,
+            Booking.shift_id == shift_id,
+            Booking.booking_date.in_(list(booking_dates)),
+            Booking.status != BookingStatus.CANCELLED,
+        )
+        .order_by(Booking.booking_date)
+    )
+
+
+def insert_bookings_statement():
+    """
+    Insert that skips rows colliding with a live booking; RETURNING yields the
+    rows actually inserted. Executed with a list of rows, SQLAlchemy batches it
+    into multi-row INSERTs (insertmanyvalues), so large batches stay under the
+    driver's bind parameter limit.
+    """
+    return (
+        insert(Booking)
+        .on_conflict_do_nothing(
+            index_elements=[Booking.employee_id, Booking.shift_id, Booking.booking_date],
+            index_where=ACTIVE_BOOKING_PREDICATE,
+        )
+        .returning(Booking.booking_id, Booking.employee_id, Booking.shift_id, Booking.booking_date)
+    )
+
+
+async def existing_booking_dates(db: AsyncSession, employee_id: int, shift_id: int,
+                                 booking_dates: List[datetime.date]) -> List[datetime.date]:
+    return list((await db.scalars(active_bookings_query(employee_id, shift_id, booking_dates))).all())
+
+
+async def insert_bookings(db: AsyncSession, rows: List[dict]) -> List[tuple]:
+    """Returns (booking_id, employee_id, shift_id, booking_date) for every inserted row"""
+    if not rows:
+        return []
+    return [tuple(row) for row in (await db.execute(insert_bookings_statement(), rows)).all()]
+
+
+def bulk_insert_bookings(db: Session, rows: List[dict]) -> List[tuple]:
+    """Sync variant of insert_bookings for background jobs"""
+    if not rows:
+        return []
+    return [tuple(row) for row in db.execute(insert_bookings_statement(), rows).all()]
@@ -1,8 +1,8 @@
 import math
+import os
 import uuid
 from fastapi.responses import JSONResponse
-import pandas as pd 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.models import Driver, Tenant, Service, Group, Policy, User, Role, Module, user_tenant, group_role, user_role, group_user,Cutoff , Shift
 from app.api.schemas.schemas import *
@@ -12,7 +12,11 @@ from app.crud.errors import handle_integrity_error
 from app.database.models import Department
 from fastapi import File, HTTPException, UploadFile
 
-from common_utils.auth.utils import hash_password
+from app.utils.password_hasher import get_password_hasher
+from app.utils.serialization import trusted
+from app.utils.weekday_mask import mask_from_names
+from app.crud.tenant_config import invalidate_tenant_config
+from common_utils.auth.token_validation import Oauth2AsAccessor
 
 
 import logging
@@ -24,6 +28,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def bump_permission_version(user_id: Optional[int] = None):
+    """Invalidate cached introspection documents for one user (or everyone)"""
+    try:
+        Oauth2AsAccessor().bump_permission_version(user_id)
+    except Exception as e:
+        logger.error(f"Failed to bump permission version for user {user_id}: {str(e)}")
+
+
+def bump_tenant_config(tenant_id: int):
+    """Invalidate the cached tenant config (office location, cutoff, shifts)"""
+    try:
+        invalidate_tenant_config(tenant_id)
+    except Exception as e:
+        logger.error(f"Failed to invalidate tenant config for tenant {tenant_id}: {str(e)}")
+
+
 # Tenant CRUD operations
 def create_tenant(db: Session, tenant: TenantCreate):
     try:
@@ -90,6 +110,7 @@ def update_tenant(db: Session, tenant_id: int, tenant_update: TenantCreate):
             db_tenant.is_active = tenant_update.is_active
 
         db.commit()
+        bump_tenant_config(tenant_id)
         db.refresh(db_tenant)
 
         logger.info(f"Tenant with tenant_id {tenant_id} updated successfully.")
@@ -120,6 +141,7 @@ def patch_tenant(db: Session, tenant_id: int, tenant_update: dict):
                 if hasattr(db_tenant, key):
                     setattr(db_tenant, key, value)
             db.commit()
+            bump_tenant_config(tenant_id)
             db.refresh(db_tenant)
         return db_tenant
     except Exception as e:
@@ -136,6 +158,7 @@ def delete_tenant(db: Session, tenant_id: int):
 
         db.delete(db_tenant)  
         db.commit()  
+        bump_tenant_config(tenant_id)
 
         logger.info(f"Tenant with tenant_id {tenant_id} deleted successfully.")  
         return {"message": f"Tenant {tenant_id} deleted successfully."}  
@@ -218,6 +241,7 @@ def update_service(db: Session, service_id: int, service_update: ServiceCreate):
             db_service.name = service_update.name
             db_service.description = service_update.description
             db.commit()
+            bump_permission_version()
             db.refresh(db_service)
         return db_service
     except Exception as e:
@@ -232,6 +256,7 @@ def patch_service(db: Session, service_id: int, service_update: dict):
                 if hasattr(db_service, key):
                     setattr(db_service, key, value)
             db.commit()
+            bump_permission_version()
             db.refresh(db_service)
         return db_service
     except Exception as e:
@@ -244,6 +269,7 @@ def delete_service(db: Session, service_id: int):
         if db_service:
             db.delete(db_service)
             db.commit()
+            bump_permission_version()
         return db_service
     except Exception as e:
         db.rollback()
@@ -305,6 +331,7 @@ def delete_group(db: Session, group_id: int):
         if db_group:
             db.delete(db_group)
             db.commit()
+            bump_permission_version()
         return db_group
     except Exception as e:
         db.rollback()
@@ -328,6 +355,7 @@ def create_policy(db: Session, policy: PolicyCreate):
         )
         db.add(db_policy)
         db.commit()
+        bump_permission_version()
         db.refresh(db_policy)
         return db_policy
     except Exception as e:
@@ -382,6 +410,7 @@ def update_policy(db: Session, policy_id: int, policy_update):
             db_policy.user_id = policy_update.user_id
             db_policy.condition = policy_update.condition
             db.commit()
+            bump_permission_version()
             db.refresh(db_policy)
         return db_policy
     except Exception as e:
@@ -396,6 +425,7 @@ def patch_policy(db: Session, policy_id: int, policy_update: dict):
                 if hasattr(db_policy, key):
                     setattr(db_policy, key, value)
             db.commit()
+            bump_permission_version()
             db.refresh(db_policy)
         return db_policy
     except Exception as e:
@@ -408,6 +438,7 @@ def delete_policy(db: Session, policy_id: int):
         if db_policy:
             db.delete(db_policy)
             db.commit()
+            bump_permission_version()
         return db_policy
     except Exception as e:
         db.rollback()
@@ -452,6 +483,7 @@ def update_user(db: Session, user_id: int, user_update: UserCreate):
             for key, value in user_update.dict().items():
                 setattr(db_user, key, value)
             db.commit()
+            bump_permission_version(user_id)
             db.refresh(db_user)
             return db_user
     except Exception as e:
@@ -466,6 +498,7 @@ def patch_user(db: Session, user_id: int, user_update: dict):
                 if hasattr(db_user, key):
                     setattr(db_user, key, value)
             db.commit()
+            bump_permission_version(user_id)
             db.refresh(db_user)
         return db_user
     except Exception as e:
@@ -478,6 +511,7 @@ def delete_user(db: Session, user_id: int):
         if db_user:
             db.delete(db_user)
             db.commit()
+            bump_permission_version(user_id)
         return db_user
     except Exception as e:
         db.rollback()
@@ -520,6 +554,7 @@ def add_group_role(db: Session, group_id: int, role_id: int):
         stmt = group_role.insert().values(group_id=group_id, role_id=role_id)
         db.execute(stmt)
         db.commit()
+        bump_permission_version()
         return {"added": True}
     except Exception as e:
         db.rollback()
@@ -536,6 +571,7 @@ def remove_group_role(db: Session, group_id: int, role_id: int):
         )
         db.execute(stmt)
         db.commit()
+        bump_permission_version()
         return {"removed": True}
     except Exception as e:
         db.rollback()
@@ -547,6 +583,7 @@ def add_user_role(db: Session, user_id: int, role_id: int, tenant_id: int):
         stmt = user_role.insert().values(user_id=user_id, role_id=role_id, tenant_id=tenant_id)
         db.execute(stmt)
         db.commit()
+        bump_permission_version(user_id)
         return {"added": True}
     except Exception as e:
         db.rollback()
@@ -567,6 +604,7 @@ def remove_user_role(db: Session, user_id: int, role_id: int, tenant_id: int):
         )
         db.execute(stmt)
         db.commit()
+        bump_permission_version(user_id)
         return {"removed": True}
     except Exception as e:
         db.rollback()
@@ -581,6 +619,7 @@ def add_group_user(db: Session, group_id: int, user_id: int):
         )
         db.execute(stmt)
         db.commit()
+        bump_permission_version(user_id)
         return {"status": "success", "message": "User added to group"}
     except Exception as e:
         db.rollback()
@@ -597,6 +636,7 @@ def remove_group_user(db: Session, group_id: int, user_id: int):
         )
         db.execute(stmt)
         db.commit()
+        bump_permission_version(user_id)
         return {"removed": True}
     except Exception as e:
         db.rollback()
@@ -810,7 +850,8 @@ from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
 from app.database.models import Employee, User, Tenant, Department
-from app.firebase.employee_push import push_employee_to_firebase
+from app.firebase.employee_push import employee_path, queue_employee_push
+from app.crud.employee_import import import_employees, save_upload as save_employee_upload
 
 
 
@@ -902,7 +943,7 @@ def create_employee(db: Session, employee, tenant_id):
             name=employee.name.strip(),
             email=employee.email.strip(),
             mobile_number=employee.mobile_number.strip(),
-            hashed_password=hash_password(employee.employee_code.strip()),
+            hashed_password=get_password_hasher().hash(employee.employee_code.strip()),
             department_id=employee.department_id,
             tenant_id=tenant_id,
             gender=employee.gender,
@@ -920,21 +961,18 @@ def create_employee(db: Session, employee, tenant_id):
         )
 
         db.add(db_employee)
+        db.flush()
+        # Firebase sync is sent by the outbox dispatcher once this commits
+        queue_employee_push(
+            db,
+            tenant_id=tenant_id,
+            department_id=db_employee.department_id,
+            employee_code=db_employee.employee_code,
+            employee_id=db_employee.employee_id,
+            name=db_employee.name
+        )
         db.commit()
         db.refresh(db_employee)
-        
-
-        # Push to Firebase after DB commit
-        try:
-            push_employee_to_firebase(
-                tenant_id=tenant_id,
-                department_id=employee.department_id,
-                employee_code=db_employee.employee_code,
-                employee_id=db_employee.employee_id,
-                name=db_employee.name
-            )
-        except Exception as e:
-            logger.error(f"Failed to push employee to Firebase: {str(e)}")
 
         logger.info(f"Employee created successfully with ID: {db_employee.employee_code}")
         return {
@@ -996,249 +1034,30 @@ def clean_employee_dict(emp_dict):
             emp_dict[k] = clean_for_json(v)
     return emp_dict
 
-def safe_float(val):
-    """Convert pandas float to JSON-safe float or None."""
-    if val is None or pd.isna(val) or isinstance(val, float) and math.isnan(val):
-        return None
-    return float(val)
-
-ALLOWED_SPECIAL_NEEDS = ['pregnancy', 'others', 'none', None]
-
-
 def bulk_create_employees(file, tenant_id: int, db: Session):
-
+    """
+    Synchronous bulk import (legacy /employees/bulk). Large files should use the
+    background job endpoints, which run the same pipeline.
+    """
     logger.info(f"Starting bulk employee creation for tenant_id: {tenant_id}, file: {file.filename}")
 
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        logger.warning(f"Invalid file format: {file.filename}")
-        raise HTTPException(status_code=400, detail="Only Excel files are allowed.")
-
+    path = save_employee_upload(file)
     try:
-        df = pd.read_excel(file.file)
-        logger.info(f"Excel file read successfully with {len(df)} rows")
-
-        required_columns = ['name', 'email', 'mobile_number', 'department_id', 'employee_code']
-        missing_cols = [col for col in required_columns if col not in df.columns]
-        if missing_cols:
-            logger.warning(f"Missing required columns: {missing_cols}")
-            raise HTTPException(status_code=422, detail=f"Missing required columns in Excel: {missing_cols}")
-
-        created_employees = []
-        skipped_employees = []
-        errors = []
-        employees_to_add = []
-
-        tenant = db.query(Tenant).filter(Tenant.tenant_id == tenant_id).first()
-        if not tenant:
-            logger.error(f"Tenant not found: {tenant_id}")
-            raise HTTPException(status_code=404, detail="Tenant not found.")
-        logger.info(f"Tenant found: {tenant.tenant_name}")
-
-        for idx, row in df.iterrows():
-            logger.info(f"Processing row {idx + 2}: {row.to_dict()}")
-            try:
-                mobile_val_str = None
-                if pd.notna(row.get('mobile_number')):
-                    try:
-                        mobile_val_str = str(int(float(row.get('mobile_number'))))
-                    except (ValueError, TypeError):
-                        row_issues.append("Invalid mobile_number")
-                latitude = safe_float(row.get('latitude'))
-                longitude = safe_float(row.get('longitude'))
-                alternate_mobile_val = safe_float(row.get('alternate_mobile_number'))
-                row_issues = []
-
-                # --- Required fields ---
-                name_val = row.get('name')
-                email_val = row.get('email')
-                mobile_val = row.get('mobile_number')
-                department_id_val = row.get('department_id')
-                employee_code_val = row.get('employee_code')
-
-                if pd.isna(name_val) or not str(name_val).strip():
-                    row_issues.append("Missing name")
-                if pd.isna(email_val) or not str(email_val).strip():
-                    row_issues.append("Missing email")
-                mobile_val = row.get('mobile_number')
-                mobile_val_str = None
-                if pd.isna(mobile_val):
-                    row_issues.append("Missing mobile_number")
-                else:
-                    try:
-                        # Convert to integer safely
-                        mobile_val_str = str(int(float(mobile_val)))
-                    except (ValueError, TypeError):
-                        row_issues.append("Invalid mobile_number")
-                if pd.isna(department_id_val):
-                    row_issues.append("Missing department_id")
-                if pd.isna(employee_code_val) or not str(employee_code_val).strip():
-                    row_issues.append("Missing employee_code")
-
-                # Normalize for DB checks
-                email_val = str(email_val).strip() if pd.notna(email_val) else None
-                mobile_val = mobile_val_str
-                employee_code_val = str(employee_code_val).strip() if pd.notna(employee_code_val) else None
-                department_id_int = int(department_id_val) if pd.notna(department_id_val) else None
-
-                # --- Duplicate checks ---
-                if email_val and db.query(Employee).filter(Employee.email == email_val, Employee.tenant_id == tenant_id).first():
-                    row_issues.append(f"Email {email_val} exists")
-                if mobile_val and db.query(Employee).filter(Employee.mobile_number == mobile_val, Employee.tenant_id == tenant_id).first():
-                    row_issues.append(f"Mobile {mobile_val} exists")
-                if employee_code_val and db.query(Employee).filter(Employee.employee_code == employee_code_val, Employee.tenant_id == tenant_id).first():
-                    row_issues.append(f"Employee code {employee_code_val} exists")
-
-                # --- Special need checks ---
-                special_need_val = str(row.get('special_need')).lower() if row.get('special_need') else None
-                if special_need_val and special_need_val not in ALLOWED_SPECIAL_NEEDS:
-                    row_issues.append(f"Invalid special_need: {special_need_val}")
-                if special_need_val and special_need_val != 'none':
-                    special_need_start_date = row.get('special_need_start_date')
-                    if pd.isna(special_need_start_date):
-                        special_need_start_date = None
-
-                    special_need_end_date = row.get('special_need_end_date')
-                    if pd.isna(special_need_end_date):
-                        special_need_end_date = None
-
-                    if special_need_val and special_need_val != 'none':
-                        if not special_need_start_date or not special_need_end_date:
-                            row_issues.append("Missing special_need_start_date or special_need_end_date")
-                        elif special_need_start_date > special_need_end_date:
-                            row_issues.append("special_need_start_date > special_need_end_date")
-
-
-                # --- Department check ---
-                department = db.query(Department).filter(
-                    Department.department_id == department_id_int,
-                    Department.tenant_id == tenant_id
-                ).first()
-                if not department:
-                    row_issues.append(f"Department {department_id_val} not found")
-
-                # --- Coordinates check ---
-                latitude_val = row.get('latitude')
-                if pd.notna(latitude_val) and not math.isnan(latitude_val):
-                    latitude_val = float(latitude_val)
-                else:
-                    latitude_val = None
-
-                longitude_val = row.get('longitude')
-                if pd.notna(longitude_val) and not math.isnan(longitude_val):
-                    longitude_val = float(longitude_val)
-                else:
-                    longitude_val = None
-                # --- Skip row if any issues ---
-                if row_issues:
-                    skipped_employees.append({
-                        "row": idx + 2,
-                        "issues": row_issues,
-                        "department_id": department_id_val,
-                        "reason": "Row validation failed"
-                    })
-                    continue
-
-                # --- Prepare final values ---
-                name = str(name_val).strip()
-                email = email_val
-                mobile_number = mobile_val
-                gender = row.get('gender')
-                office = row.get('office')
-                alternate_mobile_number = row.get('alternate_mobile_number')
-                subscribe_via_email = bool(row.get('subscribe_via_email', False))
-                subscribe_via_sms = bool(row.get('subscribe_via_sms', False))
-                address = row.get('address')
-                landmark = row.get('landmark')
-                special_need = None if special_need_val == 'none' else special_need_val
-                special_need_start_date = row.get('special_need_start_date') if special_need else None
-                special_need_end_date = row.get('special_need_end_date') if special_need else None
-
-                db_employee = Employee(
-                    employee_code=employee_code_val,
-                    name=name,
-                    email=email,
-                    mobile_number=mobile_number,
-                    hashed_password=hash_password(employee_code_val),
-                    department_id=department.department_id,
-                    tenant_id=tenant_id,
-                    gender=gender,
-                    alternate_mobile_number=alternate_mobile_number,
-                    office=office,
-                    special_need=special_need,
-                    special_need_start_date=special_need_start_date,
-                    special_need_end_date=special_need_end_date,
-                    subscribe_via_email=subscribe_via_email,
-                    subscribe_via_sms=subscribe_via_sms,
-                    address=address,
-                    latitude=latitude,
-                    longitude=longitude,
-                    landmark=landmark
-                )
-                employees_to_add.append(db_employee)
-                logger.info(f"Prepared employee object for {employee_code_val} at row {idx + 2}")
-
-            except Exception as row_error:
-                logger.error(f"Error processing row {idx + 2}: {row_error}")
-                errors.append({"row": idx + 2, "error": str(row_error)})
-
-        # --- Insert all valid employees ---
-        try:
-            db.add_all(employees_to_add)
-            db.commit()
-            logger.info(f"Inserted {len(employees_to_add)} employees into the database")
-            for emp in employees_to_add:
-                department = db.query(Department).filter(Department.department_id == emp.department_id).first()
-                created_employees.append({
-                    "employee_code": emp.employee_code,
-                    "employee_id": emp.employee_id,
-                    "name": emp.name,
-                    "email": emp.email,
-                    "mobile_number": emp.mobile_number,
-                    "department_id": emp.department_id,
-                    "department_name": department.department_name if department else None,
-                    "gender": emp.gender,
-                    "alternate_mobile_number": emp.alternate_mobile_number,
-                    "office": emp.office,
-                    "special_need": emp.special_need,
-                    "special_need_start_date": emp.special_need_start_date,
-                    "special_need_end_date": emp.special_need_end_date,
-                    "subscribe_via_email": emp.subscribe_via_email,
-                    "subscribe_via_sms": emp.subscribe_via_sms,
-                    "address": emp.address,
-                    "latitude": emp.latitude,
-                    "longitude": emp.longitude,
-                    "landmark": emp.landmark
-                })
-
-                try:
-                    push_employee_to_firebase(
-                        tenant_id=tenant_id,
-                        department_id=emp.department_id,
-                        employee_code=emp.employee_code,
-                        employee_id=emp.employee_id,
-                        name=emp.name
-                    )
-                    logger.info(f"Pushed employee {emp.employee_code} to Firebase")
-                except Exception as e:
-                    logger.error(f"Firebase push failed for {emp.employee_code}: {str(e)}")
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Bulk insert failed: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to save employees to the database.")
-
-        logger.info(f"Bulk employee creation completed. Created: {len(created_employees)}, Skipped: {len(skipped_employees)}, Errors: {len(errors)}")
-        created_employees = [clean_employee_dict(emp) for emp in created_employees]
-        skipped_employees = [clean_employee_dict(emp) for emp in skipped_employees]
-        errors = [clean_employee_dict(emp) for emp in errors]
-
-        return {
-            "created": created_employees,
-            "skipped": skipped_employees,
-            "errors": errors
-        }
+        result = import_employees(db, tenant_id, path)
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         logger.error(f"Bulk employee creation failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process the Excel file.")
+    finally:
+        os.remove(path)
+
+    return {
+        "created": [clean_employee_dict(emp) for emp in result["created"]],
+        "skipped": [clean_employee_dict(emp) for emp in result["skipped"]],
+        "errors": [clean_employee_dict(emp) for emp in result["errors"]],
+    }
 
 import traceback
 
@@ -1379,7 +1198,8 @@ def get_employee_by_department(db: Session, department_id: int, tenant_id: int,
 
 def get_employee_by_tenant(
     db: Session, tenant_id: int, page: int = 1, limit: int = 50
-) -> EmployeesByTenantResponse:
+) -> dict:
+    """EmployeesByTenantResponse as a trusted dict (see app.utils.serialization)"""
     try:
         logger.info(f"Fetching employees for tenant_id={tenant_id}, page={page}, limit={limit}")
 
@@ -1388,37 +1208,27 @@ def get_employee_by_tenant(
         total_employees = query.count()
 
         # Apply pagination
-        employees = query.offset((page - 1) * limit).limit(limit).all()
+        employees = (
+            query.options(joinedload(Employee.department))
+            .offset((page - 1) * limit).limit(limit).all()
+        )
 
         if not employees:
             logger.warning(f"No employees found for tenant_id={tenant_id}")
             raise HTTPException(status_code=404, detail="No employees found for this tenant.")
 
-        employee_list: List[EmployeeResponse] = []
-        for emp in employees:
-            employee_list.append(EmployeeResponse(
-                employee_code=emp.employee_code,
-                employee_id=emp.employee_id,
-                name=emp.name,
-                email=emp.email,
-                gender=emp.gender,
-                mobile_number=emp.mobile_number,
-                alternate_mobile_number=emp.alternate_mobile_number,
-                office=emp.office,
-                special_need=emp.special_need,
-                special_need_start_date=emp.special_need_start_date,
-                special_need_end_date=emp.special_need_end_date,
-                subscribe_via_email=emp.subscribe_via_email,
-                subscribe_via_sms=emp.subscribe_via_sms,
-                address=emp.address,
-                latitude=emp.latitude,
-                longitude=emp.longitude,
-                landmark=emp.landmark,
+        # Rows from our own database: no validation needed
+        employee_list = [
+            trusted(
+                EmployeeResponse,
+                emp,
                 department_name=emp.department.department_name if emp.department else None,
-                department_id=emp.department_id
-            ))
+            )
+            for emp in employees
+        ]
 
-        return EmployeesByTenantResponse(
+        return trusted(
+            EmployeesByTenantResponse,
             tenant_id=tenant_id,
             total_employees=total_employees,
             employees=employee_list
@@ -1455,6 +1265,7 @@ def update_employee(db: Session, employee_code: str, employee_update: EmployeeUp
                         "data": None
                     }
                 )
+        previous_firebase_path = employee_path(tenant_id, db_employee.department_id, db_employee.employee_code)
 
         # 2️⃣ Check duplicate employee_code (if updated)
         if employee_update.employee_code and employee_update.employee_code != db_employee.employee_code:
@@ -1634,25 +1445,21 @@ def update_employee(db: Session, employee_code: str, employee_update: EmployeeUp
             if value is not None:
                 setattr(db_employee, field, value.strip() if isinstance(value, str) else value)
 
-        # 6️⃣ Commit changes
+        # 6️⃣ Queue the Firebase sync and commit with the changes
+        queue_employee_push(
+            db,
+            tenant_id=tenant_id,
+            department_id=db_employee.department_id,
+            employee_code=db_employee.employee_code,
+            employee_id=db_employee.employee_id,
+            name=db_employee.name,
+            previous_path=previous_firebase_path
+        )
         db.commit()
         db.refresh(db_employee)
         logger.info(f"[{request_id}] Employee updated successfully")
 
-        # 7️⃣ Push to Firebase (non-blocking failure)
-        try:
-            from app.firebase.employee_push import push_employee_to_firebase
-            push_employee_to_firebase(
-                tenant_id=tenant_id,
-                department_id=db_employee.department_id,
-                employee_code=db_employee.employee_code,
-                employee_id=db_employee.employee_id,
-                name=db_employee.name
-            )
-        except Exception as e:
-            logger.error(f"[{request_id}] Firebase sync failed: {str(e)}")
-
-        # 8️⃣ Structured Response
+        # 7️⃣ Structured Response
         return {
             "status": "success",
             "code": 200,
@@ -1775,6 +1582,7 @@ def create_cutoff(db: Session, cutoff: CutoffCreate, tenant_id: int):
     )
     db.add(db_cutoff)
     db.commit()
+    bump_tenant_config(tenant_id)
     db.refresh(db_cutoff)
     return db_cutoff
 
@@ -1791,6 +1599,7 @@ def update_cutoff(db: Session, tenant_id: int, cutoff_update: CutoffUpdate):
         setattr(cutoff, field, value)
 
     db.commit()
+    bump_tenant_config(tenant_id)
     db.refresh(cutoff)
     return cutoff
 
@@ -1806,6 +1615,7 @@ def create_shift(db: Session, tenant_id: int, shift_data: ShiftCreate):
         log_type=shift_data.log_type,
         shift_time=shift_data.shift_time,
         day=",".join(shift_data.day),  # <-- Important!
+        weekday_mask=mask_from_names(shift_data.day),
         waiting_time_minutes=shift_data.waiting_time_minutes,
         pickup_type=shift_data.pickup_type,
         gender=shift_data.gender,
@@ -1814,6 +1624,7 @@ def create_shift(db: Session, tenant_id: int, shift_data: ShiftCreate):
 
     db.add(db_shift)
     db.commit()
+    bump_tenant_config(tenant_id)
     db.refresh(db_shift)
     return db_shift
 
@@ -1856,8 +1667,11 @@ def update_shift(db: Session, tenant_id: int, shift_id: int, shift_update: Shift
     try:
         for key, value in shift_update.dict(exclude_unset=True).items():
             setattr(shift, key, value)
+            if key == "day":
+                shift.weekday_mask = mask_from_names(value or [])
 
         db.commit()
+        bump_tenant_config(tenant_id)
         db.refresh(shift)
         return shift
     except Exception:
@@ -1899,6 +1713,7 @@ def delete_shift(db: Session, tenant_id: int, shift_id: int):
     try:
         db.delete(shift)  # 👈 Hard delete
         db.commit()
+        bump_tenant_config(tenant_id)
         return {"detail": f"Shift ID {shift_id} deleted successfully."}
     except Exception:
         db.rollback()
@@ -0,0 +1,428 @@
+# app/crud/employee_import.py
+"""
+Bulk employee import from Excel.
+
+Rows are streamed from the workbook (app.utils.spreadsheet) and processed in
+chunks of EMPLOYEE_IMPORT_CHUNK_SIZE:
+
+  1. every row of the chunk is validated in memory against the tenant's
+     departments, which are loaded once per import,
+  2. one query per chunk finds emails, mobile numbers and employee codes that
+     already exist, and duplicates inside the file are tracked across chunks,
+  3. default passwords for the accepted rows are hashed as one batch on the
+     hashing pool,
+  4. the rows are written with one multi-row INSERT ... RETURNING per chunk,
+     and their Firebase sync is queued in the same transaction (the outbox
+     dispatcher sends it as batched multi-path updates).
+
+`import_employees` runs the pipeline inline (legacy /employees/bulk);
+`run_employee_import_job` runs it as a background job reporting progress and
+rejected rows to the job store.
+"""
+import csv
+import io
+import logging
+import os
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import Department, Employee, Tenant
+from app.firebase.employee_push import queue_employees_push
+from app.utils import spreadsheet
+from app.utils.spreadsheet import cell_date, cell_text, is_blank
+from app.utils.job_store import JOB_COMPLETED, JOB_FAILED, JOB_RUNNING, get_job_store
+from app.utils.password_hasher import get_password_hasher
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_IMPORT_CHUNK_SIZE = int(os.getenv("EMPLOYEE_IMPORT_CHUNK_SIZE", "1000"))
+EMPLOYEE_IMPORT_JOB = "employee_import"
+
+ALLOWED_EXTENSIONS = (".xlsx", ".xls")
+REQUIRED_COLUMNS = ["name", "email", "mobile_number", "department_id", "employee_code"]
+ALLOWED_SPECIAL_NEEDS = ("pregnancy", "others", "none")
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def save_upload(file: UploadFile) -> str:
+    """Copy an uploaded workbook to a temporary file and return its path"""
+    return spreadsheet.save_upload(file, ALLOWED_EXTENSIONS, prefix="employee_import_")
+
+
+def read_employee_rows(path: str) -> Tuple[Optional[int], Iterator[Tuple[int, dict]]]:
+    """Returns (estimated row count, iterator of (row number, row dict))"""
+    return spreadsheet.read_rows(path, REQUIRED_COLUMNS)
+
+
+def inspect_workbook(path: str) -> Optional[int]:
+    """Check the header row up front; returns the estimated number of data rows"""
+    return spreadsheet.inspect(path, REQUIRED_COLUMNS)
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+def _phone(value) -> Optional[str]:
+    """Excel stores phone numbers as numbers; normalise to a digit string"""
+    if is_blank(value):
+        return None
+    return str(int(float(value)))
+
+
+def _coordinate(value) -> Optional[str]:
+    if is_blank(value):
+        return None
+    return str(float(value))
+
+
+def _bool(value) -> bool:
+    if is_blank(value):
+        return False
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def validate_employee_row(row: dict, tenant_id: int, departments: Dict[int, str]) -> Tuple[Optional[dict], List[str]]:
+    """Returns (insert values, issues); values is None when the row is rejected"""
+    issues = []
+
+    name = cell_text(row.get("name"))
+    email = cell_text(row.get("email"))
+    employee_code = cell_text(row.get("employee_code"))
+    if not name:
+        issues.append("Missing name")
+    if not email:
+        issues.append("Missing email")
+    if not employee_code:
+        issues.append("Missing employee_code")
+
+    mobile_number = None
+    if is_blank(row.get("mobile_number")):
+        issues.append("Missing mobile_number")
+    else:
+        try:
+            mobile_number = _phone(row.get("mobile_number"))
+        except (ValueError, TypeError):
+            issues.append("Invalid mobile_number")
+
+    alternate_mobile_number = None
+    try:
+        alternate_mobile_number = _phone(row.get("alternate_mobile_number"))
+    except (ValueError, TypeError):
+        issues.append("Invalid alternate_mobile_number")
+
+    department_id = None
+    if is_blank(row.get("department_id")):
+        issues.append("Missing department_id")
+    else:
+        try:
+            department_id = int(float(row.get("department_id")))
+        except (ValueError, TypeError):
+            issues.append(f"Invalid department_id {row.get('department_id')}")
+        else:
+            if department_id not in departments:
+                issues.append(f"Department {department_id} not found")
+
+    special_need = cell_text(row.get("special_need"))
+    special_need = special_need.lower() if special_need else None
+    special_need_start_date = special_need_end_date = None
+    if special_need and special_need not in ALLOWED_SPECIAL_NEEDS:
+        issues.append(f"Invalid special_need: {special_need}")
+    if special_need == "none":
+        special_need = None
+    if special_need:
+        try:
+            special_need_start_date = cell_date(row.get("special_need_start_date"))
+            special_need_end_date = cell_date(row.get("special_need_end_date"))
+        except (ValueError, TypeError):
+            issues.append("Invalid special_need_start_date or special_need_end_date")
+        else:
+            if not special_need_start_date or not special_need_end_date:
+                issues.append("Missing special_need_start_date or special_need_end_date")
+            elif special_need_start_date > special_need_end_date:
+                issues.append("special_need_start_date > special_need_end_date")
+
+    try:
+        latitude = _coordinate(row.get("latitude"))
+        longitude = _coordinate(row.get("longitude"))
+    except (ValueError, TypeError):
+        issues.append("Invalid latitude or longitude")
+        latitude = longitude = None
+
+    if issues:
+        return None, issues
+
+    return {
+        "employee_code": employee_code,
+        "name": name,
+        "email": email,
+        "mobile_number": mobile_number,
+        "department_id": department_id,
+        "tenant_id": tenant_id,
+        "gender": cell_text(row.get("gender")),
+        "alternate_mobile_number": alternate_mobile_number,
+        "office": cell_text(row.get("office")),
+        "special_need": special_need,
+        "special_need_start_date": special_need_start_date,
+        "special_need_end_date": special_need_end_date,
+        "subscribe_via_email": _bool(row.get("subscribe_via_email")),
+        "subscribe_via_sms": _bool(row.get("subscribe_via_sms")),
+        "address": cell_text(row.get("address")),
+        "latitude": latitude,
+        "longitude": longitude,
+        "landmark": cell_text(row.get("landmark")),
+    }, []
+
+
+# ---------------------------------------------------------------------------
+# Chunk processing
+# ---------------------------------------------------------------------------
+
+UNIQUE_FIELDS = (
+    ("email", "Email"),
+    ("mobile_number", "Mobile"),
+    ("employee_code", "Employee code"),
+)
+
+
+def _existing_values(db: Session, candidates: List[dict]) -> Dict[str, set]:
+    """Emails, mobile numbers and codes of the chunk that are already taken (one query)"""
+    values = {field: {c[field] for c in candidates} for field, _ in UNIQUE_FIELDS}
+    # The unique constraints are global, not per tenant
+    rows = db.execute(
+        select(Employee.email, Employee.mobile_number, Employee.employee_code).where(
+            or_(
+                Employee.email.in_(values["email"]),
+                Employee.mobile_number.in_(values["mobile_number"]),
+                Employee.employee_code.in_(values["employee_code"]),
+            )
+        )
+    ).all()
+    return {
+        "email": {row.email for row in rows} & values["email"],
+        "mobile_number": {row.mobile_number for row in rows} & values["mobile_number"],
+        "employee_code": {row.employee_code for row in rows} & values["employee_code"],
+    }
+
+
+def _rejection(row_number: int, row: dict, issues: List[str]) -> dict:
+    return {
+        "row": row_number,
+        "employee_code": cell_text(row.get("employee_code")),
+        "email": cell_text(row.get("email")),
+        "department_id": row.get("department_id"),
+        "issues": issues,
+        "reason": "Row validation failed",
+    }
+
+
+def _insert_rows(db: Session, records: List[dict]) -> List[Tuple[int, str]]:
+    """Multi-row INSERT ... RETURNING; returns (employee_id, employee_code) pairs"""
+    result = db.execute(
+        insert(Employee).returning(Employee.employee_id, Employee.employee_code),
+        records,
+    )
+    return [tuple(row) for row in result]
+
+
+def _insert_rows_individually(db: Session, records: List[Tuple[int, dict]]):
+    """
+    Fallback when the chunk insert hit a constraint (a concurrent write took a
+    value after our duplicate check): insert row by row so only the
+    conflicting rows are rejected.
+    """
+    inserted, failed = [], []
+    for row_number, record in records:
+        try:
+            with db.begin_nested():
+                inserted.extend(_insert_rows(db, [record]))
+        except IntegrityError as e:
+            failed.append({"row": row_number, "employee_code": record["employee_code"],
+                           "error": f"Conflicts with an existing employee: {str(e.orig).splitlines()[0]}"})
+    return inserted, failed
+
+
+def _process_chunk(db: Session, tenant_id: int, chunk: List[Tuple[int, dict]],
+                   departments: Dict[int, str], seen: Dict[str, Dict[str, int]]):
+    skipped, errors, candidates = [], [], []
+
+    for row_number, row in chunk:
+        try:
+            record, issues = validate_employee_row(row, tenant_id, departments)
+        except Exception as row_error:
+            logger.error(f"Error processing row {row_number}: {row_error}")
+            errors.append({"row": row_number, "error": str(row_error)})
+            continue
+        if issues:
+            skipped.append(_rejection(row_number, row, issues))
+            continue
+        candidates.append((row_number, row, record))
+
+    accepted = []
+    if candidates:
+        existing = _existing_values(db, [record for _, _, record in candidates])
+        for row_number, row, record in candidates:
+            issues = []
+            for field, label in UNIQUE_FIELDS:
+                value = record[field]
+                if value in existing[field]:
+                    issues.append(f"{label} {value} exists")
+                elif value in seen[field]:
+                    issues.append(f"{label} {value} repeats row {seen[field][value]}")
+            if issues:
+                skipped.append(_rejection(row_number, row, issues))
+                continue
+            for field, _ in UNIQUE_FIELDS:
+                seen[field][record[field]] = row_number
+            accepted.append((row_number, record))
+
+    if not accepted:
+        return [], skipped, errors
+
+    # Default password is the employee code, as for single creation
+    hashed_passwords = get_password_hasher().hash_many([record["employee_code"] for _, record in accepted])
+    for (_, record), hashed in zip(accepted, hashed_passwords):
+        record["hashed_password"] = hashed
+
+    try:
+        inserted = _insert_rows(db, [record for _, record in accepted])
+    except IntegrityError:
+        db.rollback()
+        inserted, failed = _insert_rows_individually(db, accepted)
+        errors.extend(failed)
+
+    records_by_code = {record["employee_code"]: record for _, record in accepted}
+    created = []
+    for employee_id, employee_code in inserted:
+        record = records_by_code[employee_code]
+        created.append({
+            "employee_id": employee_id,
+            "department_name": departments.get(record["department_id"]),
+            **{key: value for key, value in record.items() if key not in ("hashed_password", "tenant_id")},
+        })
+
+    queue_employees_push(db, tenant_id, created)
+    db.commit()
+
+    return created, skipped, errors
+
+
+def import_employees(db: Session, tenant_id: int, path: str,
+                     on_chunk: Optional[Callable[[int, List[dict], List[dict], List[dict]], None]] = None,
+                     collect_created: bool = True) -> dict:
+    """
+    Import employees from the workbook at `path`.
+
+    on_chunk(processed_rows, created, skipped, errors) is called after every
+    committed chunk.
+    """
+    tenant = db.query(Tenant).filter(Tenant.tenant_id == tenant_id).first()
+    if not tenant:
+        logger.error(f"Tenant not found: {tenant_id}")
+        raise HTTPException(status_code=404, detail="Tenant not found.")
+
+    departments = dict(
+        db.query(Department.department_id, Department.department_name)
+        .filter(Department.tenant_id == tenant_id)
+        .all()
+    )
+
+    _, rows = read_employee_rows(path)
+    seen = {field: {} for field, _ in UNIQUE_FIELDS}
+    result = {"created": [], "skipped": [], "errors": []}
+    created_count = processed = 0
+
+    try:
+        while True:
+            chunk = list(islice(rows, EMPLOYEE_IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            created, skipped, errors = _process_chunk(db, tenant_id, chunk, departments, seen)
+            processed += len(chunk)
+            created_count += len(created)
+            if collect_created:
+                result["created"].extend(created)
+            result["skipped"].extend(skipped)
+            result["errors"].extend(errors)
+            logger.info(f"Employee import tenant_id={tenant_id}: {processed} rows processed, {created_count} created")
+            if on_chunk is not None:
+                on_chunk(processed, created, skipped, errors)
+    finally:
+        rows.close()
+
+    logger.info(
+        f"Bulk employee import completed for tenant_id={tenant_id}. Created: {created_count}, "
+        f"Skipped: {len(result['skipped'])}, Errors: {len(result['errors'])}"
+    )
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Background job
+# ---------------------------------------------------------------------------
+
+def start_employee_import_job(file: UploadFile, tenant_id: int) -> Tuple[dict, str]:
+    """Persist the upload and register a queued job; returns (job, path)"""
+    path = save_upload(file)
+    try:
+        total = inspect_workbook(path)
+    except Exception:
+        os.remove(path)
+        raise
+    store = get_job_store()
+    job = store.create(EMPLOYEE_IMPORT_JOB, tenant_id, file.filename)
+    job = store.update(job["job_id"], total_rows=total) or job
+    return job, path
+
+
+def run_employee_import_job(job_id: str, tenant_id: int, path: str):
+    """Background task body: runs the import in its own session"""
+    store = get_job_store()
+    store.update(job_id, status=JOB_RUNNING)
+    counters = {"created_rows": 0, "rejected_rows": 0}
+
+    def on_chunk(processed, created, skipped, errors):
+        counters["created_rows"] += len(created)
+        counters["rejected_rows"] += len(skipped) + len(errors)
+        store.append_report(job_id, skipped + errors)
+        store.update(job_id, processed_rows=processed, **counters)
+
+    db = SessionLocal()
+    try:
+        import_employees(db, tenant_id, path, on_chunk=on_chunk, collect_created=False)
+        store.update(job_id, status=JOB_COMPLETED)
+    except HTTPException as e:
+        store.update(job_id, status=JOB_FAILED, error=str(e.detail))
+    except Exception as e:
+        logger.exception(f"Employee import job {job_id} failed")
+        db.rollback()
+        store.update(job_id, status=JOB_FAILED, error=str(e))
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def error_report_csv(errors: List[dict]) -> str:
+    """Rejected rows as CSV: row, employee_code, email, issues"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["row", "employee_code", "email", "issues"])
+    for error in sorted(errors, key=lambda e: e.get("row") or 0):
+        issues = error.get("issues") or [error.get("error", "")]
+        writer.writerow([error.get("row"), error.get("employee_code") or "", error.get("email") or "", "; ".join(issues)])
+    return output.getvalue()
@@ -0,0 +1,162 @@
+# app/crud/exports.py
+"""
+Export queries for admins: bookings by date range, confirmed routes with
+their stops, and the employee and driver rosters.
+
+Each returns a Core SELECT of plain, labelled columns (no ORM entities, no
+schema validation), ordered by a key so exports are stable. They are
+streamed by app.utils.exports.export_response.
+"""
+import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from app.database.models import (
+    Booking, BookingStatus, Department, Driver, Employee, RouteStatus, Shift, ShiftRoute, ShiftRouteStop, Vendor,
+)
+
+
+def bookings_export(tenant_id: int, start_date: datetime.date, end_date: datetime.date,
+                    shift_id: Optional[int] = None, status: Optional[BookingStatus] = None) -> Select:
+    query = (
+        select(
+            Booking.booking_id,
+            Booking.booking_date,
+            Shift.shift_code,
+            Shift.log_type,
+            Shift.shift_time,
+            Booking.employee_code,
+            Employee.name.label("employee_name"),
+            Department.department_name,
+            Booking.status,
+            Booking.pickup_location,
+            Booking.pickup_location_latitude,
+            Booking.pickup_location_longitude,
+            Booking.drop_location,
+            Booking.drop_location_latitude,
+            Booking.drop_location_longitude,
+            Booking.created_at,
+            Booking.updated_at,
+        )
+        .join(Shift, Shift.id == Booking.shift_id)
+        .join(Employee, Employee.employee_id == Booking.employee_id)
+        .join(Department, Department.department_id == Booking.department_id)
+        .where(Booking.tenant_id == tenant_id, Booking.booking_date.between(start_date, end_date))
+        .order_by(Booking.booking_date, Booking.booking_id)
+    )
+    if shift_id is not None:
+        query = query.where(Booking.shift_id == shift_id)
+    if status is not None:
+        query = query.where(Booking.status == status)
+    return query
+
+
+def routes_export(tenant_id: int, start_date: datetime.date, end_date: datetime.date,
+                  shift_id: Optional[int] = None) -> Select:
+    """One row per stop of every route that is past admin confirmation"""
+    query = (
+        select(
+            ShiftRoute.route_date,
+            Shift.shift_code,
+            Shift.log_type,
+            Shift.shift_time,
+            ShiftRoute.route_number,
+            ShiftRoute.status.label("route_status"),
+            Vendor.vendor_name,
+            ShiftRoute.vehicle_id,
+            ShiftRoute.driver_id,
+            ShiftRouteStop.position.label("stop_position"),
+            ShiftRouteStop.booking_id,
+            ShiftRouteStop.employee_name,
+            ShiftRouteStop.pickup_address,
+            ShiftRouteStop.landmark,
+            ShiftRouteStop.pickup_lat,
+            ShiftRouteStop.pickup_lng,
+        )
+        .join(Shift, Shift.id == ShiftRoute.shift_id)
+        .join(
+            ShiftRouteStop,
+            (ShiftRouteStop.shift_route_id == ShiftRoute.id) & (ShiftRouteStop.route_date == ShiftRoute.route_date),
+        )
+        .outerjoin(Vendor, Vendor.vendor_id == ShiftRoute.vendor_id)
+        .where(
+            Shift.tenant_id == tenant_id,
+            ShiftRoute.route_date.between(start_date, end_date),
+            ShiftRouteStop.route_date.between(start_date, end_date),
+            ShiftRoute.status != RouteStatus.CANCELLED,
+        )
+        .order_by(ShiftRoute.route_date, Shift.shift_code, ShiftRoute.route_number, ShiftRouteStop.position)
+    )
+    if shift_id is not None:
+        query = query.where(ShiftRoute.shift_id == shift_id)
+    return query
+
+
+def employees_export(tenant_id: int, department_id: Optional[int] = None,
+                     is_active: Optional[bool] = None) -> Select:
+    query = (
+        select(
+            Employee.employee_id,
+            Employee.employee_code,
+            Employee.name,
+            Employee.email,
+            Employee.mobile_number,
+            Employee.alternate_mobile_number,
+            Employee.gender,
+            Department.department_name,
+            Employee.office,
+            Employee.address,
+            Employee.landmark,
+            Employee.latitude,
+            Employee.longitude,
+            Employee.special_need,
+            Employee.special_need_start_date,
+            Employee.special_need_end_date,
+            Employee.is_active,
+        )
+        .join(Department, Department.department_id == Employee.department_id)
+        .where(Employee.tenant_id == tenant_id)
+        .order_by(Employee.employee_id)
+    )
+    if department_id is not None:
+        query = query.where(Employee.department_id == department_id)
+    if is_active is not None:
+        query = query.where(Employee.is_active.is_(is_active))
+    return query
+
+
+def drivers_export(tenant_id: int, vendor_id: Optional[int] = None, is_active: Optional[bool] = None) -> Select:
+    query = (
+        select(
+            Driver.driver_id,
+            Driver.driver_code,
+            Driver.name,
+            Driver.email,
+            Driver.mobile_number,
+            Driver.alternate_mobile_number,
+            Vendor.vendor_name,
+            Driver.city,
+            Driver.gender,
+            Driver.date_of_birth,
+            Driver.bgv_status,
+            Driver.police_verification_status,
+            Driver.medical_verification_status,
+            Driver.training_verification_status,
+            Driver.eye_test_verification_status,
+            Driver.license_number,
+            Driver.license_expiry_date,
+            Driver.badge_number,
+            Driver.badge_expiry_date,
+            Driver.is_active,
+        )
+        .join(Vendor, Vendor.vendor_id == Driver.vendor_id)
+        .where(Vendor.tenant_id == tenant_id)
+        .order_by(Driver.driver_id)
+    )
+    if vendor_id is not None:
+        query = query.where(Driver.vendor_id == vendor_id)
+    if is_active is not None:
+        query = query.where(Driver.is_active.is_(is_active))
+    return query
@@ -0,0 +1,412 @@
+# app/crud/roster_import.py
+"""
+Admin roster import: bookings in bulk from a CSV/XLSX roster.
+
+Each row books one employee on one shift for a date range:
+
+    employee_code, shift_code, start_date[, end_date][, weekdays]
+
+`end_date` defaults to `start_date`. `weekdays` narrows the range to a
+pattern such as "mon,wed,fri", "mon-fri", "weekdays" or "weekends"; without
+it every shift day in the range is booked.
+
+Shifts, the tenant and the booking cutoff are read once per upload from the
+tenant config cache (app.crud.tenant_config). Rows are processed in chunks
+of ROSTER_IMPORT_CHUNK_SIZE with a fixed number of queries per chunk,
+whatever the number of dates:
+
+  1. one query loads the chunk's employees by code,
+  2. dates are expanded and checked against the shift's weekdays, the weekday
+     pattern, past dates and the cutoff in memory,
+  3. one query finds live bookings overlapping the chunk,
+  4. the remaining bookings are written with one batched
+     INSERT ... ON CONFLICT DO NOTHING (see app.crud.bookings) and committed.
+
+Every row gets an outcome in the job report (created / partial / skipped /
+rejected) with the number of bookings made and why dates were skipped.
+"""
+import csv
+import datetime
+import io
+import logging
+import os
+import re
+from collections import Counter
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.crud.bookings import booking_locations, booking_rows, bulk_insert_bookings
+from app.crud.tenant_config import ShiftConfig, get_tenant_config
+from app.database.database import SessionLocal
+from app.database.models import Booking, BookingStatus, Employee
+from app.utils import spreadsheet
+from app.utils.job_store import JOB_COMPLETED, JOB_FAILED, JOB_RUNNING, get_job_store
+from app.utils.spreadsheet import cell_date, cell_text
+from app.utils.weekday_mask import WEEKDAYS
+
+logger = logging.getLogger(__name__)
+
+ROSTER_IMPORT_CHUNK_SIZE = int(os.getenv("ROSTER_IMPORT_CHUNK_SIZE", "500"))
+# Longest date range a single row may cover
+ROSTER_MAX_DAYS = int(os.getenv("ROSTER_MAX_DAYS", "92"))
+ROSTER_IMPORT_JOB = "roster_import"
+
+ALLOWED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+REQUIRED_COLUMNS = ["employee_code", "shift_code", "start_date"]
+
+WEEKDAY_GROUPS = {
+    "all": set(range(7)),
+    "daily": set(range(7)),
+    "weekdays": set(range(5)),
+    "weekends": {5, 6},
+}
+
+OUTCOME_CREATED = "created"
+OUTCOME_PARTIAL = "partial"
+OUTCOME_SKIPPED = "skipped"
+OUTCOME_REJECTED = "rejected"
+
+SKIP_NOT_SHIFT_DAY = "not a shift day"
+SKIP_PAST = "date in the past"
+SKIP_CUTOFF = "cutoff time exceeded"
+SKIP_BOOKED = "already booked"
+SKIP_REPEATED = "repeated in upload"
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def _weekday(token: str) -> int:
+    # Two letters are enough to tell days apart ("tu", "th", "sa", "su")
+    if len(token) >= 2:
+        for index, name in enumerate(WEEKDAYS):
+            if name.startswith(token):
+                return index
+    raise ValueError(f"Unknown weekday {token}")
+
+
+def parse_weekdays(value) -> Optional[Set[int]]:
+    """Weekday pattern as a set of date.weekday() numbers; None when blank"""
+    pattern = cell_text(value)
+    if not pattern:
+        return None
+    days = set()
+    for token in re.split(r"[\s,;/|]+", pattern.lower()):
+        if not token:
+            continue
+        if token in WEEKDAY_GROUPS:
+            days |= WEEKDAY_GROUPS[token]
+        elif "-" in token:
+            first, last = (_weekday(part) for part in token.split("-", 1))
+            span = (last - first) % 7
+            days |= {(first + offset) % 7 for offset in range(span + 1)}
+        else:
+            days.add(_weekday(token))
+    return days
+
+
+def parse_roster_row(row: dict, shifts: Dict[str, ShiftConfig]):
+    """Returns (employee_code, shift, start, end, weekdays, issues)"""
+    issues = []
+    employee_code = cell_text(row.get("employee_code"))
+    shift_code = cell_text(row.get("shift_code"))
+    if not employee_code:
+        issues.append("Missing employee_code")
+    if not shift_code:
+        issues.append("Missing shift_code")
+
+    shift = shifts.get(shift_code) if shift_code else None
+    if shift_code and shift is None:
+        issues.append(f"Shift {shift_code} not found")
+
+    start = end = None
+    try:
+        start = cell_date(row.get("start_date"))
+        end = cell_date(row.get("end_date")) or start
+    except (ValueError, TypeError):
+        issues.append("Invalid start_date or end_date, use YYYY-MM-DD")
+    else:
+        if start is None:
+            issues.append("Missing start_date")
+        elif end < start:
+            issues.append("end_date before start_date")
+        elif (end - start).days + 1 > ROSTER_MAX_DAYS:
+            issues.append(f"Date range longer than {ROSTER_MAX_DAYS} days")
+
+    weekdays = None
+    try:
+        weekdays = parse_weekdays(row.get("weekdays"))
+    except ValueError as e:
+        issues.append(str(e))
+
+    return employee_code, shift, start, end, weekdays, issues
+
+
+# ---------------------------------------------------------------------------
+# Chunk processing
+# ---------------------------------------------------------------------------
+
+class RosterContext:
+    """Per-upload lookups, loaded once"""
+
+    def __init__(self, db: Session, tenant_id: int):
+        self.tenant_id = tenant_id
+        self.tenant = get_tenant_config(tenant_id)
+        if not self.tenant:
+            logger.error(f"Tenant not found: {tenant_id}")
+            raise HTTPException(status_code=404, detail="Tenant not found.")
+
+        if self.tenant.booking_cutoff is None:
+            raise HTTPException(status_code=404, detail="Booking cutoff not configured for tenant")
+        self.cutoff = datetime.time(self.tenant.booking_cutoff)
+        if not (self.tenant.address and self.tenant.latitude and self.tenant.longitude):
+            raise HTTPException(status_code=400, detail="Tenant office location not configured")
+
+        self.shifts = self.tenant.active_shifts_by_code()
+
+        now = datetime.datetime.now()
+        self.today = now.date()
+        self.cutoff_passed = now.time() >= self.cutoff
+
+    def skip_reason(self, shift_id: int, booking_date: datetime.date) -> Optional[str]:
+        if not self.tenant.shift(shift_id).runs_on(booking_date):
+            return SKIP_NOT_SHIFT_DAY
+        if booking_date < self.today:
+            return SKIP_PAST
+        if booking_date == self.today and self.cutoff_passed:
+            return SKIP_CUTOFF
+        return None
+
+
+def _outcome(row_number: int, employee_code, shift_code, issues=None) -> dict:
+    return {
+        "row": row_number,
+        "employee_code": employee_code,
+        "shift_code": shift_code,
+        "outcome": OUTCOME_REJECTED if issues else None,
+        "created": 0,
+        "skipped": {},
+        "issues": issues or [],
+    }
+
+
+def _load_employees(db: Session, tenant_id: int, codes: Set[str]) -> dict:
+    rows = db.execute(
+        select(
+            Employee.employee_id, Employee.employee_code, Employee.department_id, Employee.is_active,
+            Employee.address, Employee.latitude, Employee.longitude,
+        ).where(Employee.tenant_id == tenant_id, Employee.employee_code.in_(codes))
+    ).all()
+    return {row.employee_code: row for row in rows}
+
+
+def _live_bookings(db: Session, employee_ids: Set[int], shift_ids: Set[int],
+                   first: datetime.date, last: datetime.date) -> Set[Tuple[int, int, datetime.date]]:
+    rows = db.execute(
+        select(Booking.employee_id, Booking.shift_id, Booking.booking_date).where(
+            Booking.employee_id.in_(employee_ids),
+            Booking.shift_id.in_(shift_ids),
+            Booking.booking_date.between(first, last),
+            Booking.status != BookingStatus.CANCELLED,
+        )
+    ).all()
+    return {tuple(row) for row in rows}
+
+
+def _process_chunk(db: Session, context: RosterContext, chunk: List[Tuple[int, dict]]) -> List[dict]:
+    outcomes, parsed = [], []
+    for row_number, row in chunk:
+        employee_code, shift, start, end, weekdays, issues = parse_roster_row(row, context.shifts)
+        outcome = _outcome(row_number, employee_code, cell_text(row.get("shift_code")), issues)
+        outcomes.append(outcome)
+        if not issues:
+            parsed.append((outcome, employee_code, shift, start, end, weekdays))
+
+    if not parsed:
+        return outcomes
+
+    employees = _load_employees(db, context.tenant_id, {employee_code for _, employee_code, *_ in parsed})
+
+    # Expand every row into candidate (employee, shift, date) keys
+    candidates = []
+    for outcome, employee_code, shift, start, end, weekdays in parsed:
+        employee = employees.get(employee_code)
+        if employee is None:
+            outcome.update(outcome=OUTCOME_REJECTED, issues=[f"Employee {employee_code} not found"])
+            continue
+        if not employee.is_active:
+            outcome.update(outcome=OUTCOME_REJECTED, issues=[f"Employee {employee_code} is inactive"])
+            continue
+        if not (employee.address and employee.latitude and employee.longitude):
+            outcome.update(outcome=OUTCOME_REJECTED, issues=[f"Employee {employee_code} has no address on file"])
+            continue
+
+        skipped, dates = Counter(), []
+        for offset in range((end - start).days + 1):
+            booking_date = start + datetime.timedelta(days=offset)
+            if weekdays is None and not shift.runs_on(booking_date):
+                # Without a pattern the range means "every shift day in it"
+                continue
+            if weekdays is not None and booking_date.weekday() not in weekdays:
+                continue
+            reason = context.skip_reason(shift.id, booking_date)
+            if reason:
+                skipped[reason] += 1
+            else:
+                dates.append(booking_date)
+        outcome["skipped"] = skipped
+        candidates.append((outcome, employee, shift, dates))
+
+    all_dates = [d for *_, dates in candidates for d in dates]
+    existing = set()
+    if all_dates:
+        existing = _live_bookings(
+            db,
+            {employee.employee_id for _, employee, _, _ in candidates},
+            {shift.id for _, _, shift, _ in candidates},
+            min(all_dates),
+            max(all_dates),
+        )
+
+    rows, owners, seen = [], {}, set()
+    for outcome, employee, shift, dates in candidates:
+        accepted = []
+        for booking_date in dates:
+            key = (employee.employee_id, shift.id, booking_date)
+            if key in existing:
+                outcome["skipped"][SKIP_BOOKED] += 1
+            elif key in seen:
+                outcome["skipped"][SKIP_REPEATED] += 1
+            else:
+                seen.add(key)
+                owners[key] = outcome
+                accepted.append(booking_date)
+        if accepted:
+            locations = booking_locations(shift.log_type, employee, context.tenant)
+            rows.extend(booking_rows(employee, context.tenant_id, shift.id, locations, accepted))
+
+    if rows:
+        inserted = bulk_insert_bookings(db, rows)
+        db.commit()
+        for _, employee_id, shift_id, booking_date in inserted:
+            owners.pop((employee_id, shift_id, booking_date))["created"] += 1
+        # Whatever the insert skipped was booked concurrently
+        for outcome in owners.values():
+            outcome["skipped"][SKIP_BOOKED] += 1
+
+    for outcome, *_ in candidates:
+        skipped = sum(outcome["skipped"].values())
+        if not outcome["created"]:
+            outcome["outcome"] = OUTCOME_SKIPPED
+        else:
+            outcome["outcome"] = OUTCOME_PARTIAL if skipped else OUTCOME_CREATED
+        outcome["skipped"] = dict(outcome["skipped"])
+    return outcomes
+
+
+def import_roster(db: Session, tenant_id: int, path: str, on_chunk=None) -> dict:
+    """
+    Create bookings from the roster at `path`.
+
+    on_chunk(processed_rows, outcomes) is called after every committed chunk.
+    Returns the totals.
+    """
+    context = RosterContext(db, tenant_id)
+    _, rows = spreadsheet.read_rows(path, REQUIRED_COLUMNS)
+    totals = Counter()
+
+    try:
+        while True:
+            chunk = list(islice(rows, ROSTER_IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            outcomes = _process_chunk(db, context, chunk)
+            totals["processed_rows"] += len(chunk)
+            totals["bookings_created"] += sum(o["created"] for o in outcomes)
+            totals["created_rows"] += sum(1 for o in outcomes if o["created"])
+            totals["rejected_rows"] += sum(1 for o in outcomes if o["outcome"] == OUTCOME_REJECTED)
+            logger.info(
+                f"Roster import tenant_id={tenant_id}: {totals['processed_rows']} rows processed, "
+                f"{totals['bookings_created']} bookings created"
+            )
+            if on_chunk is not None:
+                on_chunk(totals["processed_rows"], outcomes)
+    finally:
+        rows.close()
+
+    logger.info(f"Roster import completed for tenant_id={tenant_id}: {dict(totals)}")
+    return dict(totals)
+
+
+# ---------------------------------------------------------------------------
+# Background job
+# ---------------------------------------------------------------------------
+
+def start_roster_import_job(file: UploadFile, tenant_id: int) -> Tuple[dict, str]:
+    """Persist the upload and register a queued job; returns (job, path)"""
+    path = spreadsheet.save_upload(file, ALLOWED_EXTENSIONS, prefix="roster_import_")
+    try:
+        total = spreadsheet.inspect(path, REQUIRED_COLUMNS)
+    except Exception:
+        os.remove(path)
+        raise
+    store = get_job_store()
+    job = store.create(ROSTER_IMPORT_JOB, tenant_id, file.filename)
+    job = store.update(job["job_id"], total_rows=total, bookings_created=0) or job
+    return job, path
+
+
+def run_roster_import_job(job_id: str, tenant_id: int, path: str):
+    """Background task body: runs the import in its own session"""
+    store = get_job_store()
+    store.update(job_id, status=JOB_RUNNING)
+    counters = Counter()
+
+    def on_chunk(processed, outcomes):
+        counters["bookings_created"] += sum(o["created"] for o in outcomes)
+        counters["created_rows"] += sum(1 for o in outcomes if o["created"])
+        counters["rejected_rows"] += sum(1 for o in outcomes if o["outcome"] == OUTCOME_REJECTED)
+        store.append_report(job_id, outcomes)
+        store.update(job_id, processed_rows=processed, **counters)
+
+    db = SessionLocal()
+    try:
+        import_roster(db, tenant_id, path, on_chunk=on_chunk)
+        store.update(job_id, status=JOB_COMPLETED)
+    except HTTPException as e:
+        store.update(job_id, status=JOB_FAILED, error=str(e.detail))
+    except Exception as e:
+        logger.exception(f"Roster import job {job_id} failed")
+        db.rollback()
+        store.update(job_id, status=JOB_FAILED, error=str(e))
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def roster_report_csv(outcomes: List[dict]) -> str:
+    """Row outcomes as CSV: row, employee_code, shift_code, outcome, bookings_created, dates_skipped, details"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["row", "employee_code", "shift_code", "outcome", "bookings_created", "dates_skipped", "details"])
+    for outcome in sorted(outcomes, key=lambda o: o.get("row") or 0):
+        skipped = outcome.get("skipped") or {}
+        details = list(outcome.get("issues") or []) + [f"{reason}: {count}" for reason, count in skipped.items()]
+        writer.writerow([
+            outcome.get("row"),
+            outcome.get("employee_code") or "",
+            outcome.get("shift_code") or "",
+            outcome.get("outcome"),
+            outcome.get("created", 0),
+            sum(skipped.values()),
+            "; ".join(details),
+        ])
+    return output.getvalue()
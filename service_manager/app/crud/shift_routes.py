@@ -0,0 +1,211 @@
+# app/crud/shift_routes.py
+"""
+Set-based writes for confirmed shift routes.
+
+Route numbers are unique per (shift_id, route_date) (`uq_shift_route`).
+Writers serialise on a transaction-scoped advisory lock for that pair before
+reading the highest number in use, so concurrent confirms for the same shift
+and date queue up instead of colliding; confirms for other shifts or dates
+are not blocked. The lock is released on commit or rollback.
+
+Batch edits (update / assign-vendor) load every referenced route, stop and
+booking with one query each, work out the changes in memory and apply them
+with one `UPDATE ... FROM (VALUES ...)` for the routes, a bulk stop
+replacement and one status UPDATE per booking state.
+
+Anything slow (Google Directions calls) happens before the lock is taken, so
+the lock only ever covers the short set-based writes. Confirms number their
+routes once they hold the lock; edits compare a `route_fingerprint` taken
+before with one taken under the lock and give up if the routes moved.
+
+Routes, stops and bookings are partitioned by month on their date
+(app/database/partitions.py); every statement here filters on it so only the
+partition holding that day is touched.
+"""
+import datetime
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import cast, column, delete, func, insert, select, text, update, values
+from sqlalchemy.orm import Session, joinedload
+
+from app.database.models import Booking, BookingStatus, RouteStatus, ShiftRoute, ShiftRouteStop
+
+# Advisory lock key space: (shift_id, route_date as ordinal day)
+ROUTE_LOCK_SQL = text("SELECT pg_advisory_xact_lock(:shift_id, :day)")
+
+
+def duplicates(values: Iterable) -> List:
+    """Values that occur more than once, sorted"""
+    return sorted(value for value, count in Counter(values).items() if count > 1)
+
+
+def lock_shift_routes(db: Session, shift_id: int, route_date: datetime.date):
+    """Serialise route writers for one shift and date until the transaction ends"""
+    db.execute(ROUTE_LOCK_SQL, {"shift_id": shift_id, "day": route_date.toordinal()})
+
+
+def first_free_route_number(db: Session, shift_id: int, route_date: datetime.date) -> int:
+    """First free route number; only stable while holding lock_shift_routes"""
+    return db.scalar(
+        select(func.coalesce(func.max(ShiftRoute.route_number), 0))
+        .where(ShiftRoute.shift_id == shift_id, ShiftRoute.route_date == route_date)
+    ) + 1
+
+
+def confirmed_booking_ids(db: Session, shift_id: int, route_date: datetime.date,
+                          booking_ids: Sequence[int], exclude_route_ids: Sequence[int] = ()) -> List[int]:
+    """Bookings among `booking_ids` already on a confirmed route of the shift/date"""
+    query = (
+        select(ShiftRouteStop.booking_id)
+        .join(ShiftRoute, (ShiftRouteStop.shift_route_id == ShiftRoute.id)
+              & (ShiftRouteStop.route_date == ShiftRoute.route_date))
+        .where(
+            ShiftRoute.shift_id == shift_id,
+            ShiftRoute.route_date == route_date,
+            ShiftRouteStop.route_date == route_date,
+            ShiftRoute.status == RouteStatus.CONFIRMED,
+            ShiftRouteStop.booking_id.in_(booking_ids),
+        )
+    )
+    if exclude_route_ids:
+        query = query.where(ShiftRoute.id.not_in(exclude_route_ids))
+    return list(db.scalars(query).all())
+
+
+def insert_routes(db: Session, rows: List[dict]) -> List[Tuple[int, int]]:
+    """One batched INSERT ... RETURNING; (id, route_number) in the order of `rows`"""
+    if not rows:
+        return []
+    result = db.execute(
+        insert(ShiftRoute).returning(ShiftRoute.id, ShiftRoute.route_number, sort_by_parameter_order=True),
+        rows,
+    )
+    return [tuple(row) for row in result]
+
+
+def stop_rows(route_id: int, route_date: datetime.date, pickups) -> List[dict]:
+    """ShiftRouteStop values for a route's pickups (PickupDetail), in order"""
+    return [
+        {
+            "shift_route_id": route_id,
+            "route_date": route_date,
+            "position": position,
+            "booking_id": int(pickup.booking_id),
+            "employee_name": pickup.employee_name,
+            "pickup_lat": pickup.latitude,
+            "pickup_lng": pickup.longitude,
+            "pickup_address": pickup.address,
+            "landmark": pickup.landmark,
+        }
+        for position, pickup in enumerate(pickups, start=1)
+    ]
+
+
+def insert_stops(db: Session, rows: List[dict]):
+    if rows:
+        db.execute(insert(ShiftRouteStop), rows)
+
+
+def confirm_bookings(db: Session, booking_date: datetime.date, booking_ids: Sequence[int],
+                     now: datetime.datetime):
+    """Mark bookings CONFIRMED with a single UPDATE"""
+    set_bookings_status(db, booking_date, booking_ids, BookingStatus.CONFIRMED, now)
+
+
+def set_bookings_status(db: Session, booking_date: datetime.date, booking_ids: Sequence[int],
+                        status: BookingStatus, now: datetime.datetime):
+    if booking_ids:
+        db.execute(
+            update(Booking)
+            .where(Booking.booking_date == booking_date, Booking.booking_id.in_(booking_ids))
+            .values(status=status, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+
+# ---------------------------------------------------------------------------
+# Batch edits
+# ---------------------------------------------------------------------------
+
+def load_routes(db: Session, shift_id: int, route_date: datetime.date,
+                route_numbers: Iterable[int]) -> Dict[int, ShiftRoute]:
+    """Routes of the shift/date by route number (one query)"""
+    routes = db.scalars(
+        select(ShiftRoute).where(
+            ShiftRoute.shift_id == shift_id,
+            ShiftRoute.route_date == route_date,
+            ShiftRoute.route_number.in_(set(route_numbers)),
+        )
+    ).all()
+    return {route.route_number: route for route in routes}
+
+
+def load_stops(db: Session, route_date: datetime.date,
+               route_ids: Iterable[int]) -> Dict[int, List[ShiftRouteStop]]:
+    """Stops by route id in position order (one query)"""
+    stops = defaultdict(list)
+    for stop in db.scalars(
+        select(ShiftRouteStop)
+        .where(ShiftRouteStop.route_date == route_date, ShiftRouteStop.shift_route_id.in_(set(route_ids)))
+        .order_by(ShiftRouteStop.shift_route_id, ShiftRouteStop.position)
+    ):
+        stops[stop.shift_route_id].append(stop)
+    return stops
+
+
+def load_bookings(db: Session, shift_id: int, route_date: datetime.date,
+                  booking_ids: Iterable[int]) -> Dict[int, Booking]:
+    """Bookings of the shift/date with their employee (one query)"""
+    bookings = db.scalars(
+        select(Booking)
+        .options(joinedload(Booking.employee))
+        .where(
+            Booking.booking_id.in_(set(booking_ids)),
+            Booking.shift_id == shift_id,
+            Booking.booking_date == route_date,
+        )
+    ).unique().all()
+    return {booking.booking_id: booking for booking in bookings}
+
+
+def route_fingerprint(routes: Dict[int, ShiftRoute], stops: Dict[int, List[ShiftRouteStop]]) -> Dict[int, tuple]:
+    """What an edit was computed from: route number -> (id, updated_at, booking ids in stop order)"""
+    return {
+        number: (route.id, route.updated_at, tuple(stop.booking_id for stop in stops.get(route.id, [])))
+        for number, route in routes.items()
+    }
+
+
+def bulk_update_routes(db: Session, route_date: datetime.date, rows: List[dict], **common):
+    """
+    One UPDATE shift_routes ... FROM (VALUES ...) for per-route values.
+
+    Every row holds "id" plus the same set of column values; `common` values
+    are applied to all of them.
+    """
+    if not rows:
+        return
+    names = list(rows[0])
+    table = ShiftRoute.__table__
+    data = values(
+        *[column(name, table.c[name].type) for name in names],
+        name="route_values",
+    ).data([tuple(row[name] for name in names) for row in rows])
+    db.execute(
+        update(ShiftRoute)
+        .where(ShiftRoute.route_date == route_date, ShiftRoute.id == data.c.id)
+        # Cast back: a VALUES column holding only NULLs is typed text
+        .values({**{name: cast(data.c[name], table.c[name].type) for name in names if name != "id"}, **common})
+        .execution_options(synchronize_session=False)
+    )
+
+
+def replace_stops(db: Session, route_date: datetime.date, route_ids: Sequence[int], rows: List[dict]):
+    """Drop the stops of `route_ids` and insert `rows` in their place"""
+    if route_ids:
+        db.execute(
+            delete(ShiftRouteStop)
+            .where(ShiftRouteStop.route_date == route_date, ShiftRouteStop.shift_route_id.in_(route_ids))
+        )
+    insert_stops(db, rows)
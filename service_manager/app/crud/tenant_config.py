@@ -0,0 +1,270 @@
+# app/crud/tenant_config.py
+"""
+Read-through cache of slow-changing tenant configuration: office location,
+booking cutoffs and shifts.
+
+Booking and route endpoints read these on every request; the cache hands
+out an immutable `TenantConfig` snapshot with the office coordinates parsed
+to floats.
+
+Every worker keeps its own snapshots, tagged with the tenant's config
+version from Redis (`tenant_config_version:<tenant_id>`). Writers call
+`invalidate_tenant_config` after committing a change to a tenant, its
+cutoff or its shifts; that bumps the version, and other workers reload on
+their next version check (at most every TENANT_CONFIG_VERSION_CHECK_SECONDS).
+Snapshots also expire after TENANT_CONFIG_TTL_SECONDS, which bounds
+staleness when Redis is unavailable.
+
+Misses load through the primary in a session of their own, whatever session
+the caller holds: a lagging replica would otherwise cache the old config
+under the new version. The async path runs the Redis version check in the
+threadpool.
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database.database import AsyncSessionLocal, SessionLocal
+from app.database.models import Cutoff, GenderType, LogType, PickupType, Shift, Tenant
+from app.utils.weekday_mask import day_bit
+from common_utils.auth.token_validation import RedisTokenManager, USE_REDIS
+
+logger = logging.getLogger(__name__)
+
+TENANT_CONFIG_TTL_SECONDS = int(os.getenv("TENANT_CONFIG_TTL_SECONDS", "300"))
+TENANT_CONFIG_VERSION_CHECK_SECONDS = float(os.getenv("TENANT_CONFIG_VERSION_CHECK_SECONDS", "2"))
+TENANT_CONFIG_VERSION_PREFIX = "tenant_config_version:"
+
+def _coordinate(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class ShiftConfig:
+    id: int
+    tenant_id: int
+    shift_code: str
+    log_type: LogType
+    shift_time: datetime.time
+    day: str
+    weekday_mask: int
+    waiting_time_minutes: int
+    pickup_type: PickupType
+    gender: GenderType
+    is_active: bool
+
+    def runs_on(self, day: datetime.date) -> bool:
+        return bool(self.weekday_mask & day_bit(day.weekday()))
+
+
+@dataclass(frozen=True)
+class TenantConfig:
+    tenant_id: int
+    tenant_name: str
+    # As stored (booking rows copy them) and parsed; None when unparsable
+    address: Optional[str]
+    latitude: Optional[str]
+    longitude: Optional[str]
+    office_lat: Optional[float]
+    office_lng: Optional[float]
+    booking_cutoff: Optional[int]
+    cancellation_cutoff: Optional[int]
+    shifts: Mapping[int, ShiftConfig]
+
+    @property
+    def has_office_location(self) -> bool:
+        return bool(self.address) and self.office_lat is not None and self.office_lng is not None
+
+    def shift(self, shift_id: int) -> Optional[ShiftConfig]:
+        return self.shifts.get(shift_id)
+
+    def active_shifts_by_code(self) -> Dict[str, ShiftConfig]:
+        by_code = {}
+        for shift in sorted(self.shifts.values(), key=lambda shift: shift.id):
+            if shift.is_active:
+                by_code.setdefault(shift.shift_code, shift)
+        return by_code
+
+
+def _tenant_query(tenant_id: int):
+    return (
+        select(Tenant, Cutoff.booking_cutoff, Cutoff.cancellation_cutoff)
+        .outerjoin(Cutoff, Cutoff.tenant_id == Tenant.tenant_id)
+        .where(Tenant.tenant_id == tenant_id)
+    )
+
+
+def _shifts_query(tenant_id: int):
+    return select(Shift).where(Shift.tenant_id == tenant_id).order_by(Shift.id)
+
+
+def _build(row, shifts) -> TenantConfig:
+    tenant, booking_cutoff, cancellation_cutoff = row
+    return TenantConfig(
+        tenant_id=tenant.tenant_id,
+        tenant_name=tenant.tenant_name,
+        address=tenant.address,
+        latitude=tenant.latitude,
+        longitude=tenant.longitude,
+        office_lat=_coordinate(tenant.latitude),
+        office_lng=_coordinate(tenant.longitude),
+        booking_cutoff=booking_cutoff,
+        cancellation_cutoff=cancellation_cutoff,
+        shifts={
+            shift.id: ShiftConfig(
+                id=shift.id,
+                tenant_id=shift.tenant_id,
+                shift_code=shift.shift_code,
+                log_type=shift.log_type,
+                shift_time=shift.shift_time,
+                day=shift.day,
+                weekday_mask=shift.weekday_mask,
+                waiting_time_minutes=shift.waiting_time_minutes,
+                pickup_type=shift.pickup_type,
+                gender=shift.gender,
+                is_active=bool(shift.is_active),
+            )
+            for shift in shifts
+        },
+    )
+
+
+def load_tenant_config(db: Session, tenant_id: int) -> Optional[TenantConfig]:
+    row = db.execute(_tenant_query(tenant_id)).first()
+    if row is None:
+        return None
+    return _build(row, db.scalars(_shifts_query(tenant_id)).all())
+
+
+async def aload_tenant_config(db: AsyncSession, tenant_id: int) -> Optional[TenantConfig]:
+    row = (await db.execute(_tenant_query(tenant_id))).first()
+    if row is None:
+        return None
+    return _build(row, (await db.scalars(_shifts_query(tenant_id))).all())
+
+
+class TenantConfigCache:
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(TenantConfigCache, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        # tenant_id -> (config, version, version checked at)
+        self.entries = TTLCache(maxsize=10_000, ttl=TENANT_CONFIG_TTL_SECONDS)
+        self.lock = threading.Lock()
+        self.__initialized = True
+
+    def _client(self):
+        if not USE_REDIS:
+            return None
+        manager = RedisTokenManager()
+        return manager.client if manager.is_available() else None
+
+    def _version(self, tenant_id: int) -> Optional[int]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return int(client.get(f"{TENANT_CONFIG_VERSION_PREFIX}{tenant_id}") or 0)
+        except Exception as e:
+            logger.error(f"Error reading tenant config version for tenant {tenant_id}: {str(e)}")
+            return None
+
+    def _entry(self, tenant_id: int):
+        with self.lock:
+            return self.entries.get(tenant_id)
+
+    def _confirm(self, tenant_id: int, entry) -> Optional[TenantConfig]:
+        """Checks a cached entry against the Redis version; the config if unchanged"""
+        config, version, _ = entry
+        if self._version(tenant_id) != version:
+            return None
+        with self.lock:
+            if tenant_id in self.entries:
+                self.entries[tenant_id] = (config, version, time.monotonic())
+        return config
+
+    def cached(self, tenant_id: int) -> Optional[TenantConfig]:
+        """The cached snapshot if it is still current, else None"""
+        entry = self._entry(tenant_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] < TENANT_CONFIG_VERSION_CHECK_SECONDS:
+            return entry[0]
+        return self._confirm(tenant_id, entry)
+
+    async def acached(self, tenant_id: int) -> Optional[TenantConfig]:
+        entry = self._entry(tenant_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] < TENANT_CONFIG_VERSION_CHECK_SECONDS:
+            return entry[0]
+        return await run_in_threadpool(self._confirm, tenant_id, entry)
+
+    def store(self, tenant_id: int, version: Optional[int], config: Optional[TenantConfig]):
+        if config is None:
+            return
+        with self.lock:
+            self.entries[tenant_id] = (config, version, time.monotonic())
+
+    def get(self, tenant_id: int) -> Optional[TenantConfig]:
+        config = self.cached(tenant_id)
+        if config is None:
+            # Version first: a change committed while loading triggers a reload
+            version = self._version(tenant_id)
+            with SessionLocal() as db:
+                config = load_tenant_config(db, tenant_id)
+            self.store(tenant_id, version, config)
+        return config
+
+    async def aget(self, tenant_id: int) -> Optional[TenantConfig]:
+        config = await self.acached(tenant_id)
+        if config is None:
+            version = await run_in_threadpool(self._version, tenant_id)
+            async with AsyncSessionLocal() as db:
+                config = await aload_tenant_config(db, tenant_id)
+            self.store(tenant_id, version, config)
+        return config
+
+    def invalidate(self, tenant_id: int):
+        with self.lock:
+            self.entries.pop(tenant_id, None)
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.incr(f"{TENANT_CONFIG_VERSION_PREFIX}{tenant_id}")
+        except Exception as e:
+            logger.error(f"Error bumping tenant config version for tenant {tenant_id}: {str(e)}")
+
+
+def get_tenant_config(tenant_id: int) -> Optional[TenantConfig]:
+    return TenantConfigCache().get(tenant_id)
+
+
+async def aget_tenant_config(tenant_id: int) -> Optional[TenantConfig]:
+    return await TenantConfigCache().aget(tenant_id)
+
+
+def invalidate_tenant_config(tenant_id: int):
+    """Call after committing a change to a tenant, its cutoff or its shifts"""
+    TenantConfigCache().invalidate(tenant_id)
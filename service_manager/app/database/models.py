@@ -1,5 +1,6 @@
 from sqlalchemy import (
-    Boolean, Column, Float, Index, String, Integer, ForeignKey, DateTime, JSON, Text, UniqueConstraint, Table, Date, text
+    BigInteger, Boolean, Column, Float, Index, SmallInteger, String, Integer, ForeignKey, ForeignKeyConstraint, DateTime, JSON, Text,
+    UniqueConstraint, Table, Date, text
 )
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
@@ -124,6 +125,10 @@ class Employee(Base, TimestampMixin):
     device = relationship("Device", back_populates="employee", uselist=False, cascade="all, delete-orphan")
     bookings = relationship("Booking", back_populates="employee")
 
+    __table_args__ = (
+        Index("ix_employees_tenant_department_active", "tenant_id", "department_id", "is_active"),
+    )
+
 
 
 
@@ -252,10 +257,16 @@ class Shift(Base):
     log_type = Column(Enum(LogType), nullable=False)
     shift_time = Column(Time, nullable=False)
     day = Column(String, nullable=False)
+    # Same schedule as `day`, bit n = date.weekday() n (see app.utils.weekday_mask)
+    weekday_mask = Column(SmallInteger, nullable=False, server_default=text("0"))
     waiting_time_minutes = Column(Integer, nullable=False)
     pickup_type = Column(Enum(PickupType), nullable=False)
     gender = Column(Enum(GenderType), nullable=False)
     is_active = Column(Boolean, default=True)
+
+    __table_args__ = (
+        Index("ix_shifts_tenant_log_type_weekday_mask", "tenant_id", "log_type", "weekday_mask"),
+    )
     
     # Relationship to Tenant
     tenant = relationship("Tenant", back_populates="shifts")
@@ -313,7 +324,7 @@ class Vehicle(Base):
 
     vehicle_id = Column(Integer, primary_key=True, index=True)
 
-    vendor_id = Column(Integer, ForeignKey("vendors.vendor_id", ondelete="CASCADE"), nullable=False)
+    vendor_id = Column(Integer, ForeignKey("vendors.vendor_id", ondelete="CASCADE"), nullable=False, index=True)
     vehicle_type_id = Column(Integer, ForeignKey("vehicle_types.vehicle_type_id", ondelete="SET NULL"), nullable=True)
     driver_id = Column(Integer, ForeignKey("drivers.driver_id", ondelete="SET NULL"), nullable=True)
 
@@ -358,7 +369,7 @@ class Driver(Base):
     email = Column(String(100), nullable=False, unique=True)
     mobile_number = Column(String(20), nullable=False, unique=True)
     hashed_password = Column(String(255), nullable=False)  # Stores hashed password
-    vendor_id = Column(Integer, ForeignKey("vendors.vendor_id", ondelete="CASCADE"), nullable=False)
+    vendor_id = Column(Integer, ForeignKey("vendors.vendor_id", ondelete="CASCADE"), nullable=False, index=True)
 
     city = Column(String(100), nullable=True)
     date_of_birth = Column(Date, nullable=True)
@@ -460,13 +471,15 @@ class StopStatus(str, enum.Enum):
 class Booking(Base, TimestampMixin):
     __tablename__ = "bookings"
 
-    booking_id = Column(Integer, primary_key=True, index=True)
+    # Partitioned by month on booking_date (app/database/partitions.py), which
+    # therefore belongs to the primary key
+    booking_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.employee_id"), nullable=False)
     employee_code = Column(String(50), nullable=False)
     tenant_id = Column(Integer, ForeignKey("tenants.tenant_id"), nullable=False)
     shift_id = Column(Integer, ForeignKey("shifts.id"), nullable=False)
     department_id = Column(Integer, ForeignKey("departments.department_id"), nullable=False)
-    booking_date = Column(Date, nullable=False)
+    booking_date = Column(Date, primary_key=True, nullable=False)
     pickup_location = Column(String(255), nullable=False)
     pickup_location_latitude = Column(String(50), nullable=False)
     pickup_location_longitude = Column(String(50), nullable=False)
@@ -481,14 +494,31 @@ class Booking(Base, TimestampMixin):
     tenant = relationship("Tenant", back_populates="bookings")
     shift = relationship("Shift", back_populates="bookings")
     department = relationship("Department", back_populates="bookings")
-    shift_route_stops = relationship("ShiftRouteStop", back_populates="booking", cascade="all, delete-orphan")
+    shift_route_stops = relationship("ShiftRouteStop", back_populates="booking", cascade="all, delete-orphan",
+                                     overlaps="route,stops")
+
+    __table_args__ = (
+        # One live booking per employee, shift and day; cancelled ones may repeat.
+        # Booking inserts use ON CONFLICT against this index.
+        Index(
+            "uq_bookings_employee_shift_date_active",
+            "employee_id", "shift_id", "booking_date",
+            unique=True,
+            postgresql_where=text("status <> 'CANCELLED'"),
+        ),
+        Index("ix_bookings_shift_date", "shift_id", "booking_date"),
+        Index("ix_bookings_tenant_date", "tenant_id", "booking_date"),
+        Index("ix_bookings_employee_date", "employee_id", "booking_date"),
+        {"postgresql_partition_by": "RANGE (booking_date)"},
+    )
 
 class ShiftRoute(Base):
     __tablename__ = "shift_routes"
 
-    id = Column(Integer, primary_key=True)
+    # Partitioned by month on route_date, like bookings
+    id = Column(Integer, primary_key=True, autoincrement=True)
     shift_id = Column(Integer, ForeignKey("shifts.id", ondelete="CASCADE"), nullable=False)
-    route_date = Column(Date, nullable=False)
+    route_date = Column(Date, primary_key=True, nullable=False)
     route_number = Column(Integer, nullable=False)
     route_data = Column(JSONB, nullable=False)
 
@@ -505,10 +535,12 @@ class ShiftRoute(Base):
     __table_args__ = (
         UniqueConstraint("shift_id", "route_date", "route_number", name="uq_shift_route"),
         Index("ix_shift_routes_date_shift", "route_date", "shift_id"),
+        {"postgresql_partition_by": "RANGE (route_date)"},
     )
 
     shift = relationship("Shift", back_populates="shift_routes")
-    stops = relationship("ShiftRouteStop", back_populates="route", cascade="all, delete-orphan")
+    stops = relationship("ShiftRouteStop", back_populates="route", cascade="all, delete-orphan",
+                         overlaps="booking,shift_route_stops")
     vendor = relationship("Vendor")
     vehicle = relationship("Vehicle")
     driver = relationship("Driver")
@@ -517,16 +549,51 @@ class ShiftRoute(Base):
 class ShiftRouteStop(Base):
     __tablename__ = "shift_route_stops"
 
-    id = Column(Integer, primary_key=True)
-    shift_route_id = Column(Integer, ForeignKey("shift_routes.id", ondelete="CASCADE"), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    shift_route_id = Column(Integer, nullable=False)
+    # The route's date, which is also the booking's: the partition key
+    route_date = Column(Date, primary_key=True, nullable=False)
     position = Column(Integer, nullable=False)
-    booking_id = Column(Integer, ForeignKey("bookings.booking_id"), nullable=False)
+    booking_id = Column(Integer, nullable=False)
     employee_name = Column(String)
     pickup_lat = Column(Float, nullable=False)
     pickup_lng = Column(Float, nullable=False)
     pickup_address = Column(Text)
     landmark = Column(Text)
 
-    route = relationship("ShiftRoute", back_populates="stops")
-    booking = relationship("Booking", back_populates="shift_route_stops")
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["shift_route_id", "route_date"], ["shift_routes.id", "shift_routes.route_date"],
+            name="fk_shift_route_stops_route", ondelete="CASCADE",
+        ),
+        ForeignKeyConstraint(
+            ["booking_id", "route_date"], ["bookings.booking_id", "bookings.booking_date"],
+            name="fk_shift_route_stops_booking",
+        ),
+        Index("ix_shift_route_stops_booking", "booking_id"),
+        Index("ix_shift_route_stops_route_position", "shift_route_id", "position"),
+        {"postgresql_partition_by": "RANGE (route_date)"},
+    )
+
+    route = relationship("ShiftRoute", back_populates="stops", overlaps="booking,shift_route_stops")
+    booking = relationship("Booking", back_populates="shift_route_stops", overlaps="route,stops")
+
 
+# Pending Realtime Database writes, written in the transaction that changes the
+# source rows and sent by app.firebase.outbox
+class FirebaseOutbox(Base):
+    __tablename__ = "firebase_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    path = Column(String(512), nullable=False)
+    payload = Column(JSONB(none_as_null=True), nullable=True)  # NULL deletes the path
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    # NULL once parked after FIREBASE_OUTBOX_MAX_ATTEMPTS failures
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_firebase_outbox_available", "available_at", "id", postgresql_where=text("available_at IS NOT NULL")),
+        Index("ix_firebase_outbox_path", "path", "id"),
+    )
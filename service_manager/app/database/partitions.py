@@ -0,0 +1,235 @@
+# app/database/partitions.py
+"""
+Monthly range partitions for bookings, shift_routes and shift_route_stops.
+
+The three tables are partitioned by booking_date / route_date (stops carry
+their route's date), one partition per calendar month named
+`<table>_yYYYYmMM`, plus a `<table>_default` partition catching dates beyond
+the ones created so far. A booking, its route and its stops always share a
+date and therefore a month, which keeps the foreign keys between them inside
+one partition and lets a month be archived as a unit.
+
+Maintenance, safe to run from several workers (it serialises on an advisory
+lock):
+
+  * `ensure_partitions` creates the partitions from the current month up to
+    PARTITION_MONTHS_AHEAD months ahead. Rows that already landed in the
+    default partition for such a month are moved into the new partition.
+    It runs at every worker startup: from init_db in APP_STARTUP_MODE=full,
+    directly from the lifespan in fast mode, and from `python -m app.cli
+    migrate`.
+  * `archive_partitions` detaches partitions that ended more than
+    PARTITION_RETENTION_MONTHS months ago and moves them to the
+    PARTITION_ARCHIVE_SCHEMA schema as plain tables. Run it daily, e.g.
+    `python -m app.database.partitions archive` from cron.
+"""
+import argparse
+import datetime
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "12"))
+PARTITION_ARCHIVE_SCHEMA = os.getenv("PARTITION_ARCHIVE_SCHEMA", "archive")
+
+# (table, partition key) with referenced tables first
+PARTITIONED_TABLES = (
+    ("bookings", "booking_date"),
+    ("shift_routes", "route_date"),
+    ("shift_route_stops", "route_date"),
+)
+
+MAINTENANCE_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('partition_maintenance'))")
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    years, index = divmod(month.month - 1 + months, 12)
+    return datetime.date(month.year + years, index + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace
+        )
+    """), {"table": table}).scalar())
+
+
+def month_partitions(conn: Connection, table: str) -> Dict[str, datetime.date]:
+    """Attached monthly partitions of `table` by name, with the month they hold"""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+    """), {"table": table}).scalars()
+    pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$")
+    partitions = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions[name] = datetime.date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def create_default_partition(conn: Connection, table: str):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT"))
+
+
+def partition_bounds(month: datetime.date) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def create_month_partition(conn: Connection, table: str, month: datetime.date):
+    """Create the partition for `month`; the default partition must hold no rows for it"""
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} {partition_bounds(month)}"
+    ))
+
+
+def relation_exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name)"), {"name": f"public.{name}"}).scalar() is not None
+
+
+def add_month(conn: Connection, month: datetime.date) -> List[str]:
+    """
+    Create the partitions of every partitioned table for `month`; returns the
+    names created.
+
+    Postgres refuses a new partition while the default partition holds rows
+    for its range, and a foreign key check only looks at the partition a
+    referenced row lived in, so stranded rows cannot be moved one table at a
+    time. They go to standalone tables first (referencing tables first), which
+    are then attached (referenced tables first).
+    """
+    lower, upper = month, add_months(month, 1)
+    missing = [
+        (table, key) for table, key in PARTITIONED_TABLES
+        if not relation_exists(conn, partition_name(table, month))
+    ]
+    stranded = set()
+    for table, key in reversed(missing):
+        name, default = partition_name(table, month), default_partition_name(table)
+        if not relation_exists(conn, default) or not conn.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {key} >= :lower AND {key} < :upper)"),
+            {"lower": lower, "upper": upper},
+        ).scalar():
+            continue
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        moved = conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {key} >= :lower AND {key} < :upper RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), {"lower": lower, "upper": upper}).rowcount
+        stranded.add(table)
+        logger.info(f"Moved {moved} rows from {default} to {name}")
+
+    for table, _ in missing:
+        name = partition_name(table, month)
+        if table in stranded:
+            conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {partition_bounds(month)}"))
+        else:
+            create_month_partition(conn, table, month)
+        logger.info(f"Created partition {name}")
+    return [partition_name(table, month) for table, _ in missing]
+
+
+def ensure_partitions(conn: Connection, today: Optional[datetime.date] = None,
+                      months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Create missing partitions from this month to `months_ahead` months ahead"""
+    conn.execute(MAINTENANCE_LOCK_SQL)
+    unpartitioned = [table for table, _ in PARTITIONED_TABLES if not is_partitioned(conn, table)]
+    if unpartitioned:
+        logger.warning(f"{', '.join(unpartitioned)} not partitioned; run the migrations")
+        return []
+
+    first = month_start(today or datetime.date.today())
+    created = []
+    for offset in range(months_ahead + 1):
+        created.extend(add_month(conn, add_months(first, offset)))
+    for table, _ in PARTITIONED_TABLES:
+        create_default_partition(conn, table)
+    return created
+
+
+def archive_partitions(conn: Connection, today: Optional[datetime.date] = None,
+                       retention_months: int = PARTITION_RETENTION_MONTHS,
+                       dry_run: bool = False) -> List[str]:
+    """
+    Detach partitions whose month ended more than `retention_months` ago and
+    move them to the archive schema; returns the archived table names.
+    """
+    conn.execute(MAINTENANCE_LOCK_SQL)
+    cutoff = add_months(month_start(today or datetime.date.today()), -retention_months)
+    if not dry_run:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {PARTITION_ARCHIVE_SCHEMA}"))
+
+    archived = []
+    # Referencing tables first, so nothing points into a partition once it goes
+    for table, _ in reversed(PARTITIONED_TABLES):
+        if not is_partitioned(conn, table):
+            continue
+        for name, month in sorted(month_partitions(conn, table).items(), key=lambda item: item[1]):
+            if add_months(month, 1) > cutoff:
+                continue
+            archived.append(f"{PARTITION_ARCHIVE_SCHEMA}.{name}")
+            if dry_run:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            # A detached partition keeps its foreign keys; archive tables stand alone
+            for constraint in conn.execute(text("""
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'
+            """), {"name": name}).scalars().all():
+                conn.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"'))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {PARTITION_ARCHIVE_SCHEMA}"))
+            logger.info(f"Archived partition {name} to {PARTITION_ARCHIVE_SCHEMA}")
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition maintenance for bookings and routes")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    ensure = subcommands.add_parser("ensure", help="create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    archive = subcommands.add_parser("archive", help="detach expired partitions into the archive schema")
+    archive.add_argument("--retention-months", type=int, default=PARTITION_RETENTION_MONTHS)
+    archive.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from app.database.database import engine
+
+    with engine.begin() as conn:
+        if args.command == "ensure":
+            names = ensure_partitions(conn, months_ahead=args.months_ahead)
+            print(f"Created {len(names)} partitions: {', '.join(names) or '-'}")
+        else:
+            names = archive_partitions(conn, retention_months=args.retention_months, dry_run=args.dry_run)
+            verb = "Would archive" if args.dry_run else "Archived"
+            print(f"{verb} {len(names)} partitions: {', '.join(names) or '-'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,254 @@
+# app/database/session_router.py
+"""
+Routing of read-only requests to the read replica.
+
+List and dashboard endpoints depend on `get_read_db` / `get_async_read_db`
+instead of `get_db` / `get_async_db`. Those hand out a session bound to the
+replica (READ_REPLICA_URL) unless one of these sends the request to the
+primary instead:
+
+  * no replica is configured,
+  * the replica lags more than REPLICA_MAX_LAG_SECONDS behind (checked at
+    most every REPLICA_LAG_CHECK_SECONDS, and on any error checking it),
+  * read-your-writes: the caller committed a write within the last
+    READ_YOUR_WRITES_SECONDS, or sent `X-Read-Your-Writes: 1`.
+
+Callers are identified by their bearer token. `ReadYourWritesMiddleware`
+puts it in a context variable and the session events below pin the caller
+to the primary whenever a session commits a write. Pins are kept in-process
+first; the shared Redis copy is read and written off the event loop.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database.database import (
+    READ_REPLICA_URL,
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    async_read_engine,
+    read_engine,
+)
+from common_utils.auth.token_validation import RedisTokenManager, USE_REDIS
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_HEADER = b"x-read-your-writes"
+PIN_PREFIX = "rw_pin:"
+
+# A caught-up replica reports no lag even when the primary has been idle
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+    END
+""")
+
+# Caller of the current request (bearer token digest) and whether it asked
+# for primary reads explicitly
+current_caller: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_caller", default=None)
+force_primary: contextvars.ContextVar[bool] = contextvars.ContextVar("force_primary", default=False)
+
+
+class ReplicaRouter:
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(ReplicaRouter, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.enabled = bool(READ_REPLICA_URL)
+        self.lag_seconds = None
+        self.lag_checked_at = 0.0
+        self.lag_lock = threading.Lock()
+        self.local_pins = TTLCache(maxsize=100_000, ttl=READ_YOUR_WRITES_SECONDS)
+        self.__initialized = True
+
+    # ----------------------------------------------------------- lag guard
+
+    def _lag_is_fresh(self) -> bool:
+        return time.monotonic() - self.lag_checked_at < REPLICA_LAG_CHECK_SECONDS
+
+    def _record_lag(self, lag: Optional[float]):
+        if lag is not None and lag > REPLICA_MAX_LAG_SECONDS:
+            logger.warning(f"Read replica lagging {lag:.1f}s; routing reads to the primary")
+        self.lag_seconds = lag
+        self.lag_checked_at = time.monotonic()
+
+    def _lag_ok(self) -> bool:
+        return self.lag_seconds is not None and self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+
+    def replica_healthy(self) -> bool:
+        if not self._lag_is_fresh():
+            with self.lag_lock:
+                if not self._lag_is_fresh():
+                    try:
+                        with read_engine.connect() as connection:
+                            self._record_lag(float(connection.execute(REPLICA_LAG_SQL).scalar()))
+                    except Exception as e:
+                        logger.error(f"Read replica lag check failed: {str(e)}")
+                        self._record_lag(None)
+        return self._lag_ok()
+
+    async def areplica_healthy(self) -> bool:
+        if not self._lag_is_fresh():
+            try:
+                async with async_read_engine.connect() as connection:
+                    self._record_lag(float((await connection.execute(REPLICA_LAG_SQL)).scalar()))
+            except Exception as e:
+                logger.error(f"Read replica lag check failed: {str(e)}")
+                self._record_lag(None)
+        return self._lag_ok()
+
+    # ------------------------------------------------------ read-your-writes
+
+    def pin(self, caller: str):
+        """Send the caller's reads to the primary for READ_YOUR_WRITES_SECONDS"""
+        self.local_pins[caller] = True
+        if not USE_REDIS:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._store_pin(caller)
+            return
+        # Async session commit: this worker is covered by the local pin, the
+        # shared one lands a Redis round trip later without blocking the loop
+        loop.run_in_executor(None, self._store_pin, caller)
+
+    def _store_pin(self, caller: str):
+        try:
+            manager = RedisTokenManager()
+            if manager.is_available():
+                manager.client.set(f"{PIN_PREFIX}{caller}", 1, ex=READ_YOUR_WRITES_SECONDS)
+        except Exception as e:
+            logger.error(f"Error storing read-your-writes pin: {str(e)}")
+
+    def _shared_pin(self, caller: str) -> bool:
+        try:
+            manager = RedisTokenManager()
+            return manager.is_available() and bool(manager.client.exists(f"{PIN_PREFIX}{caller}"))
+        except Exception as e:
+            logger.error(f"Error reading read-your-writes pin: {str(e)}")
+            return False
+
+    def is_pinned(self, caller: Optional[str]) -> bool:
+        if caller is None:
+            return False
+        if caller in self.local_pins:
+            return True
+        return USE_REDIS and self._shared_pin(caller)
+
+    async def ais_pinned(self, caller: Optional[str]) -> bool:
+        if caller is None:
+            return False
+        if caller in self.local_pins:
+            return True
+        return USE_REDIS and await run_in_threadpool(self._shared_pin, caller)
+
+    def use_replica(self) -> bool:
+        if not self.enabled or force_primary.get() or self.is_pinned(current_caller.get()):
+            return False
+        return self.replica_healthy()
+
+    async def ause_replica(self) -> bool:
+        if not self.enabled or force_primary.get() or await self.ais_pinned(current_caller.get()):
+            return False
+        return await self.areplica_healthy()
+
+
+def get_read_db():
+    session_factory = ReadSessionLocal if ReplicaRouter().use_replica() else SessionLocal
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    session_factory = AsyncReadSessionLocal if await ReplicaRouter().ause_replica() else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
+
+# ---------------------------------------------------------------------------
+# Write tracking: any session that flushes or executes DML and then commits
+# pins the current caller to the primary. Sync and async sessions share the
+# Session class, so these cover both.
+# ---------------------------------------------------------------------------
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer(session):
+    if session.info.pop("has_writes", False):
+        caller = current_caller.get()
+        if caller is not None and READ_REPLICA_URL:
+            ReplicaRouter().pin(caller)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("has_writes", None)
+
+
+def _caller_key(headers) -> Optional[str]:
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return hashlib.sha256(token.strip().encode("utf-8")).hexdigest()[:24]
+
+
+class ReadYourWritesMiddleware:
+    """Exposes the caller identity to the session events of the request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        caller_token = current_caller.set(_caller_key(headers))
+        force_token = force_primary.set(
+            headers.get(READ_YOUR_WRITES_HEADER, b"").strip().lower() in (b"1", b"true", b"primary")
+        )
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_caller.reset(caller_token)
+            force_primary.reset(force_token)
@@ -1,15 +1,44 @@
-from firebase_admin import db
-from app.firebase.config import init_firebase
-
-init_firebase()
-
-def push_employee_to_firebase(tenant_id: int, department_id: int, employee_code: str, employee_id: int, name: str):
-    ref_path = f"employees/{tenant_id}/{department_id}/{employee_code}"
-    ref = db.reference(ref_path)
-    print(f"Pushing employee data to Firebase at {ref_path}")
-    print(f"Employee ID: {employee_id}, Employee Code: {employee_code}, Name: {name}")
-    ref.set({
-        "employee_id": employee_id,
-        "employee_code": employee_code,
-        "name": name
+# app/firebase/employee_push.py
+"""
+Employees are mirrored in Firebase at employees/{tenant}/{department}/{code}
+for the apps. The writes go through the outbox (app.firebase.outbox): call
+these before committing the transaction that changes the employees.
+"""
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.firebase.outbox import enqueue
+
+
+def employee_path(tenant_id: int, department_id: int, employee_code: str) -> str:
+    return f"employees/{tenant_id}/{department_id}/{employee_code}"
+
+
+def queue_employee_push(db: Session, tenant_id: int, department_id: int, employee_code: str,
+                        employee_id: int, name: str, previous_path: Optional[str] = None):
+    """
+    Queues the Firebase record of one employee. `previous_path` is removed
+    when the employee moved (changed code or department).
+    """
+    path = employee_path(tenant_id, department_id, employee_code)
+    writes = {path: {"employee_id": employee_id, "employee_code": employee_code, "name": name}}
+    if previous_path and previous_path != path:
+        writes[previous_path] = None
+    enqueue(db, writes)
+
+
+def queue_employees_push(db: Session, tenant_id: int, employees: list):
+    """
+    Queues the Firebase records of many employees of a tenant.
+
+    `employees` items carry department_id, employee_code, employee_id and name.
+    """
+    enqueue(db, {
+        employee_path(tenant_id, emp["department_id"], emp["employee_code"]): {
+            "employee_id": emp["employee_id"],
+            "employee_code": emp["employee_code"],
+            "name": emp["name"],
+        }
+        for emp in employees
     })
@@ -0,0 +1,369 @@
+# app/firebase/outbox.py
+"""
+Transactional outbox for Firebase Realtime Database writes.
+
+Code that changes data mirrored in Firebase does not call Firebase itself; it
+adds the writes to the firebase_outbox table in the same transaction:
+
+    enqueue(db, {"employees/1/3/EMP001": {...}, "employees/1/2/EMP001": None})
+    db.commit()
+
+so a write is sent if and only if the change was committed, and a request
+never waits on the network. A payload of None deletes the path. Writes whose
+path or payload keys Firebase would reject (empty, or containing . # $ [ ]
+/ or control characters) are stored parked right away instead of holding up
+the writes queued around them.
+
+The dispatcher sends pending rows in id order, FIREBASE_OUTBOX_BATCH_SIZE at
+a time, as one multi-path `update()` per batch. Writes to the same path
+within a batch are coalesced (the latest wins), and once a path is written
+every older row for it is dropped, including rows waiting for a retry.
+When a batch fails, its halves are sent separately, and a failing half is
+split again, so paths Firebase rejects are isolated from the rest; if both
+halves fail, Firebase is taken to be failing and the whole batch is retried.
+Failed writes are retried with exponential backoff and jitter; rows that
+failed FIREBASE_OUTBOX_MAX_ATTEMPTS times are parked (available_at NULL)
+until requeued with `python -m app.firebase.outbox requeue`.
+
+No transaction stays open while Firebase is called: a batch is read and
+committed, sent, and then deleted or rescheduled in a second transaction. A
+crash in between sends the batch again, which is harmless for these writes.
+
+Only one dispatcher sends at a time (a session-level Postgres advisory lock
+held across both transactions): with several workers each running one, a
+batch sent late could overwrite a newer value.
+The lifespan runs it as a background task (FIREBASE_OUTBOX_ENABLED); the CLI
+can drain the table as well, e.g. with the `LocalSink` stub:
+
+    python -m app.firebase.outbox drain --stub
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+from collections import defaultdict
+from typing import Dict, Optional
+
+from sqlalchemy import insert, null, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database.database import engine as default_engine
+from app.database.models import FirebaseOutbox
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_OUTBOX_ENABLED = os.getenv("FIREBASE_OUTBOX_ENABLED", "true").lower() in ("1", "true", "yes")
+FIREBASE_OUTBOX_BATCH_SIZE = int(os.getenv("FIREBASE_OUTBOX_BATCH_SIZE", "500"))
+FIREBASE_OUTBOX_POLL_SECONDS = float(os.getenv("FIREBASE_OUTBOX_POLL_SECONDS", "2"))
+FIREBASE_OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("FIREBASE_OUTBOX_RETRY_BASE_SECONDS", "2"))
+FIREBASE_OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("FIREBASE_OUTBOX_RETRY_MAX_SECONDS", "300"))
+FIREBASE_OUTBOX_MAX_ATTEMPTS = int(os.getenv("FIREBASE_OUTBOX_MAX_ATTEMPTS", "20"))
+
+# Keys Firebase rejects: https://firebase.google.com/docs/database/web/structure-data
+FORBIDDEN_KEY_CHARACTERS = frozenset(".#$[]/")
+MAX_KEY_BYTES = 768
+
+DISPATCH_LOCK_SQL = text("SELECT pg_try_advisory_lock(hashtext('firebase_outbox'))")
+DISPATCH_UNLOCK_SQL = text("SELECT pg_advisory_unlock(hashtext('firebase_outbox'))")
+
+PENDING_SQL = (
+    select(FirebaseOutbox.id, FirebaseOutbox.path, FirebaseOutbox.payload, FirebaseOutbox.attempts)
+    .where(FirebaseOutbox.available_at <= text("now()"))
+    .order_by(FirebaseOutbox.id)
+)
+
+# Every row of a written path up to the id that was written
+DELETE_SENT_SQL = text("""
+    DELETE FROM firebase_outbox o
+    USING unnest(CAST(:paths AS text[]), CAST(:ids AS bigint[])) AS sent(path, id)
+    WHERE o.path = sent.path AND o.id <= sent.id
+""")
+
+RETRY_SQL = text("""
+    UPDATE firebase_outbox
+    SET attempts = attempts + 1,
+        last_error = :error,
+        available_at = CASE WHEN attempts + 1 >= :max_attempts THEN NULL
+                            ELSE now() + make_interval(secs => :delay) END
+    WHERE id = ANY(:ids)
+""")
+
+
+def _key_error(key) -> Optional[str]:
+    if not isinstance(key, str) or not key:
+        return f"invalid key {key!r}"
+    if len(key.encode()) > MAX_KEY_BYTES:
+        return f"key longer than {MAX_KEY_BYTES} bytes: {key[:40]!r}..."
+    if FORBIDDEN_KEY_CHARACTERS & set(key) or any(ord(char) < 32 or ord(char) == 127 for char in key):
+        return f"key {key!r} contains a character Firebase does not allow"
+    return None
+
+
+def write_error(path: str, payload) -> Optional[str]:
+    """Why Firebase would reject writing `payload` at `path`, or None"""
+    if len(path) > FirebaseOutbox.path.type.length:
+        return f"path longer than {FirebaseOutbox.path.type.length} characters"
+    for key in path.strip("/").split("/"):
+        error = _key_error(key)
+        if error:
+            return error
+    pending = [payload]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            for key, child in value.items():
+                error = _key_error(key)
+                if error:
+                    return error
+                pending.append(child)
+        elif isinstance(value, list):
+            pending.extend(value)
+    return None
+
+
+def enqueue(db: Session, writes: Dict[str, Optional[dict]]):
+    """
+    Adds Firebase writes ({path: payload or None}) to the session's
+    transaction. Writes Firebase would reject are added parked, with the
+    reason in last_error.
+    """
+    rows, rejected = [], []
+    for path, payload in writes.items():
+        error = write_error(path, payload)
+        if error is None:
+            rows.append({"path": path, "payload": payload})
+        else:
+            logger.error(f"Firebase outbox: parking write to {path[:512]!r}: {error}")
+            rejected.append({"path": path[:512], "payload": payload, "last_error": error})
+    if rows:
+        db.execute(insert(FirebaseOutbox), rows)
+    if rejected:
+        db.execute(insert(FirebaseOutbox).values(available_at=null()), rejected)
+
+
+# ---------------------------------------------------------------------------
+# Sinks
+# ---------------------------------------------------------------------------
+
+class RealtimeDatabaseSink:
+    """The Firebase Realtime Database; initialised on first use"""
+
+    def __init__(self):
+        self.ready = False
+
+    def update(self, updates: Dict[str, Optional[dict]]):
+        from firebase_admin import db
+        from app.firebase.config import init_firebase
+
+        if not self.ready:
+            init_firebase()
+            self.ready = True
+        db.reference("/").update(updates)
+
+
+class LocalSink:
+    """
+    In-memory stand-in for tests and local runs: applies multi-path updates to
+    `data` and records them in `calls`. The next `fail` updates raise, and
+    like Firebase it rejects a whole update containing an invalid key.
+    """
+
+    def __init__(self, fail: int = 0):
+        self.data: dict = {}
+        self.calls = []
+        self.fail = fail
+
+    def update(self, updates: Dict[str, Optional[dict]]):
+        if self.fail > 0:
+            self.fail -= 1
+            raise ConnectionError("LocalSink: simulated failure")
+        for path, value in updates.items():
+            error = write_error(path, value)
+            if error:
+                raise ValueError(f"LocalSink: {error}")
+        self.calls.append(dict(updates))
+        for path, value in updates.items():
+            *parents, leaf = path.strip("/").split("/")
+            node = self.data
+            for part in parents:
+                node = node.setdefault(part, {})
+            if value is None:
+                node.pop(leaf, None)
+            else:
+                node[leaf] = value
+
+    def get(self, path: str):
+        node = self.data
+        for part in path.strip("/").split("/"):
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+
+# ---------------------------------------------------------------------------
+# Dispatcher
+# ---------------------------------------------------------------------------
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next try of a batch that has failed `attempts` times"""
+    delay = min(FIREBASE_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), FIREBASE_OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxDispatcher:
+    def __init__(self, sink=None, engine=None, batch_size: int = FIREBASE_OUTBOX_BATCH_SIZE):
+        self.sink = sink if sink is not None else RealtimeDatabaseSink()
+        self.engine = engine if engine is not None else default_engine
+        self.batch_size = batch_size
+
+    def dispatch_once(self) -> int:
+        """Sends one batch; returns the number of outbox rows it covered"""
+        with self.engine.connect() as conn:
+            locked = conn.execute(DISPATCH_LOCK_SQL).scalar()
+            conn.commit()
+            if not locked:
+                return 0  # another worker is dispatching
+            try:
+                return self._dispatch(conn)
+            finally:
+                try:
+                    conn.rollback()
+                    conn.execute(DISPATCH_UNLOCK_SQL)
+                    conn.commit()
+                except Exception as e:
+                    # Closing the connection releases the lock instead
+                    logger.error(f"Error releasing the Firebase outbox lock: {e}")
+                    conn.invalidate()
+
+    def _dispatch(self, conn) -> int:
+        rows = conn.execute(PENDING_SQL.limit(self.batch_size)).all()
+        conn.commit()
+        if not rows:
+            return 0
+
+        updates, rows_by_path = {}, defaultdict(list)
+        for row in rows:
+            updates[row.path] = row.payload
+            rows_by_path[row.path].append(row)
+        failed = self._send(updates)
+
+        sent = [path for path in updates if path not in failed]
+        if sent:
+            conn.execute(DELETE_SENT_SQL, {"paths": sent, "ids": [rows_by_path[path][-1].id for path in sent]})
+        if failed:
+            retries = []
+            for path, error in failed.items():
+                attempts = max(row.attempts for row in rows_by_path[path]) + 1
+                retries.append({
+                    "ids": [row.id for row in rows_by_path[path]],
+                    "error": str(error)[:1000],
+                    "max_attempts": FIREBASE_OUTBOX_MAX_ATTEMPTS,
+                    "delay": retry_delay(attempts),
+                })
+            conn.execute(RETRY_SQL, retries)
+        conn.commit()
+
+        if failed:
+            attempts = max(row.attempts for path in failed for row in rows_by_path[path]) + 1
+            log = logger.error if attempts >= FIREBASE_OUTBOX_MAX_ATTEMPTS else logger.warning
+            log(f"Firebase outbox: {len(failed)} of {len(updates)} paths failed (attempt {attempts}): "
+                f"{next(iter(failed.values()))}")
+        logger.info(f"Firebase outbox sent {len(sent)} paths from {len(rows)} rows")
+        return len(rows)
+
+    def _send(self, updates: Dict[str, Optional[dict]], error: Exception = None) -> Dict[str, Exception]:
+        """
+        Sends `updates` (already failed with `error`, when given); returns
+        the paths that could not be sent with their errors
+        """
+        if error is None:
+            try:
+                self.sink.update(updates)
+                return {}
+            except Exception as e:
+                error = e
+        if len(updates) == 1:
+            return {path: error for path in updates}
+
+        paths = list(updates)
+        middle = len(paths) // 2
+        halves = [{path: updates[path] for path in paths[:middle]}, {path: updates[path] for path in paths[middle:]}]
+        errors = []
+        for half in halves:
+            try:
+                self.sink.update(half)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        if all(errors):
+            # Not confined to some paths: Firebase itself is most likely failing
+            return {path: error for path in updates}
+
+        failed = {}
+        for half, half_error in zip(halves, errors):
+            if half_error is not None:
+                failed.update(self._send(half, half_error))
+        return failed
+
+    def drain(self) -> int:
+        """Sends batches until nothing is due; returns the number of rows sent"""
+        sent = 0
+        while True:
+            count = self.dispatch_once()
+            sent += count
+            if count < self.batch_size:
+                return sent
+
+    async def run(self, stop: asyncio.Event, poll_seconds: float = FIREBASE_OUTBOX_POLL_SECONDS):
+        """Dispatch loop for the application lifespan"""
+        logger.info("Firebase outbox dispatcher started")
+        while not stop.is_set():
+            try:
+                count = await run_in_threadpool(self.dispatch_once)
+            except Exception as e:
+                logger.exception(f"Firebase outbox dispatch failed: {e}")
+                count = 0
+            if count < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Firebase outbox dispatcher stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firebase outbox maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    drain = subcommands.add_parser("drain", help="send every due write")
+    drain.add_argument("--stub", action="store_true", help="send to an in-memory LocalSink")
+    subcommands.add_parser("status", help="count pending, retrying and parked writes")
+    subcommands.add_parser("requeue", help="retry parked writes")
+    args = parser.parse_args()
+    engine = default_engine
+
+    if args.command == "drain":
+        sink = LocalSink() if args.stub else None
+        print(f"Sent {OutboxDispatcher(sink).drain()} rows")
+    elif args.command == "status":
+        with engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT count(*) FILTER (WHERE available_at <= now()) AS due,
+                       count(*) FILTER (WHERE available_at > now()) AS retrying,
+                       count(*) FILTER (WHERE available_at IS NULL) AS parked
+                FROM firebase_outbox
+            """)).one()
+        print(f"due={row.due} retrying={row.retrying} parked={row.parked}")
+    else:
+        with engine.begin() as conn:
+            count = conn.execute(text(
+                "UPDATE firebase_outbox SET attempts = 0, available_at = now() WHERE available_at IS NULL"
+            )).rowcount
+        print(f"Requeued {count} rows")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,8 +1,14 @@
+import time
+_import_started = time.perf_counter()
 import json
+import os
 from dotenv import load_dotenv
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 load_dotenv()  # It will load .env file values into os.environ
+from app.utils.logging_setup import configure_logging
+# Before the route modules are imported, so their basicConfig() calls are no-ops
+configure_logging()
 # Add this import at the top of main.py
 from starlette.status import HTTP_415_UNSUPPORTED_MEDIA_TYPE
 
@@ -26,21 +32,67 @@ from app.api.routes.vehicle import router as vehicle_router
 from app.api.routes.app.employee.auth import router as app_auth_router
 from app.api.routes.app.employee.booking import router as employee_booking_router
 from app.api.routes.booking import router as booking_router
+from app.api.routes.exports import router as exports_router
+from app.api.routes.images import router as images_router
+import asyncio
 from contextlib import asynccontextmanager
-from app.database.database import init_db, seed_iam, seed_data
+from app.database.database import async_engine, async_read_engine, engine, init_db, seed_iam, seed_data
+from app.database.partitions import ensure_partitions
+from app.database.session_router import ReadYourWritesMiddleware
+from app.firebase.outbox import FIREBASE_OUTBOX_ENABLED, OutboxDispatcher
+from app.utils.password_hasher import get_password_hasher
+from app.utils.serialization import FastJSONResponse
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
  
+# "full" creates the tables and seed data on every boot (development);
+# "fast" leaves them to `alembic upgrade head` and `python -m app.cli` and
+# only makes sure the upcoming monthly partitions exist
+APP_STARTUP_MODE = os.getenv("APP_STARTUP_MODE", "full").lower()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create models
-    init_db()
-    
-    # seed_iam()
-    seed_data()
+    timings = {"import": IMPORT_SECONDS}
+    if APP_STARTUP_MODE != "fast":
+        started = time.perf_counter()
+        # Create models
+        init_db()
+        timings["init_db"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # seed_iam()
+        seed_data()
+        timings["seed_data"] = time.perf_counter() - started
+    else:
+        started = time.perf_counter()
+        # Advisory-locked and a few catalog lookups once the months exist
+        try:
+            with engine.begin() as conn:
+                ensure_partitions(conn)
+        except Exception as e:
+            logger.error(f"Error creating upcoming partitions: {e}")
+        timings["ensure_partitions"] = time.perf_counter() - started
+    # Sends the Firebase writes queued in firebase_outbox
+    outbox_stop = asyncio.Event()
+    outbox_task = asyncio.create_task(OutboxDispatcher().run(outbox_stop)) if FIREBASE_OUTBOX_ENABLED else None
+    app.state.startup_timings = timings
+    logger.info(
+        f"Startup ({APP_STARTUP_MODE}) took {sum(timings.values()) * 1000:.0f} ms: "
+        + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+    )
     yield
+    if outbox_task:
+        outbox_stop.set()
+        await outbox_task
+    get_password_hasher().shutdown()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 
-app = FastAPI(title="Service Manager", lifespan=lifespan)
+# As a Default, routes with a response_model keep Pydantic's direct JSON dump
+app = FastAPI(title="Service Manager", lifespan=lifespan, default_response_class=Default(FastJSONResponse))
 # app = FastAPI(title="Service Manager")
 app.add_middleware(
     CORSMiddleware,
@@ -59,25 +111,13 @@ app.add_middleware(
     # allow_headers=["Authorization", "Content-Type"],
     allow_headers=["*"],
 )
-from starlette.middleware.base import BaseHTTPMiddleware
+app.add_middleware(ReadYourWritesMiddleware)
 from starlette.requests import Request
+from app.utils.access_log import AccessLogMiddleware
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
-    handlers=[logging.StreamHandler()]
-)
-
 logger = logging.getLogger(__name__)
 
-class RequestLoggerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        logger.info(f"[REQUEST] {request.method} {request.url}")
-        logger.info(f"[HEADERS] Content-Type: {request.headers.get('content-type')}")
-        response = await call_next(request)
-        return response
-    
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     # Safely decode request body
@@ -125,9 +165,13 @@ if os.path.exists(UPLOAD_DIR) and os.path.isdir(UPLOAD_DIR):
 else:
     logger.warning(f"Upload directory {UPLOAD_DIR} does not exist or is not a directory. Static files will not be served.")
 
-app.add_middleware(RequestLoggerMiddleware)
+app.add_middleware(AccessLogMiddleware)
+# AccessLogMiddleware writes the access log; uvicorn's would duplicate it
+logging.getLogger("uvicorn.access").disabled = True
 app.include_router(app_auth_router, prefix="/api")
 app.include_router(booking_router, prefix="/api")
+app.include_router(exports_router, prefix="/api")
+app.include_router(images_router, prefix="/api")
 app.include_router(employee_booking_router, prefix="/api")
 app.include_router(vehicle_router, prefix="/api/vendors", tags=["vehicles"])
 app.include_router(driver_router, prefix="/api/vendors", tags=["drivers"])
@@ -151,4 +195,8 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+# Time spent importing this module, routes and their dependencies included
+IMPORT_SECONDS = time.perf_counter() - _import_started
\ No newline at end of file
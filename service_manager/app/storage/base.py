@@ -0,0 +1,77 @@
+# app/storage/base.py
+"""
+Content-addressed document storage.
+
+A document is stored once under the SHA-256 of its bytes,
+
+    blobs/3f/3fa94c...e1.pdf
+
+so re-uploading the same file (a driver's licence sent again with every
+profile edit) writes nothing new. The key is what the database stores; it is
+the same for every backend, and `url()` turns it into a download URL the
+client fetches directly from the backend.
+
+Blobs can be shared by several rows and are never deleted by the API.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from app.utils.uploads import copy_chunks
+
+BLOB_PREFIX = "blobs/"
+
+EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+}
+
+
+# Exactly what blob_key() produces; anything else never reaches a backend
+BLOB_KEY_RE = re.compile(
+    r"blobs/(?P<dir>[0-9a-f]{2})/(?P=dir)[0-9a-f]{62}(?:%s)?"
+    % "|".join(re.escape(extension) for extension in sorted(set(EXTENSIONS.values())))
+)
+
+
+def blob_key(sha256: str, extension: str = "") -> str:
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256}{extension}"
+
+
+def is_blob_key(value: Optional[str]) -> bool:
+    return bool(value) and BLOB_KEY_RE.fullmatch(value) is not None
+
+
+def hash_file(source: BinaryIO, max_bytes: int):
+    """(sha256 hex, size) of a seekable file; raises UploadTooLarge past max_bytes"""
+    digest = hashlib.sha256()
+    size = copy_chunks(source, None, max_bytes, digest)
+    source.seek(0)
+    return digest.hexdigest(), size
+
+
+@dataclass(frozen=True)
+class StoredDocument:
+    key: str
+    size: int
+    content_type: str
+    created: bool  # False when the same content was already stored
+
+
+class DocumentStorage:
+    """Backend interface; the methods block and are run in the threadpool"""
+
+    def put(self, source: BinaryIO, content_type: str, max_bytes: int) -> StoredDocument:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def url(self, key: str, expires_in: Optional[int] = None) -> str:
+        raise NotImplementedError
@@ -0,0 +1,222 @@
+# app/storage/derivatives.py
+"""
+Resized variants of stored images (driver photos).
+
+The admin UI lists drivers with their photos; the originals are phone
+pictures of several MB. Each image blob has derivatives:
+
+    thumb  fits 160x160, for lists
+    web    fits 1024x1024, for the profile view
+
+rendered as JPEG with the EXIF orientation applied and metadata stripped.
+They are generated when the photo is uploaded (`warm_derivatives`) or on the
+first request, and cached on disk under DERIVATIVE_CACHE_DIR. The cache is
+bounded by DERIVATIVE_CACHE_MAX_MB: when it grows past the limit the least
+recently used files are evicted until it is back under 90% of it.
+
+A blob key names immutable content, so a derivative never changes: its ETag
+is derived from the key and the variant spec, and it can be cached forever
+by clients. Derivative URLs are "api/images/<variant>/<key>", served by
+app.api.routes.images.
+
+Pillow is optional; without it no derivative URLs are produced. It is
+imported on the first render.
+"""
+import importlib.util
+import io
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.storage.base import is_blob_key
+from app.storage.documents import get_storage
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_CACHE_DIR = Path(os.getenv(
+    "DERIVATIVE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fleet-image-derivatives")
+))
+DERIVATIVE_CACHE_MAX_MB = int(os.getenv("DERIVATIVE_CACHE_MAX_MB", "512"))
+DERIVATIVE_URL_PREFIX = os.getenv("DERIVATIVE_URL_PREFIX", "api/images").rstrip("/")
+# Larger sources are refused rather than decoded (decompression bombs)
+DERIVATIVE_MAX_SOURCE_PIXELS = int(os.getenv("DERIVATIVE_MAX_SOURCE_PIXELS", str(50_000_000)))
+
+IMAGE_EXTENSIONS = (".jpg", ".png")
+
+
+@dataclass(frozen=True)
+class Variant:
+    name: str
+    size: Tuple[int, int]
+    quality: int
+    version: int = 1  # bump to regenerate after changing the spec
+
+    def etag(self, key: str) -> str:
+        return f'"{Path(key).stem}-{self.name}-{self.size[0]}x{self.size[1]}-q{self.quality}-v{self.version}"'
+
+
+VARIANTS: Dict[str, Variant] = {
+    "thumb": Variant("thumb", (160, 160), quality=75),
+    "web": Variant("web", (1024, 1024), quality=82),
+}
+
+
+class DerivativeNotAvailable(Exception):
+    pass
+
+
+def is_image_key(value: Optional[str]) -> bool:
+    return is_blob_key(value) and value.endswith(IMAGE_EXTENSIONS)
+
+
+def derivative_url(value: Optional[str], variant: str) -> Optional[str]:
+    if not PILLOW_AVAILABLE or not is_image_key(value):
+        return None
+    return f"{DERIVATIVE_URL_PREFIX}/{variant}/{value}"
+
+
+def add_derivative_urls(rows: List[dict], derivatives: Dict[str, Tuple[str, str]]) -> List[dict]:
+    """
+    Adds derivative URL fields to response dicts, in place, from the document
+    keys still in them: {"photo_thumb_url": ("photo_url", "thumb"), ...}
+    """
+    present = {name: spec for name, spec in derivatives.items() if rows and spec[0] in rows[0]}
+    for row in rows:
+        for name, (field, variant) in present.items():
+            row[name] = derivative_url(row[field], variant)
+    return rows
+
+
+def render(source: bytes, variant: Variant) -> bytes:
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(source)) as image:
+        if image.width * image.height > DERIVATIVE_MAX_SOURCE_PIXELS:
+            raise DerivativeNotAvailable(f"source image is {image.width}x{image.height}")
+        # Let the JPEG decoder downscale while decoding (much cheaper than a full decode)
+        image.draft("RGB", (variant.size[0] * 2, variant.size[1] * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail(variant.size, Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=variant.quality, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+class DerivativeCache:
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(DerivativeCache, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.root = DERIVATIVE_CACHE_DIR
+        self.max_bytes = DERIVATIVE_CACHE_MAX_MB * 1024 * 1024
+        self.lock = threading.Lock()
+        self.size = None  # bytes on disk, computed on first write
+        self.__initialized = True
+
+    def path(self, key: str, variant: Variant) -> Path:
+        stem = Path(key).stem
+        return self.root / variant.name / stem[:2] / f"{stem}-v{variant.version}.jpg"
+
+    def get(self, key: str, variant_name: str) -> Tuple[Path, str]:
+        """(file, ETag) of a derivative, rendering it on a miss"""
+        variant = VARIANTS.get(variant_name)
+        if not PILLOW_AVAILABLE or variant is None or not is_image_key(key):
+            raise DerivativeNotAvailable(f"no {variant_name} derivative for {key}")
+        path = self.path(key, variant)
+        try:
+            os.utime(path)  # recency for eviction
+            return path, variant.etag(key)
+        except FileNotFoundError:
+            pass
+
+        storage = get_storage()
+        if not storage.exists(key):
+            raise DerivativeNotAvailable(f"{key} is not stored")
+        with storage.open(key) as source:
+            data = render(source.read(), variant)
+        self._write(path, data)
+        return path, variant.etag(key)
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, part_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(part_path, path)
+        with self.lock:
+            if self.size is None:
+                self.size = self._disk_usage()
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict(keep=str(path))
+
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".jpg"):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self, keep: str):
+        # Shared by the workers: rescan the directory rather than trusting our own count
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            if path == keep:  # about to be served
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+                evicted += 1
+            except FileNotFoundError:
+                pass
+        self.size = total
+        logger.info(f"Derivative cache evicted {evicted} files, {total / 1024 / 1024:.1f} MB left")
+
+
+def get_derivative_cache() -> DerivativeCache:
+    return DerivativeCache()
+
+
+def warm_derivatives(key: Optional[str]):
+    """Renders every variant of a freshly stored image (run as a background task)"""
+    if not PILLOW_AVAILABLE or not is_image_key(key):
+        return
+    cache = get_derivative_cache()
+    for name in VARIANTS:
+        try:
+            cache.get(key, name)
+        except Exception as e:
+            logger.warning(f"Could not render {name} derivative of {key}: {e}")
@@ -0,0 +1,75 @@
+# app/storage/documents.py
+"""
+Driver and vehicle documents: where uploads are stored and how the stored
+keys become download URLs.
+
+STORAGE_BACKEND selects the backend: "local" (default, app.storage.local)
+or "s3" (app.storage.s3, also for MinIO). Routes store an upload with
+
+    key = await store_document(file)
+
+and keep `key` in the *_url column. Responses pass every document column
+through `document_url()`: blob keys become backend URLs (pre-signed with S3),
+anything else, such as paths saved before the document store, is returned as
+stored.
+"""
+import logging
+import os
+import threading
+from typing import Iterable, List, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.storage.base import DocumentStorage, is_blob_key
+from app.utils.uploads import UploadTooLarge, too_large
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+
+_storage: Optional[DocumentStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> DocumentStorage:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == "s3":
+                    from app.storage.s3 import S3Storage
+                    _storage = S3Storage()
+                else:
+                    from app.storage.local import LocalStorage
+                    _storage = LocalStorage()
+                logger.info(f"Document storage backend: {type(_storage).__name__}")
+    return _storage
+
+
+async def store_document(file: UploadFile, max_size_mb: float = 5) -> str:
+    """Stores a validated upload (see app.utils.uploads.validate_upload); returns its key"""
+    try:
+        stored = await run_in_threadpool(
+            get_storage().put, file.file, file.content_type, int(max_size_mb * 1024 * 1024)
+        )
+    except UploadTooLarge:
+        raise too_large(file, max_size_mb)
+    if not stored.created:
+        logger.info(f"{file.filename} is already stored as {stored.key}")
+    return stored.key
+
+
+def document_url(value: Optional[str]) -> Optional[str]:
+    if not is_blob_key(value):
+        return value
+    return get_storage().url(value)
+
+
+def resolve_document_urls(rows: List[dict], fields: Iterable[str]) -> List[dict]:
+    """Replaces the document keys of response dicts with URLs, in place"""
+    present = [name for name in fields if rows and name in rows[0]]
+    for row in rows:
+        for name in present:
+            row[name] = document_url(row[name])
+    return rows
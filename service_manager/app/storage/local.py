@@ -0,0 +1,63 @@
+# app/storage/local.py
+"""
+Local-disk backend: blobs under LOCAL_STORAGE_ROOT, the directory app.main
+serves at /uploaded_files (or a reverse proxy in front of it). URLs are the
+same relative paths the API returned before, e.g.
+"uploaded_files/blobs/3f/3fa9...e1.pdf"; they are not signed.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from app.storage.base import BLOB_PREFIX, EXTENSIONS, DocumentStorage, StoredDocument, blob_key
+from app.utils.uploads import UPLOAD_FILE_MODE, copy_chunks
+
+LOCAL_STORAGE_ROOT = os.getenv(
+    "LOCAL_STORAGE_ROOT", str(Path(__file__).resolve().parent.parent / "uploaded_files")
+)
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "uploaded_files").rstrip("/")
+
+
+class LocalStorage(DocumentStorage):
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, base_url: str = LOCAL_STORAGE_URL):
+        self.root = Path(root)
+        self.base_url = base_url
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, source: BinaryIO, content_type: str, max_bytes: int) -> StoredDocument:
+        # Hash while writing a temp file in the blob tree, then rename it to its key
+        blobs = self.root / BLOB_PREFIX
+        blobs.mkdir(parents=True, exist_ok=True)
+        fd, part_path = tempfile.mkstemp(dir=blobs, suffix=".part")
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, "wb") as out:
+                size = copy_chunks(source, out, max_bytes, digest)
+            key = blob_key(digest.hexdigest(), EXTENSIONS.get(content_type, ""))
+            path = self._path(key)
+            if path.exists():
+                os.unlink(part_path)
+                return StoredDocument(key, size, content_type, created=False)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(part_path, UPLOAD_FILE_MODE)
+            os.replace(part_path, path)
+            return StoredDocument(key, size, content_type, created=True)
+        except BaseException:
+            try:
+                os.unlink(part_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def url(self, key: str, expires_in: Optional[int] = None) -> str:
+        return f"{self.base_url}/{key}"
@@ -0,0 +1,100 @@
+# app/storage/s3.py
+"""
+S3-compatible backend (AWS S3, MinIO) for STORAGE_BACKEND=s3.
+
+Documents are uploaded with their content type and an immutable cache
+header, since a key never changes content. `url()` returns a pre-signed GET
+URL valid for S3_PRESIGN_EXPIRES_SECONDS, so clients download straight from
+the bucket. When the API reaches the store on an internal address (a MinIO
+container), S3_PUBLIC_ENDPOINT_URL is the address clients use; URLs are
+signed for that host.
+
+Signed URLs are cached for half their lifetime: a list of drivers signs each
+document once per window rather than once per request.
+
+boto3 is only needed with this backend.
+"""
+import os
+import threading
+from typing import BinaryIO, Optional
+
+from cachetools import TTLCache
+
+from app.storage.base import EXTENSIONS, DocumentStorage, StoredDocument, blob_key, hash_file
+
+S3_BUCKET = os.getenv("S3_BUCKET", "fleet-documents")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # None for AWS
+S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL") or S3_ENDPOINT_URL
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+S3_PRESIGN_EXPIRES_SECONDS = int(os.getenv("S3_PRESIGN_EXPIRES_SECONDS", "3600"))
+
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _client(endpoint_url: Optional[str]):
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        region_name=S3_REGION,
+        aws_access_key_id=S3_ACCESS_KEY_ID,
+        aws_secret_access_key=S3_SECRET_ACCESS_KEY,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+    )
+
+
+class S3Storage(DocumentStorage):
+    def __init__(self, bucket: str = S3_BUCKET, endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 public_endpoint_url: Optional[str] = S3_PUBLIC_ENDPOINT_URL,
+                 expires_in: int = S3_PRESIGN_EXPIRES_SECONDS):
+        self.bucket = bucket
+        self.client = _client(endpoint_url)
+        self.signer = self.client if public_endpoint_url == endpoint_url else _client(public_endpoint_url)
+        self.expires_in = expires_in
+        self.urls = TTLCache(maxsize=20000, ttl=max(expires_in // 2, 1))
+        self.lock = threading.Lock()
+
+    def put(self, source: BinaryIO, content_type: str, max_bytes: int) -> StoredDocument:
+        sha256, size = hash_file(source, max_bytes)
+        key = blob_key(sha256, EXTENSIONS.get(content_type, ""))
+        if self.exists(key):
+            return StoredDocument(key, size, content_type, created=False)
+        self.client.upload_fileobj(
+            source, self.bucket, key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": CACHE_CONTROL},
+        )
+        return StoredDocument(key, size, content_type, created=True)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+
+    def url(self, key: str, expires_in: Optional[int] = None) -> str:
+        if expires_in is not None:
+            return self._sign(key, expires_in)
+        with self.lock:
+            url = self.urls.get(key)
+        if url is None:
+            url = self._sign(key, self.expires_in)
+            with self.lock:
+                self.urls[key] = url
+        return url
+
+    def _sign(self, key: str, expires_in: int) -> str:
+        return self.signer.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_in
+        )
@@ -0,0 +1,311 @@
+"""
+Query plan regression check for the hot booking, route, employee and fleet
+queries.
+
+Seeds a realistic volume of data (one scratch tenant with its departments,
+employees, shifts, vendors, vehicles, drivers, bookings, routes and stops),
+runs EXPLAIN (FORMAT JSON) for each hot query and exits non-zero when any of
+them falls back to a sequential scan on one of the large tables.
+
+Everything happens in one transaction that is rolled back at the end, so the
+target database is left untouched. Run it against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m app.testing.query_plans
+    python -m app.testing.query_plans --employees 20000 --days 90 --verbose
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.dialects import postgresql
+
+# Tables large enough that a sequential scan is a regression
+WATCHED_TABLES = {
+    "bookings", "shift_routes", "shift_route_stops", "employees", "vehicles", "drivers",
+}
+# Partitions count as their parent table
+PARTITION_SUFFIX = re.compile(r"_(y\d{4}m\d{2}|default)$")
+
+# Existing data is ignored; the scratch tenant gets its own, prefixed rows
+SEED_SQL = [
+    """
+    INSERT INTO tenants (tenant_name, address, latitude, longitude, is_active)
+    VALUES (:prefix || 'tenant', 'Office', '12.97', '77.59', 1)
+    RETURNING tenant_id
+    """,
+    """
+    INSERT INTO departments (tenant_id, department_name)
+    SELECT :tenant_id, :prefix || 'dept-' || g FROM generate_series(1, :departments) g
+    """,
+    """
+    INSERT INTO employees (employee_code, name, email, mobile_number, hashed_password,
+                           department_id, tenant_id, address, latitude, longitude, is_active)
+    SELECT :prefix || 'emp-' || g, 'Employee ' || g, :prefix || g || '@example.com',
+           :mobile_prefix || lpad(g::text, 9, '0'), 'x',
+           (SELECT min(department_id) FROM departments WHERE tenant_id = :tenant_id) + g % :departments,
+           :tenant_id, 'Street ' || g, (12.9 + random() / 10)::text, (77.5 + random() / 10)::text,
+           g % 20 <> 0
+    FROM generate_series(1, :employees) g
+    """,
+    """
+    INSERT INTO shifts (tenant_id, shift_code, log_type, shift_time, day, weekday_mask, waiting_time_minutes,
+                        pickup_type, gender, is_active)
+    SELECT :tenant_id, :prefix || 'shift-' || g, CASE WHEN g % 2 = 0 THEN 'IN' ELSE 'OUT' END::logtype,
+           make_time(6 + g, 0, 0), '{monday,tuesday,wednesday,thursday,friday,saturday,sunday}', 127,
+           10, 'PICKUP'::pickuptype, 'ANY'::gendertype, true
+    FROM generate_series(1, :shifts) g
+    """,
+    """
+    INSERT INTO vendors (tenant_id, vendor_name, is_active)
+    SELECT :tenant_id, :prefix || 'vendor-' || g, true FROM generate_series(1, :vendors) g
+    """,
+    """
+    INSERT INTO drivers (driver_code, name, email, mobile_number, hashed_password, vendor_id, is_active)
+    SELECT :prefix || 'drv-' || g, 'Driver ' || g, :prefix || 'drv' || g || '@example.com',
+           :mobile_prefix || '9' || lpad(g::text, 8, '0'), 'x', v.vendor_id, true
+    FROM generate_series(1, :vendors * 50) g
+    JOIN (SELECT vendor_id, row_number() OVER (ORDER BY vendor_id) - 1 AS n
+          FROM vendors WHERE tenant_id = :tenant_id) v ON v.n = g % :vendors
+    """,
+    """
+    INSERT INTO vehicles (vendor_id, vehicle_code, reg_number, status)
+    SELECT v.vendor_id, :prefix || 'veh-' || g, :prefix || 'reg-' || g, true
+    FROM generate_series(1, :vendors * 50) g
+    JOIN (SELECT vendor_id, row_number() OVER (ORDER BY vendor_id) - 1 AS n
+          FROM vendors WHERE tenant_id = :tenant_id) v ON v.n = g % :vendors
+    """,
+    # Every employee books one shift on every third day of the window
+    """
+    INSERT INTO bookings (employee_id, employee_code, tenant_id, shift_id, department_id, booking_date,
+                          pickup_location, pickup_location_latitude, pickup_location_longitude,
+                          drop_location, drop_location_latitude, drop_location_longitude, status)
+    SELECT e.employee_id, e.employee_code, :tenant_id, s.id, e.department_id, d::date,
+           e.address, e.latitude, e.longitude, 'Office', '12.97', '77.59',
+           CASE WHEN e.employee_id % 10 = 0 THEN 'CANCELLED' ELSE 'CONFIRMED' END::bookingstatus
+    FROM employees e
+    JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM shifts WHERE tenant_id = :tenant_id) s
+      ON s.n = e.employee_id % :shifts
+    CROSS JOIN generate_series(CAST(:start_date AS date), CAST(:start_date AS date) + (:days - 1), interval '1 day') d
+    WHERE e.tenant_id = :tenant_id
+      AND (e.employee_id + (d::date - CAST(:start_date AS date))) % 3 = 0
+    """,
+    # Routes of four stops per shift and day
+    """
+    CREATE TEMP TABLE plan_route_bookings ON COMMIT DROP AS
+    SELECT booking_id, shift_id, booking_date, pickup_location_latitude, pickup_location_longitude,
+           (row_number() OVER (PARTITION BY shift_id, booking_date ORDER BY booking_id) - 1) / 4 + 1 AS route_number,
+           (row_number() OVER (PARTITION BY shift_id, booking_date ORDER BY booking_id) - 1) % 4 + 1 AS position
+    FROM bookings WHERE tenant_id = :tenant_id AND status <> 'CANCELLED'
+    """,
+    """
+    INSERT INTO shift_routes (shift_id, route_date, route_number, route_data, status)
+    SELECT DISTINCT shift_id, booking_date, route_number, '{}'::jsonb, 'CONFIRMED'::routestatus
+    FROM plan_route_bookings
+    """,
+    """
+    INSERT INTO shift_route_stops (shift_route_id, route_date, position, booking_id, pickup_lat, pickup_lng)
+    SELECT r.id, r.route_date, b.position, b.booking_id,
+           b.pickup_location_latitude::float, b.pickup_location_longitude::float
+    FROM plan_route_bookings b
+    JOIN shift_routes r ON r.shift_id = b.shift_id AND r.route_date = b.booking_date
+                       AND r.route_number = b.route_number
+    """,
+]
+
+
+def hot_queries(ids: dict):
+    """(name, statement) for every query the check covers"""
+    # Imported here so --help works without the application environment
+    from app.crud.bookings import active_bookings_query
+    from app.database.models import (
+        Booking, BookingStatus, Driver, Employee, RouteStatus, ShiftRoute, ShiftRouteStop, Vehicle,
+    )
+
+    day = ids["day"]
+    dates = [day + datetime.timedelta(days=offset) for offset in range(5)]
+    return [
+        ("admin shift bookings by tenant/date",
+         select(Booking.shift_id, func.count(Booking.booking_id))
+         .where(Booking.tenant_id == ids["tenant_id"], Booking.booking_date == day)
+         .group_by(Booking.shift_id)),
+        ("admin shift booking details by shift/date",
+         select(Booking)
+         .where(Booking.shift_id == ids["shift_id"], Booking.booking_date == day)
+         .order_by(Booking.booking_id).limit(50)),
+        ("employee booking existence check",
+         active_bookings_query(ids["employee_id"], ids["shift_id"], dates)),
+        ("employee upcoming bookings",
+         select(Booking)
+         .where(Booking.employee_id == ids["employee_id"], Booking.booking_date >= day)
+         .order_by(Booking.booking_date)),
+        ("roster import live bookings",
+         select(Booking.employee_id, Booking.shift_id, Booking.booking_date).where(
+             Booking.employee_id.in_(ids["employee_ids"]),
+             Booking.shift_id.in_([ids["shift_id"]]),
+             Booking.booking_date.between(dates[0], dates[-1]),
+             Booking.status != BookingStatus.CANCELLED,
+         )),
+        ("routes by shift/date",
+         select(ShiftRoute)
+         .where(ShiftRoute.shift_id == ids["shift_id"], ShiftRoute.status == RouteStatus.CONFIRMED,
+                ShiftRoute.route_date == day)
+         .order_by(ShiftRoute.route_date.desc(), ShiftRoute.route_number.asc())),
+        ("route stops by route",
+         select(ShiftRouteStop)
+         .where(ShiftRouteStop.route_date == day, ShiftRouteStop.shift_route_id.in_(ids["route_ids"]))
+         .order_by(ShiftRouteStop.shift_route_id, ShiftRouteStop.position)),
+        ("confirmed bookings on routes",
+         select(ShiftRouteStop.booking_id)
+         .join(ShiftRoute, (ShiftRouteStop.shift_route_id == ShiftRoute.id)
+               & (ShiftRouteStop.route_date == ShiftRoute.route_date))
+         .where(ShiftRoute.shift_id == ids["shift_id"], ShiftRoute.route_date == day,
+                ShiftRouteStop.route_date == day, ShiftRoute.status == RouteStatus.CONFIRMED,
+                ShiftRouteStop.booking_id.in_(ids["booking_ids"]))),
+        ("employees by department",
+         select(Employee)
+         .where(Employee.department_id == ids["department_id"], Employee.tenant_id == ids["tenant_id"],
+                Employee.is_active.is_(True))
+         .order_by(Employee.employee_id).limit(10)),
+        ("vehicles by vendor",
+         select(Vehicle).where(Vehicle.vendor_id == ids["vendor_id"])),
+        ("drivers by vendor",
+         select(Driver).where(Driver.vendor_id == ids["vendor_id"])),
+    ]
+
+
+def seed(connection, args) -> dict:
+    params = {
+        "prefix": f"qp-{uuid.uuid4().hex[:8]}-",
+        # Mobile columns are short: a numeric run id keeps them unique
+        "mobile_prefix": str(random.randint(10000, 99999)),
+        "departments": args.departments,
+        "employees": args.employees,
+        "shifts": args.shifts,
+        "vendors": args.vendors,
+        "days": args.days,
+        "start_date": datetime.date.today(),
+    }
+    started = time.perf_counter()
+    params["tenant_id"] = connection.execute(text(SEED_SQL[0]), params).scalar()
+    for statement in SEED_SQL[1:]:
+        connection.execute(text(statement), params)
+    for table in sorted(WATCHED_TABLES):
+        connection.execute(text(f"ANALYZE {table}"))
+
+    tenant_id = params["tenant_id"]
+    day = params["start_date"] + datetime.timedelta(days=args.days // 2)
+    scalar = lambda sql, **kw: connection.execute(text(sql), {"t": tenant_id, "d": day, **kw}).scalar()
+    ids = {
+        "tenant_id": tenant_id,
+        "day": day,
+        "shift_id": scalar("SELECT min(id) FROM shifts WHERE tenant_id = :t"),
+        "department_id": scalar("SELECT min(department_id) FROM departments WHERE tenant_id = :t"),
+        "vendor_id": scalar("SELECT min(vendor_id) FROM vendors WHERE tenant_id = :t"),
+    }
+    ids["employee_id"] = scalar(
+        "SELECT min(employee_id) FROM bookings WHERE tenant_id = :t AND shift_id = :s", s=ids["shift_id"]
+    )
+    ids["employee_ids"] = list(connection.execute(
+        text("SELECT employee_id FROM employees WHERE tenant_id = :t ORDER BY employee_id LIMIT 500"),
+        {"t": tenant_id},
+    ).scalars())
+    ids["route_ids"] = list(connection.execute(
+        text("SELECT id FROM shift_routes WHERE shift_id = :s AND route_date = :d ORDER BY id LIMIT 200"),
+        {"s": ids["shift_id"], "d": day},
+    ).scalars())
+    ids["booking_ids"] = list(connection.execute(
+        text("SELECT booking_id FROM bookings WHERE shift_id = :s AND booking_date = :d LIMIT 500"),
+        {"s": ids["shift_id"], "d": day},
+    ).scalars())
+
+    counts = {
+        table: connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+        for table in sorted(WATCHED_TABLES)
+    }
+    print(f"Seeded in {time.perf_counter() - started:.1f}s: " + ", ".join(f"{t}={n}" for t, n in counts.items()))
+    return ids
+
+
+def watched_table(relation: str):
+    """The watched table a scanned relation belongs to, if any"""
+    table = PARTITION_SUFFIX.sub("", relation or "")
+    return table if table in WATCHED_TABLES else None
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(connection, statement) -> dict:
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    raw = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+
+def check_plans(connection, ids: dict, verbose: bool = False) -> list:
+    failures = []
+    # Scanning an empty partition (months ahead, default) costs nothing
+    empty = set(connection.execute(
+        text("SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples = 0")
+    ).scalars())
+    for name, statement in hot_queries(ids):
+        plan = explain(connection, statement)
+        nodes = list(plan_nodes(plan))
+        seq_scans = sorted({
+            node["Relation Name"] for node in nodes
+            if node["Node Type"] == "Seq Scan" and watched_table(node.get("Relation Name"))
+            and node["Relation Name"] not in empty
+        })
+        scans = ", ".join(
+            f"{node['Node Type']}({node.get('Index Name') or node.get('Relation Name')})"
+            for node in nodes if "Scan" in node["Node Type"]
+        )
+        status = "FAIL" if seq_scans else "ok"
+        print(f"[{status:>4}] {name}: {scans}")
+        if verbose:
+            print(json.dumps(plan, indent=2))
+        if seq_scans:
+            failures.append((name, seq_scans))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--departments", type=int, default=20)
+    parser.add_argument("--shifts", type=int, default=8)
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    engine = create_engine(args.database_url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            ids = seed(connection, args)
+            failures = check_plans(connection, ids, args.verbose)
+        finally:
+            transaction.rollback()
+
+    if failures:
+        for name, tables in failures:
+            print(f"Sequential scan on {', '.join(tables)} in: {name}")
+        sys.exit(1)
+    print("All hot queries use indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark of the JSON response paths for list endpoints.
+
+Builds N vehicle rows shaped like the ORM objects `get_vehicles` loads and
+times, per row, each way of turning them into a response body:
+
+  validated + response_model   VehicleOut(...) per row, then FastAPI's
+                               response_model validation and Pydantic JSON
+                               dump (the previous get_vehicles path)
+  validated + jsonable_encoder VehicleOut(...) per row, jsonable_encoder and
+                               stdlib json (routes without a response_model)
+  construct + json_response    VehicleOut.model_construct(...) per row,
+                               rendered by FastJSONResponse
+  trusted + json_response      trusted(VehicleOut, row) dicts rendered by
+                               FastJSONResponse, no validation (hot routes)
+  dicts + jsonable_encoder     plain dicts, jsonable_encoder, stdlib json
+  dicts + FastJSONResponse     plain dicts, jsonable_encoder, orjson
+                               (routes without a response_model)
+
+With --http the response_model and trusted paths are also timed end to end
+through a small FastAPI app (TestClient, no database).
+
+    python -m app.testing.serialization_bench
+    python -m app.testing.serialization_bench --rows 1000 --repeat 50 --http
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+from types import SimpleNamespace
+from typing import List
+
+
+def make_rows(count: int) -> list:
+    today = datetime.date.today()
+    rows = []
+    for n in range(count):
+        rows.append(SimpleNamespace(
+            vehicle_id=n + 1, vendor_id=n % 20 + 1, vehicle_code=f"VEH-{n:05d}", reg_number=f"KA01AB{n:04d}",
+            vehicle_type_id=n % 5 + 1, driver_id=n + 1000 if n % 3 else None, status=bool(n % 2),
+            description=None if n % 4 else f"Vehicle {n}",
+            rc_expiry_date=today + datetime.timedelta(days=n % 365), insurance_expiry_date=today,
+            permit_expiry_date=None, pollution_expiry_date=today, fitness_expiry_date=None, tax_receipt_date=today,
+            rc_card_url=f"/uploaded_files/rc/{n}.pdf", insurance_url=None, permit_url=None, pollution_url=None,
+            fitness_url=None, tax_receipt_url=None,
+            vehicle_type=SimpleNamespace(name="Sedan"), vendor=SimpleNamespace(vendor_name=f"Vendor {n % 20}"),
+            driver=SimpleNamespace(name=f"Driver {n}") if n % 3 else None,
+        ))
+    return rows
+
+
+def extra_fields(v) -> dict:
+    return {
+        "vehicle_type_name": v.vehicle_type.name if v.vehicle_type else None,
+        "vendor_name": v.vendor.vendor_name if v.vendor else None,
+        "driver_name": v.driver.name if v.driver else None,
+        "contract_type": None,
+        "garage_name": None,
+    }
+
+
+def paths():
+    """(name, function rows -> bytes) for every path compared"""
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    from app.api.schemas.schemas import VehicleOut
+    from app.utils.serialization import dumps, json_response, trusted
+
+    fields = [name for name in VehicleOut.model_fields if name not in extra_fields(make_rows(1)[0])]
+    response_model = TypeAdapter(List[VehicleOut])
+
+    def validated(rows):
+        return [VehicleOut(**{name: getattr(v, name) for name in fields}, **extra_fields(v)) for v in rows]
+
+    def as_dicts(rows):
+        return [{**{name: getattr(v, name) for name in fields}, **extra_fields(v)} for v in rows]
+
+    return [
+        ("validated + response_model",
+         lambda rows: response_model.dump_json(response_model.validate_python(validated(rows)))),
+        ("validated + jsonable_encoder",
+         lambda rows: json.dumps(jsonable_encoder(validated(rows))).encode("utf-8")),
+        ("construct + json_response",
+         lambda rows: json_response([
+             VehicleOut.model_construct(**{name: getattr(v, name) for name in fields}, **extra_fields(v))
+             for v in rows
+         ]).body),
+        ("trusted + json_response",
+         lambda rows: json_response([trusted(VehicleOut, v, **extra_fields(v)) for v in rows]).body),
+        ("dicts + jsonable_encoder",
+         lambda rows: json.dumps(jsonable_encoder(as_dicts(rows))).encode("utf-8")),
+        ("dicts + FastJSONResponse",
+         lambda rows: dumps(jsonable_encoder(as_dicts(rows)))),
+    ]
+
+
+def http_paths():
+    from fastapi import FastAPI
+    from fastapi.datastructures import Default
+    from fastapi.testclient import TestClient
+
+    from app.api.schemas.schemas import VehicleOut
+    from app.utils.serialization import FastJSONResponse, json_response, trusted
+
+    fields = [name for name in VehicleOut.model_fields if name not in extra_fields(make_rows(1)[0])]
+    state = {}
+    app = FastAPI(default_response_class=Default(FastJSONResponse))
+
+    @app.get("/validated", response_model=List[VehicleOut])
+    def validated():
+        return [VehicleOut(**{name: getattr(v, name) for name in fields}, **extra_fields(v)) for v in state["rows"]]
+
+    @app.get("/trusted", response_model=List[VehicleOut])
+    def trusted_rows():
+        return json_response([trusted(VehicleOut, v, **extra_fields(v)) for v in state["rows"]])
+
+    client = TestClient(app)
+
+    def call(path):
+        def run(rows):
+            state["rows"] = rows
+            return client.get(path).content
+        return run
+
+    return [("http validated + response_model", call("/validated")), ("http trusted + json_response", call("/trusted"))]
+
+
+def bench(function, rows, repeat: int) -> float:
+    """Median microseconds per row"""
+    function(rows)  # warm up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(rows)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--http", action="store_true", help="also time end to end through a FastAPI app")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    candidates = paths() + (http_paths() if args.http else [])
+    outputs = {}
+    print(f"{args.rows} rows, median of {args.repeat} runs")
+    for name, function in candidates:
+        per_row = bench(function, rows, args.repeat)
+        outputs[name] = json.loads(function(rows))
+        print(f"{name:34} {per_row:8.2f} us/row {per_row * args.rows / 1000:8.2f} ms/response")
+
+    # Every path must produce the same document
+    reference = outputs[candidates[0][0]]
+    for name, output in outputs.items():
+        if output != reference:
+            raise SystemExit(f"{name} differs from {candidates[0][0]}")
+
+
+if __name__ == "__main__":
+    main()
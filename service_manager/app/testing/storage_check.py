@@ -0,0 +1,83 @@
+"""
+Smoke check of the document store configured by STORAGE_BACKEND.
+
+Stores a generated PDF twice (the second put must be deduplicated), fetches
+it through the URL clients would get and compares the bytes, and checks that
+an upload over the size limit is rejected without leaving a blob behind.
+Exits non-zero on any failure.
+
+Against a local MinIO (`minio server /data`, bucket created beforehand):
+
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 S3_BUCKET=fleet-documents \\
+    S3_ACCESS_KEY_ID=minioadmin S3_SECRET_ACCESS_KEY=minioadmin \\
+        python -m app.testing.storage_check
+
+With the local backend the URL is relative, so pass --base-url of a running
+API to fetch it (otherwise the file is read from disk).
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+import uuid
+
+
+def fetch(url: str, base_url: str) -> bytes:
+    import requests
+
+    if not url.startswith(("http://", "https://")):
+        url = f"{base_url.rstrip('/')}/{url}"
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--base-url", help="API base URL for relative (local backend) URLs")
+    args = parser.parse_args()
+
+    from app.storage.base import blob_key
+    from app.storage.documents import document_url, get_storage
+    from app.utils.uploads import UploadTooLarge
+
+    storage = get_storage()
+    # Unique content so the first put really writes
+    body = b"%PDF-1.4\n%" + uuid.uuid4().hex.encode() + os.urandom(args.size_kb * 1024)
+    max_bytes = len(body) + 1
+    failures = []
+
+    first = storage.put(io.BytesIO(body), "application/pdf", max_bytes)
+    second = storage.put(io.BytesIO(body), "application/pdf", max_bytes)
+    print(f"{type(storage).__name__}: stored {first.key} ({first.size} bytes)")
+    if not first.created or second.created or first.key != second.key:
+        failures.append("second put of the same content was not deduplicated")
+
+    url = document_url(first.key)
+    print(f"url: {url}")
+    if url.startswith(("http://", "https://")) or args.base_url:
+        content = fetch(url, args.base_url or "")
+    else:
+        with storage.open(first.key) as stored:
+            content = stored.read()
+    if content != body:
+        failures.append("downloaded content differs from the upload")
+
+    oversized = body + b"more"
+    try:
+        storage.put(io.BytesIO(oversized), "application/pdf", max_bytes)
+        failures.append("upload over the size limit was accepted")
+    except UploadTooLarge:
+        if storage.exists(blob_key(hashlib.sha256(oversized).hexdigest(), ".pdf")):
+            failures.append("rejected upload left a blob behind")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# app/utils/access_log.py
+"""
+One structured access-log line per request, as a pure ASGI middleware.
+
+    {"type": "access", "method": "GET", "path": "/api/vendors/vehicles/", "status": 200,
+     "duration_ms": 12.4, "bytes": 5312, "client": "10.0.0.7"}
+
+Unlike a `BaseHTTPMiddleware` it does not wrap the request in an extra task
+or re-stream the response body; it only watches the `http.response.*`
+messages go by. Successful requests faster than ACCESS_LOG_SLOW_MS are
+sampled with ACCESS_LOG_SAMPLE_RATE; errors and slow requests are always
+logged. Paths in ACCESS_LOG_SKIP_PATHS (health checks) are not logged.
+"""
+import logging
+import os
+import random
+import time
+
+from app.utils.serialization import dumps
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+ACCESS_LOG_SKIP_PATHS = frozenset(
+    path.strip() for path in os.getenv("ACCESS_LOG_SKIP_PATHS", "/health").split(",") if path.strip()
+)
+
+logger = logging.getLogger("app.access")
+
+
+class AccessLogMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in ACCESS_LOG_SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        response = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._log(scope, response, (time.perf_counter() - started) * 1000)
+
+    def _log(self, scope, response: dict, duration_ms: float):
+        status = response["status"]
+        if status < 400 and duration_ms < ACCESS_LOG_SLOW_MS and random.random() >= ACCESS_LOG_SAMPLE_RATE:
+            return
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        client = scope.get("client")
+        line = {
+            "type": "access",
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope["query_string"].decode("latin-1") or None,
+            "status": status,
+            "duration_ms": round(duration_ms, 1),
+            "bytes": response["bytes"],
+            "client": client[0] if client else None,
+        }
+        level = logging.ERROR if status >= 500 else logging.WARNING if duration_ms >= ACCESS_LOG_SLOW_MS else logging.INFO
+        logger.log(level, dumps(line).decode("utf-8"))
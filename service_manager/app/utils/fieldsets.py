@@ -0,0 +1,114 @@
+# app/utils/fieldsets.py
+"""
+Sparse fieldsets for list endpoints: `?fields=name,mobile_number,is_active`.
+
+A `Fieldset` maps every field of a response model to the SQL expression that
+produces it (a dict of expressions for a nested object). The endpoint parses
+the requested fields, selects only their columns, plus the lookup tables those
+columns come from, and turns each row into a dict of exactly those fields,
+ready for `json_response`. Without `fields` the full response model is
+returned, as before.
+
+    names = DRIVER_FIELDS.parse(fields)
+    statement = DRIVER_FIELDS.select(names).where(Driver.vendor_id == vendor_id)
+    return json_response(DRIVER_FIELDS.rows(names, db.execute(statement)))
+
+The route's `response_model` keeps documenting the full shape; it is not
+applied to the sparse rows.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. name,mobile_number,is_active; all when omitted"
+
+
+def _entity(expression) -> Optional[type]:
+    # The mapped class of an ORM attribute; None for literals
+    return getattr(expression, "class_", None)
+
+
+class Fieldset:
+    def __init__(self, model: Type[BaseModel], base: type, columns: Dict[str, Any],
+                 joins: Optional[Dict[type, Any]] = None, always: Sequence[str] = ()):
+        """
+        `columns` maps each field of `model` to an expression on `base` or on
+        one of the entities in `joins` (entity -> ON clause), which are joined
+        only when a selected column needs them. `always` fields are returned
+        whatever is asked for (the row key).
+        """
+        missing = set(model.model_fields) - set(columns)
+        if missing:
+            raise ValueError(f"Fieldset for {model.__name__} has no column for {sorted(missing)}")
+        self.model = model
+        self.base = base
+        self.columns = columns
+        self.joins = joins or {}
+        self.always = tuple(always)
+
+    def parse(self, fields: Optional[str]) -> List[str]:
+        """Requested field names in response model order; every field when blank"""
+        if not fields or not fields.strip():
+            return list(self.columns)
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(requested - set(self.columns))
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(self.columns)}",
+            )
+        requested.update(self.always)
+        return [name for name in self.columns if name in requested]
+
+    def _expressions(self, names: Sequence[str]) -> list:
+        expressions = []
+        for name in names:
+            spec = self.columns[name]
+            if isinstance(spec, dict):
+                expressions.extend(expression for expression in spec.values())
+            else:
+                expressions.append(spec)
+        return expressions
+
+    def select(self, names: Sequence[str], *inner_joins: type) -> Select:
+        """
+        SELECT of the columns behind `names`. Entities in `inner_joins` (e.g.
+        needed by a filter) are inner joined; other lookups the columns need
+        are outer joined.
+        """
+        expressions = self._expressions(names)
+        statement = select(*expressions).select_from(self.base)
+        needed = [entity for entity in self.joins if entity in inner_joins]
+        needed += [
+            entity for entity in self.joins
+            if entity not in needed and any(_entity(expression) is entity for expression in expressions)
+        ]
+        for entity in needed:
+            statement = statement.join(entity, self.joins[entity], isouter=entity not in inner_joins)
+        return statement
+
+    def rows(self, names: Sequence[str], result) -> List[dict]:
+        """Result rows of `select(names)` as response dicts"""
+        layout = []
+        for name in names:
+            spec = self.columns[name]
+            layout.append((name, tuple(spec) if isinstance(spec, dict) else None))
+        if all(nested is None for _, nested in layout):
+            return [dict(zip(names, row)) for row in result]
+
+        items = []
+        for row in result:
+            values = iter(row)
+            item = {}
+            for name, nested in layout:
+                if nested is None:
+                    item[name] = next(values)
+                else:
+                    nested_values = {key: next(values) for key in nested}
+                    # An outer-joined object that is absent comes back as all NULLs
+                    item[name] = nested_values if any(v is not None for v in nested_values.values()) else None
+            items.append(item)
+        return items
@@ -0,0 +1,144 @@
+# app/utils/job_store.py
+"""
+Status records for background jobs (bulk imports, roster uploads).
+
+A job is a small JSON document (kind, tenant, status, progress counters) plus
+a per-row report (rejected rows, or every row's outcome). Records live in Redis for JOB_TTL_SECONDS so any
+worker can answer status polls; without Redis they are kept in process.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from cachetools import TTLCache
+
+from common_utils.auth.token_validation import RedisTokenManager, USE_REDIS
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+JOB_PREFIX = "job:"
+JOB_REPORT_PREFIX = "job_report:"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class JobStore:
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(JobStore, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.jobs = TTLCache(maxsize=1000, ttl=JOB_TTL_SECONDS)
+        self.reports = TTLCache(maxsize=1000, ttl=JOB_TTL_SECONDS)
+        self.lock = threading.Lock()
+        self.__initialized = True
+
+    def _client(self):
+        if not USE_REDIS:
+            return None
+        manager = RedisTokenManager()
+        return manager.client if manager.is_available() else None
+
+    def create(self, kind: str, tenant_id: int, filename: Optional[str] = None) -> dict:
+        now = datetime.utcnow().isoformat()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "tenant_id": tenant_id,
+            "filename": filename,
+            "status": JOB_QUEUED,
+            "total_rows": None,
+            "processed_rows": 0,
+            "created_rows": 0,
+            "rejected_rows": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        self._save(job)
+        return job
+
+    def _save(self, job: dict):
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(f"{JOB_PREFIX}{job['job_id']}", json.dumps(job, default=str), ex=JOB_TTL_SECONDS)
+                return
+            except Exception as e:
+                logger.error(f"Error saving job {job['job_id']} to Redis: {str(e)}")
+        with self.lock:
+            self.jobs[job["job_id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        client = self._client()
+        if client is not None:
+            try:
+                raw = client.get(f"{JOB_PREFIX}{job_id}")
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                logger.error(f"Error loading job {job_id} from Redis: {str(e)}")
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        # Only the worker running the job writes to it, so read-modify-write is safe
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        job["updated_at"] = datetime.utcnow().isoformat()
+        if fields.get("status") in (JOB_COMPLETED, JOB_FAILED):
+            job["finished_at"] = job["updated_at"]
+        self._save(job)
+        return job
+
+    def append_report(self, job_id: str, rows: List[dict]):
+        """Append rows to the job's report"""
+        if not rows:
+            return
+        client = self._client()
+        if client is not None:
+            try:
+                key = f"{JOB_REPORT_PREFIX}{job_id}"
+                pipe = client.pipeline()
+                pipe.rpush(key, *[json.dumps(row, default=str) for row in rows])
+                pipe.expire(key, JOB_TTL_SECONDS)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.error(f"Error saving job {job_id} report to Redis: {str(e)}")
+        with self.lock:
+            self.reports.setdefault(job_id, []).extend(rows)
+
+    def get_report(self, job_id: str) -> List[dict]:
+        client = self._client()
+        if client is not None:
+            try:
+                raw = client.lrange(f"{JOB_REPORT_PREFIX}{job_id}", 0, -1)
+                if raw:
+                    return [json.loads(item) for item in raw]
+            except Exception as e:
+                logger.error(f"Error loading job {job_id} report from Redis: {str(e)}")
+        with self.lock:
+            return list(self.reports.get(job_id, []))
+
+
+def get_job_store() -> JobStore:
+    return JobStore()
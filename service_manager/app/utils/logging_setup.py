@@ -0,0 +1,100 @@
+# app/utils/logging_setup.py
+"""
+Process-wide logging: records are queued by the request path and written by
+a background thread.
+
+`configure_logging()` puts a single `QueueHandler` on the root logger; a
+`QueueListener` thread formats the records and writes them to stderr, so a
+slow terminal or log collector never blocks a request. uvicorn's own loggers
+are routed through the same queue.
+
+Chatty loggers can be sampled per logger with LOG_SAMPLING, e.g.
+
+    LOG_SAMPLING="uvicorn=0.01,app.api.routes.booking=0.25"
+
+keeps 1% of the INFO/DEBUG records logged directly on "uvicorn" (the
+permission checker) and a quarter of the booking routes'. Warnings and errors
+are never sampled out.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "uvicorn=0.01")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_listener: Optional[QueueListener] = None
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """"name=rate,name=rate" -> {name: rate}; malformed entries are ignored"""
+    rates = {}
+    for item in (value or "").split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a `rate` fraction of the records below WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord):
+        # A full queue drops the record rather than stalling the request
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_logging():
+    """Idempotent; called once at application import"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_NonBlockingQueueHandler(records)]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn writes to its own stream handlers; send them through the queue too
+    for name in ("uvicorn", "uvicorn.error"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers[:] = []
+        uvicorn_logger.propagate = True
+
+    for name, rate in parse_sampling(LOG_SAMPLING).items():
+        if rate < 1.0:
+            logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+
+def stop_logging():
+    """Flushes the queue; called on shutdown"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
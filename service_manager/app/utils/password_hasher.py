@@ -0,0 +1,261 @@
+# app/utils/password_hasher.py
+"""
+Password hashing offloaded to a dedicated process pool.
+
+bcrypt is deliberately CPU-expensive; running it on the request threadpool
+lets a login storm starve every other endpoint. All hashing and verification
+goes through `PasswordHasher`, which
+  * runs the work in a small process pool (PASSWORD_HASH_WORKERS),
+  * bounds how many operations may be queued (PASSWORD_HASH_MAX_PENDING) and
+    answers 503 instead of piling up requests when it is saturated,
+  * records latency metrics for every operation,
+  * transparently upgrades legacy sha256 hashes, and bcrypt hashes made with
+    a lower cost than configured, on successful verification.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import bcrypt
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+# Cost used for bulk imports; such hashes are upgraded on first login
+PASSWORD_BCRYPT_BULK_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_BULK_ROUNDS", str(PASSWORD_BCRYPT_ROUNDS)))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+# bcrypt only looks at the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+
+# ---------------------------------------------------------------------------
+# Worker functions (run inside the process pool, so they must stay top-level)
+# ---------------------------------------------------------------------------
+
+def _is_bcrypt_hash(hashed: str) -> bool:
+    return hashed.startswith(("$2a$", "$2b$", "$2y$"))
+
+
+def _bcrypt_rounds(hashed: str) -> int:
+    return int(hashed.split("$")[2])
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    secret = password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+    return bcrypt.hashpw(secret, bcrypt.gensalt(rounds)).decode("ascii")
+
+
+def _verify_password(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, upgraded_hash); upgraded_hash is None when no upgrade is due"""
+    if not hashed:
+        return False, None
+
+    if _is_bcrypt_hash(hashed):
+        secret = password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+        if not bcrypt.checkpw(secret, hashed.encode("ascii")):
+            return False, None
+        if _bcrypt_rounds(hashed) < rounds:
+            return True, _hash_password(password, rounds)
+        return True, None
+
+    # Legacy unsalted sha256 hex digests (common_utils.auth.utils.hash_password)
+    legacy = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    if not hmac.compare_digest(legacy, hashed):
+        return False, None
+    return True, _hash_password(password, rounds)
+
+
+def _timed(fn, *args):
+    """Runs in the pool: (result, seconds spent hashing), to tell queueing from work"""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class HashingMetrics:
+    """
+    Per-operation latency metrics. The queue wait is everything but the
+    hashing itself: waiting for a pending slot, for a free pool process, and
+    the round trip to it.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.lock = threading.Lock()
+        self.window = window
+        self.operations = {}
+        self.rejected = 0
+
+    def record(self, operation: str, wait_seconds: float, total_seconds: float, count: int = 1):
+        with self.lock:
+            stats = self.operations.setdefault(operation, {
+                "count": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "recent": deque(maxlen=self.window),
+                "recent_wait": deque(maxlen=self.window),
+            })
+            stats["count"] += count
+            stats["total_seconds"] += total_seconds
+            stats["max_seconds"] = max(stats["max_seconds"], total_seconds)
+            stats["recent"].append(total_seconds)
+            stats["recent_wait"].append(wait_seconds)
+
+    def record_rejection(self):
+        with self.lock:
+            self.rejected += 1
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            operations = {}
+            for name, stats in self.operations.items():
+                recent = list(stats["recent"])
+                recent_wait = list(stats["recent_wait"])
+                operations[name] = {
+                    "count": stats["count"],
+                    "avg_ms": round(stats["total_seconds"] / stats["count"] * 1000, 2) if stats["count"] else 0.0,
+                    "max_ms": round(stats["max_seconds"] * 1000, 2),
+                    "p50_ms": round(self._percentile(recent, 50) * 1000, 2),
+                    "p95_ms": round(self._percentile(recent, 95) * 1000, 2),
+                    "p99_ms": round(self._percentile(recent, 99) * 1000, 2),
+                    "p95_queue_wait_ms": round(self._percentile(recent_wait, 95) * 1000, 2),
+                }
+            return {"operations": operations, "rejected": self.rejected}
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+class PasswordHasher:
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(PasswordHasher, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.rounds = PASSWORD_BCRYPT_ROUNDS
+        self.bulk_rounds = PASSWORD_BCRYPT_BULK_ROUNDS
+        self.workers = PASSWORD_HASH_WORKERS
+        self.slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+        self.metrics = HashingMetrics()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.__initialized = True
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the app never forks processes
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                    logger.info(f"Password hashing pool started with {self.workers} worker(s)")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, operation: str, fn, *args, count: int = 1):
+        started = time.perf_counter()
+        if not self.slots.acquire(timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+            self.metrics.record_rejection()
+            logger.warning(f"Password hashing pool saturated; rejecting {operation}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            result, hashing_seconds = self.executor.submit(_timed, fn, *args).result()
+        finally:
+            self.slots.release()
+        total = time.perf_counter() - started
+        self.metrics.record(operation, total - hashing_seconds, total, count)
+        return result
+
+    def hash(self, password: str) -> str:
+        return self._run("hash", _hash_password, password, self.rounds)
+
+    def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password against a stored hash.
+
+        Returns (valid, new_hash). When new_hash is not None the caller should
+        persist it in place of the stored hash.
+        """
+        return self._run("verify", _verify_password, password, hashed or "", self.rounds)
+
+    def hash_many(self, passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+        """
+        Hash a batch of passwords (bulk imports).
+
+        The batch is submitted one pool-width at a time so interactive logins
+        can interleave instead of queueing behind thousands of rows.
+        """
+        rounds = rounds or self.bulk_rounds
+        hashed = []
+        for start in range(0, len(passwords), self.workers):
+            batch = passwords[start:start + self.workers]
+            started = time.perf_counter()
+            if not self.slots.acquire(timeout=PASSWORD_HASH_QUEUE_TIMEOUT * 6):
+                self.metrics.record_rejection()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Password hashing service is busy. Please try again shortly.",
+                )
+            try:
+                results = list(self.executor.map(_timed, [_hash_password] * len(batch), batch, [rounds] * len(batch)))
+            finally:
+                self.slots.release()
+            hashed.extend(result for result, _ in results)
+            total = time.perf_counter() - started
+            # The batch runs in parallel: its slowest hash is the work part
+            self.metrics.record("hash_batch", total - max(seconds for _, seconds in results), total, len(batch))
+        return hashed
+
+    async def ahash(self, password: str) -> str:
+        """Async variant for coroutine endpoints; waits off the event loop"""
+        return await asyncio.to_thread(self.hash, password)
+
+    async def averify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        return await asyncio.to_thread(self.verify_and_update, password, hashed)
+
+    async def ahash_many(self, passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+        return await asyncio.to_thread(self.hash_many, passwords, rounds)
+
+
+def get_password_hasher() -> PasswordHasher:
+    return PasswordHasher()
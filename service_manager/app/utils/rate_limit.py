@@ -0,0 +1,238 @@
+# app/utils/rate_limit.py
+"""
+Token-bucket rate limiting for expensive endpoints.
+
+Usage:
+
+    @router.post("/login", dependencies=[Depends(RateLimiter("login", 10, 60, scope="ip"))])
+
+allows bursts of 10 requests per client IP, refilled at 10 per 60 seconds.
+Buckets live in Redis (one hash per bucket, updated atomically by a Lua
+script using the Redis clock) so every worker shares them; when Redis is not
+configured or not reachable an in-process bucket is used instead. The Redis
+call runs in the threadpool, and the shared client's short socket timeouts
+(REDIS_SOCKET_TIMEOUT) make a slow Redis fall back quickly instead of
+holding up the request.
+
+Limits can be overridden without a deploy through RATE_LIMIT_<NAME>, e.g.
+RATE_LIMIT_LOGIN="20/60" (capacity/seconds), and RATE_LIMIT_ENABLED=0 turns
+limiting off entirely. Rejected requests get 429 with a Retry-After header.
+"""
+import hashlib
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from common_utils.auth.token_validation import RedisTokenManager, USE_REDIS
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").strip() == "1"
+# Only trust X-Forwarded-For when running behind our own proxy
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0").strip() == "1"
+# After a Redis failure, stay on local buckets for this long before retrying
+REDIS_RETRY_SECONDS = 30
+
+SCOPES = ("route", "ip", "login", "user", "tenant")
+AUTH_SCOPES = ("user", "tenant")
+
+# KEYS[1] = bucket key; ARGV = capacity, refill rate (tokens/s), cost
+# Returns {allowed, retry_after_seconds, remaining_tokens}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after), tostring(tokens)}
+"""
+
+
+class TokenBucketStore:
+    """Shared bucket state: Redis when available, otherwise in-process"""
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super(TokenBucketStore, cls).__new__(cls)
+            cls._instance.__initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.local_buckets = TTLCache(maxsize=100_000, ttl=3600)
+        self.lock = threading.Lock()
+        self.script = None
+        self.redis_down_until = 0.0
+        self.__initialized = True
+
+    def _redis_script(self):
+        if not USE_REDIS or time.monotonic() < self.redis_down_until:
+            return None
+        if self.script is None:
+            manager = RedisTokenManager()
+            if not manager.is_available():
+                return None
+            self.script = manager.client.register_script(TOKEN_BUCKET_LUA)
+        return self.script
+
+    def consume(self, key: str, capacity: int, rate: float, cost: int = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens from a bucket. Returns (allowed, retry_after_seconds)."""
+        script = self._redis_script()
+        if script is not None:
+            try:
+                allowed, retry_after, _ = script(keys=[key], args=[capacity, rate, cost])
+                return bool(int(allowed)), float(retry_after)
+            except Exception as e:
+                logger.error(f"Rate limiter falling back to local buckets: {str(e)}")
+                self.redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+        return self._consume_local(key, capacity, rate, cost)
+
+    async def aconsume(self, key: str, capacity: int, rate: float, cost: int = 1) -> Tuple[bool, float]:
+        """consume() for coroutines: the Redis round trip runs in the threadpool"""
+        if self._redis_script() is None:
+            return self._consume_local(key, capacity, rate, cost)
+        return await run_in_threadpool(self.consume, key, capacity, rate, cost)
+
+    def _consume_local(self, key: str, capacity: int, rate: float, cost: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self.lock:
+            tokens, ts = self.local_buckets.get(key, (float(capacity), now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            if tokens >= cost:
+                self.local_buckets[key] = (tokens - cost, now)
+                return True, 0.0
+            self.local_buckets[key] = (tokens, now)
+            return False, (cost - tokens) / rate
+
+
+def _parse_override(name: str, capacity: int, per_seconds: float) -> Tuple[int, float]:
+    override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if not override:
+        return capacity, per_seconds
+    try:
+        new_capacity, new_seconds = override.split("/")
+        return int(new_capacity), float(new_seconds)
+    except ValueError:
+        logger.error(f"Ignoring malformed RATE_LIMIT_{name.upper()}={override!r}; expected capacity/seconds")
+        return capacity, per_seconds
+
+
+class RateLimiter:
+    """
+    FastAPI dependency enforcing a token bucket per route and scope.
+
+    scope:
+        route  - one bucket shared by every caller
+        ip     - per client address
+        login  - per client address and submitted `username` form field
+        user   - per authenticated user (employee_id, else user_id)
+        tenant - per tenant of the authenticated caller
+
+    The user and tenant scopes key on the verified token data, so they need
+    the route's auth dependency: pass the same instance the endpoint uses,
+
+        auth = PermissionChecker(["cutoff.create"])
+
+        @router.post("/...", dependencies=[Depends(RateLimiter("x", 10, 60, scope="tenant", auth=auth))])
+        def endpoint(token_data: dict = Depends(auth)): ...
+
+    and FastAPI resolves it once per request. Nothing the client chooses
+    (device ids, unverified token claims) ever selects a bucket.
+    """
+
+    def __init__(self, name: str, capacity: int, per_seconds: float, scope: str = "ip",
+                 auth: Optional[Callable] = None):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown rate limit scope {scope!r}; expected one of {SCOPES}")
+        if scope in AUTH_SCOPES and auth is None:
+            raise ValueError(f"Rate limit scope {scope!r} needs the route's auth dependency")
+        self.name = name
+        self.scope = scope
+        self.capacity, per_seconds = _parse_override(name, capacity, per_seconds)
+        self.rate = self.capacity / per_seconds
+
+        # What FastAPI injects into __call__
+        parameters = [inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request)]
+        if auth is not None:
+            parameters.append(inspect.Parameter(
+                "token_data", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=Depends(auth), annotation=dict
+            ))
+        self.__signature__ = inspect.Signature(parameters)
+
+    async def __call__(self, request: Request, token_data: Optional[dict] = None):
+        if not RATE_LIMIT_ENABLED:
+            return
+
+        identity = await self._identity(request, token_data)
+        key = f"ratelimit:{self.name}:{self.scope}:{identity}"
+        allowed, retry_after = await TokenBucketStore().aconsume(key, self.capacity, self.rate)
+
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {self.name} ({self.scope}={identity})")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    async def _identity(self, request: Request, token_data: Optional[dict]) -> str:
+        if self.scope == "route":
+            return "all"
+        if self.scope == "ip":
+            return _client_ip(request)
+        if self.scope == "login":
+            username = None
+            if request.headers.get("content-type", "").startswith(
+                ("application/x-www-form-urlencoded", "multipart/form-data")
+            ):
+                # Starlette caches the parsed form, so the endpoint reuses it
+                username = (await request.form()).get("username")
+            return f"ip:{_client_ip(request)}:user:{_digest(str(username or '').strip().lower())}"
+
+        token_data = token_data if isinstance(token_data, dict) else {}
+        if self.scope == "user":
+            for claim in ("employee_id", "user_id"):
+                if token_data.get(claim) not in (None, ""):
+                    return f"{claim}:{token_data[claim]}"
+        elif token_data.get("tenant_id") not in (None, ""):
+            return f"tenant:{token_data['tenant_id']}"
+        return f"ip:{_client_ip(request)}"
+
+
+def _client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:24]
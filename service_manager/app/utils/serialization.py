@@ -0,0 +1,116 @@
+# app/utils/serialization.py
+"""
+Fast JSON responses.
+
+`FastJSONResponse` renders with orjson when it is installed (stdlib json
+otherwise) and is the application's default response class. It is
+registered as a default (`Default(FastJSONResponse)` in app.main), so routes
+with a `response_model` keep FastAPI's own path, which validates the result
+and dumps it straight to JSON bytes with Pydantic; routes returning plain
+data are rendered by `FastJSONResponse`.
+
+Hot list endpoints skip Pydantic altogether:
+
+    return json_response([trusted(VehicleOut, vehicle, vendor_name=...) for vehicle in vehicles])
+
+`trusted` takes the fields of the response model from a row of our own
+database without validating them, and `json_response` returns an already
+rendered response, which FastAPI sends as is: the `response_model` of the
+route then only documents the schema. Only use it for data whose types
+already match the model.
+
+`trusted` returns a plain dict rather than a `model_construct` instance:
+with pydantic-core, constructing models in Python costs more than
+validating them, while orjson serializes dicts natively
+(see app.testing.serialization_bench).
+"""
+import datetime
+import decimal
+import enum
+import json
+import uuid
+from typing import Any, Dict, Optional, Tuple, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+_MISSING = object()
+# Model class -> ((field name, default or _MISSING), ...)
+_MODEL_FIELDS: Dict[type, Tuple[Tuple[str, Any], ...]] = {}
+
+
+def json_default(value: Any):
+    """Types orjson does not handle natively"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_default(value: Any):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime.datetime):
+        if value.utcoffset() == datetime.timedelta(0):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return json_default(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # UTC as "Z", like Pydantic
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_stdlib_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    """Rendered response; FastAPI skips response_model validation for it"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def _model_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, Any], ...]:
+    fields = _MODEL_FIELDS.get(model)
+    if fields is None:
+        fields = _MODEL_FIELDS[model] = tuple(
+            (name, _MISSING if field.is_required() else field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+        )
+    return fields
+
+
+def trusted(model: Type[BaseModel], source: Any = None, **values) -> dict:
+    """
+    The fields of `model` as a dict, without validation: each one is taken
+    from `values`, else from the attribute of the same name on `source` (an
+    ORM row), else from the field default. Nested models are passed in
+    `values` as trusted dicts themselves.
+    """
+    row = {}
+    for name, default in _model_fields(model):
+        value = values.get(name, _MISSING)
+        if value is _MISSING and source is not None:
+            value = getattr(source, name, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise TypeError(f"No value for required field {model.__name__}.{name}")
+            value = default
+        row[name] = value
+    return row
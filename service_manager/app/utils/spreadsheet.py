@@ -0,0 +1,181 @@
+# app/utils/spreadsheet.py
+"""
+Streaming readers for uploaded spreadsheets (.xlsx, .xls, .csv).
+
+Uploads are first copied to a temporary file (`save_upload`) so they can be
+processed after the request returns. Rows are then read lazily: openpyxl in
+read-only mode for .xlsx, the csv module for .csv. The legacy binary .xls
+format is only readable through pandas, which loads the whole sheet.
+"""
+import csv
+import logging
+import math
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+# Spreadsheet row numbers start at 1 and row 1 is the header
+FIRST_DATA_ROW = 2
+
+
+def save_upload(file: UploadFile, allowed_extensions: Sequence[str], prefix: str = "upload_") -> str:
+    """Copy an upload to a temporary file and return its path"""
+    filename = file.filename or ""
+    if not filename.lower().endswith(tuple(allowed_extensions)):
+        logger.warning(f"Invalid file format: {filename}")
+        allowed = ", ".join(allowed_extensions)
+        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {allowed}")
+
+    suffix = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix=prefix) as target:
+        shutil.copyfileobj(file.file, target, length=1024 * 1024)
+        return target.name
+
+
+def is_blank(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return isinstance(value, str) and not value.strip()
+
+
+def cell_text(value) -> Optional[str]:
+    """Cell as stripped text; Excel turns codes like 1001 into 1001.0"""
+    if is_blank(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def cell_date(value) -> Optional[date]:
+    """Date cells, or YYYY-MM-DD text; raises ValueError otherwise"""
+    if is_blank(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+
+
+def check_columns(columns: List[Optional[str]], required_columns: Sequence[str]):
+    missing_cols = [col for col in required_columns if col not in columns]
+    if missing_cols:
+        logger.warning(f"Missing required columns: {missing_cols}")
+        raise HTTPException(status_code=422, detail=f"Missing required columns: {missing_cols}")
+
+
+def _normalise_header(header) -> List[Optional[str]]:
+    return [str(col).strip() if col not in (None, "") else None for col in header]
+
+
+def _xlsx_rows(path: str, required_columns: Sequence[str]) -> Tuple[Optional[int], Iterator[Tuple[int, dict]]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        columns = _normalise_header(next(rows, None) or ())
+        check_columns(columns, required_columns)
+        total = sheet.max_row - 1 if sheet.max_row else None
+    except Exception:
+        workbook.close()
+        raise
+
+    def generate():
+        try:
+            for row_number, values in enumerate(rows, start=FIRST_DATA_ROW):
+                if values is None or all(value is None for value in values):
+                    continue
+                yield row_number, {col: value for col, value in zip(columns, values) if col}
+        finally:
+            workbook.close()
+
+    return total, generate()
+
+
+def _xls_rows(path: str, required_columns: Sequence[str]) -> Tuple[Optional[int], Iterator[Tuple[int, dict]]]:
+    # openpyxl cannot read the legacy binary format
+    import pandas as pd
+
+    df = pd.read_excel(path, dtype=object)
+    df.columns = [str(col).strip() for col in df.columns]
+    check_columns(list(df.columns), required_columns)
+    df = df.astype(object).where(pd.notna(df), None)
+
+    def generate():
+        for offset, values in enumerate(df.itertuples(index=False, name=None)):
+            yield offset + FIRST_DATA_ROW, dict(zip(df.columns, values))
+
+    return len(df), generate()
+
+
+def _csv_rows(path: str, required_columns: Sequence[str]) -> Tuple[Optional[int], Iterator[Tuple[int, dict]]]:
+    handle = open(path, newline="", encoding="utf-8-sig")
+    try:
+        reader = csv.reader(handle)
+        columns = _normalise_header(next(reader, None) or ())
+        check_columns(columns, required_columns)
+    except Exception:
+        handle.close()
+        raise
+
+    def generate():
+        try:
+            for row_number, values in enumerate(reader, start=FIRST_DATA_ROW):
+                if not any(value.strip() for value in values):
+                    continue
+                yield row_number, {col: (value if value.strip() else None)
+                                   for col, value in zip(columns, values) if col}
+        finally:
+            handle.close()
+
+    return None, generate()
+
+
+def read_rows(path: str, required_columns: Sequence[str]) -> Tuple[Optional[int], Iterator[Tuple[int, dict]]]:
+    """
+    Returns (estimated data row count or None, iterator of (row number, row dict)).
+    Close the iterator when stopping early so the file is released.
+    """
+    lowered = path.lower()
+    if lowered.endswith(".xls"):
+        return _xls_rows(path, required_columns)
+    if lowered.endswith(".csv"):
+        return _csv_rows(path, required_columns)
+    return _xlsx_rows(path, required_columns)
+
+
+def inspect(path: str, required_columns: Sequence[str]) -> Optional[int]:
+    """Check the header row up front; returns the estimated number of data rows"""
+    lowered = path.lower()
+    if lowered.endswith(".xls"):
+        import pandas as pd
+
+        check_columns([str(col).strip() for col in pd.read_excel(path, nrows=0).columns], required_columns)
+        return None
+    if lowered.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            check_columns(_normalise_header(next(csv.reader(handle), None) or ()), required_columns)
+            # Cheap line count so progress can be reported
+            return max(0, sum(1 for _ in handle))
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None) or ()
+        check_columns(_normalise_header(header), required_columns)
+        return sheet.max_row - 1 if sheet.max_row else None
+    finally:
+        workbook.close()
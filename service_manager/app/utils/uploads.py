@@ -0,0 +1,108 @@
+# app/utils/uploads.py
+"""
+Streaming document uploads.
+
+Starlette spools multipart files to a SpooledTemporaryFile while it parses
+the request. `validate_upload` checks an upload without reading it into
+memory: the declared content type, the size Starlette counted and the magic
+bytes at the start of the file. The storage backends (app.storage) then read
+it with `copy_chunks`, one chunk at a time, enforcing the size limit again as
+they go, so memory use stays at one chunk per upload.
+"""
+import logging
+import os
+from typing import List, Optional
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_FILE_MODE = 0o644
+
+PDF_TYPES = ["application/pdf"]
+IMAGE_TYPES = ["image/jpeg", "image/jpg", "image/png"]
+
+_SNIFF_BYTES = 1024
+_ALIASES = {"image/jpg": "image/jpeg"}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Content type from the first bytes of a file, for the types we accept"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    # Readers accept the PDF header anywhere in the first 1024 bytes
+    if b"%PDF-" in head[:_SNIFF_BYTES]:
+        return "application/pdf"
+    return None
+
+
+def too_large(file: UploadFile, max_size_mb: float) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{file.filename} is too large. Max allowed size is {max_size_mb}MB."
+    )
+
+
+async def validate_upload(
+    file: Optional[UploadFile],
+    allowed_types: List[str],
+    max_size_mb: float = 5,
+    required: bool = False
+) -> Optional[UploadFile]:
+    if not file or not file.filename:
+        if required:
+            raise HTTPException(status_code=422, detail="File is required.")
+        return None
+
+    logger.info(f"Validating file: {file.filename}")
+
+    if file.content_type not in allowed_types:
+        logger.warning(f"{file.filename} has invalid type '{file.content_type}'. Allowed types: {allowed_types}")
+        raise HTTPException(
+            status_code=415,
+            detail=f"{file.filename} has invalid type '{file.content_type}'. Allowed types: {allowed_types}"
+        )
+
+    if file.size is not None and file.size > max_size_mb * 1024 * 1024:
+        raise too_large(file, max_size_mb)
+
+    await file.seek(0)
+    head = await file.read(_SNIFF_BYTES)
+    await file.seek(0)
+    declared = _ALIASES.get(file.content_type, file.content_type)
+    if sniff_content_type(head) != declared:
+        logger.warning(f"{file.filename} content does not match its declared type '{file.content_type}'")
+        raise HTTPException(
+            status_code=415,
+            detail=f"{file.filename} content does not match its declared type '{file.content_type}'."
+        )
+
+    return file
+
+
+def copy_chunks(source, out, max_bytes: int, digest=None) -> int:
+    """
+    Copies `source` from its start to `out` (None to only read it) chunk by
+    chunk, feeding `digest` (a hashlib object) on the way; raises
+    UploadTooLarge past `max_bytes`. Returns the size.
+    """
+    size = 0
+    source.seek(0)
+    while True:
+        chunk = source.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge()
+        if digest is not None:
+            digest.update(chunk)
+        if out is not None:
+            out.write(chunk)
@@ -0,0 +1,51 @@
+# app/utils/weekday_mask.py
+"""
+Shift schedules as a 7-bit weekday mask.
+
+Bit n is set when the shift runs on date.weekday() == n (Monday is bit 0,
+Sunday bit 6). `Shift.weekday_mask` stores it next to the legacy `Shift.day`
+string, so "does the shift run on all of these dates" is one AND:
+
+    mask & required == required
+
+in Python and in SQL (`Shift.weekday_mask.op("&")(required) == required`).
+"""
+import datetime
+from typing import Iterable, List
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+ALL_DAYS = (1 << len(WEEKDAYS)) - 1
+
+
+def day_bit(weekday: int) -> int:
+    return 1 << weekday
+
+
+def mask_from_names(names: Iterable[str]) -> int:
+    """Mask of weekday names ("monday", DayOfWeek.MONDAY, ...); unknown names are ignored"""
+    mask = 0
+    for name in names:
+        name = getattr(name, "value", name).strip().strip('"').lower()
+        if name in WEEKDAYS:
+            mask |= day_bit(WEEKDAYS.index(name))
+    return mask
+
+
+def mask_from_day(day: str) -> int:
+    """Mask of a `Shift.day` string: "{monday,tuesday}" or "monday,tuesday" """
+    return mask_from_names((day or "").strip("{}").split(","))
+
+
+def mask_from_dates(dates: Iterable[datetime.date]) -> int:
+    mask = 0
+    for date in dates:
+        mask |= day_bit(date.weekday())
+    return mask
+
+
+def names_from_mask(mask: int) -> List[str]:
+    return [name for index, name in enumerate(WEEKDAYS) if mask & day_bit(index)]
+
+
+def covers(mask: int, required: int) -> bool:
+    return mask & required == required
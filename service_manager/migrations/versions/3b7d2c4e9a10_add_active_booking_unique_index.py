@@ -0,0 +1,51 @@
+"""add partial unique index on active bookings
+
+Revision ID: 3b7d2c4e9a10
+Revises: 9c11e8fae11d
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d2c4e9a10'
+down_revision: Union[str, Sequence[str], None] = '9c11e8fae11d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing duplicates would block the index: keep the oldest live booking
+    # per employee/shift/date and cancel the rest.
+    op.execute("""
+        UPDATE bookings SET status = 'CANCELLED', updated_at = now()
+        WHERE booking_id IN (
+            SELECT booking_id FROM (
+                SELECT booking_id,
+                       row_number() OVER (
+                           PARTITION BY employee_id, shift_id, booking_date
+                           ORDER BY booking_id
+                       ) AS rn
+                FROM bookings
+                WHERE status <> 'CANCELLED'
+            ) ranked
+            WHERE ranked.rn > 1
+        )
+    """)
+    op.create_index(
+        'uq_bookings_employee_shift_date_active',
+        'bookings',
+        ['employee_id', 'shift_id', 'booking_date'],
+        unique=True,
+        postgresql_where=sa.text("status <> 'CANCELLED'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_bookings_employee_shift_date_active', table_name='bookings')
@@ -0,0 +1,45 @@
+"""add indexes for hot booking, route, employee and fleet filters
+
+Revision ID: 5e2f7a91c3d4
+Revises: 3b7d2c4e9a10
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2f7a91c3d4'
+down_revision: Union[str, Sequence[str], None] = '3b7d2c4e9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_bookings_shift_date', 'bookings', ['shift_id', 'booking_date']),
+    ('ix_bookings_tenant_date', 'bookings', ['tenant_id', 'booking_date']),
+    ('ix_bookings_employee_date', 'bookings', ['employee_id', 'booking_date']),
+    ('ix_shift_route_stops_booking', 'shift_route_stops', ['booking_id']),
+    ('ix_shift_route_stops_route_position', 'shift_route_stops', ['shift_route_id', 'position']),
+    ('ix_employees_tenant_department_active', 'employees', ['tenant_id', 'department_id', 'is_active']),
+    ('ix_vehicles_vendor_id', 'vehicles', ['vendor_id']),
+    ('ix_drivers_vendor_id', 'drivers', ['vendor_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps the tables writable while the indexes build; it
+    # cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,176 @@
+"""partition bookings, shift_routes and shift_route_stops by month
+
+Revision ID: 7c4a9e2b6d18
+Revises: 5e2f7a91c3d4
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import datetime
+from typing import List, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4a9e2b6d18'
+down_revision: Union[str, Sequence[str], None] = '5e2f7a91c3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Monthly partitions created ahead of today; later months are added by
+# app.database.partitions.ensure_partitions at startup
+MONTHS_AHEAD = 3
+
+BOOKING_INDEXES = [
+    ('ix_bookings_booking_id', ['booking_id']),
+    ('ix_bookings_shift_date', ['shift_id', 'booking_date']),
+    ('ix_bookings_tenant_date', ['tenant_id', 'booking_date']),
+    ('ix_bookings_employee_date', ['employee_id', 'booking_date']),
+]
+STOP_INDEXES = [
+    ('ix_shift_route_stops_booking', ['booking_id']),
+    ('ix_shift_route_stops_route_position', ['shift_route_id', 'position']),
+]
+
+
+def _month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    years, index = divmod(month.month - 1 + months, 12)
+    return datetime.date(month.year + years, index + 1, 1)
+
+
+def _create_month_partition(table: str, month: datetime.date):
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS {table}_y{month.year}m{month.month:02d} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    )
+
+
+def _create_default_partition(table: str):
+    op.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+
+def _foreign_keys(bind, table: str) -> List[Tuple[str, str]]:
+    return bind.execute(sa.text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+    """), {"table": table}).all()
+
+
+def _rebuild(bind, table: str, primary_key: List[str], partition_key: str = None,
+             keep_foreign_keys: bool = True):
+    """
+    Recreate `table` with a new primary key, optionally partitioned by month,
+    and copy its rows across. Indexes are left to the caller; outbound foreign
+    keys are carried over unless `keep_foreign_keys` is False. Foreign keys
+    pointing at the table are dropped.
+    """
+    old = f"{table}_unpartitioned" if partition_key else f"{table}_partitioned"
+    sequence = bind.execute(
+        sa.text("SELECT pg_get_serial_sequence(:table, :column)"),
+        {"table": table, "column": primary_key[0]},
+    ).scalar()
+    foreign_keys = _foreign_keys(bind, table) if keep_foreign_keys else []
+
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    # Free the constraint and index names for the new table
+    for name in bind.execute(sa.text("""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'u', 'f')
+    """), {"table": old}).scalars().all():
+        op.execute(f'ALTER TABLE {old} DROP CONSTRAINT IF EXISTS "{name}" CASCADE')
+    for name in bind.execute(
+        sa.text("SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = :table"),
+        {"table": old},
+    ).scalars().all():
+        op.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+    partition_by = f" PARTITION BY RANGE ({partition_key})" if partition_key else ""
+    op.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({', '.join(primary_key)})")
+
+    if partition_key:
+        first, last = bind.execute(sa.text(f"SELECT min({partition_key}), max({partition_key}) FROM {old}")).one()
+        this_month = _month_start(datetime.date.today())
+        month = min(_month_start(first), this_month) if first else this_month
+        last = max(_month_start(last), _add_months(this_month, MONTHS_AHEAD)) if last else \
+            _add_months(this_month, MONTHS_AHEAD)
+        while month <= last:
+            _create_month_partition(table, month)
+            month = _add_months(month, 1)
+        _create_default_partition(table)
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{primary_key[0]}")
+
+    for name, definition in foreign_keys:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+
+
+def _create_indexes():
+    for name, columns in BOOKING_INDEXES:
+        op.create_index(name, 'bookings', columns)
+    op.create_index(
+        'uq_bookings_employee_shift_date_active', 'bookings', ['employee_id', 'shift_id', 'booking_date'],
+        unique=True, postgresql_where=sa.text("status <> 'CANCELLED'"),
+    )
+    op.create_unique_constraint('uq_shift_route', 'shift_routes', ['shift_id', 'route_date', 'route_number'])
+    op.create_index('ix_shift_routes_date_shift', 'shift_routes', ['route_date', 'shift_id'])
+    for name, columns in STOP_INDEXES:
+        op.create_index(name, 'shift_route_stops', columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Copies every row in one transaction: plan a maintenance window for large tables.
+    bind = op.get_bind()
+
+    # Stops carry their route's date so they partition alongside routes and bookings
+    op.add_column('shift_route_stops', sa.Column('route_date', sa.Date(), nullable=True))
+    op.execute("""
+        UPDATE shift_route_stops s SET route_date = r.route_date
+        FROM shift_routes r WHERE r.id = s.shift_route_id
+    """)
+    op.alter_column('shift_route_stops', 'route_date', nullable=False)
+
+    _rebuild(bind, 'bookings', ['booking_id', 'booking_date'], 'booking_date')
+    _rebuild(bind, 'shift_routes', ['id', 'route_date'], 'route_date')
+    _rebuild(bind, 'shift_route_stops', ['id', 'route_date'], 'route_date', keep_foreign_keys=False)
+    _create_indexes()
+
+    op.create_foreign_key(
+        'fk_shift_route_stops_route', 'shift_route_stops', 'shift_routes',
+        ['shift_route_id', 'route_date'], ['id', 'route_date'],
+        ondelete='CASCADE',
+    )
+    op.create_foreign_key(
+        'fk_shift_route_stops_booking', 'shift_route_stops', 'bookings',
+        ['booking_id', 'route_date'], ['booking_id', 'booking_date'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    _rebuild(bind, 'shift_route_stops', ['id'], keep_foreign_keys=False)
+    _rebuild(bind, 'shift_routes', ['id'])
+    _rebuild(bind, 'bookings', ['booking_id'])
+    _create_indexes()
+
+    op.create_foreign_key(
+        'shift_route_stops_shift_route_id_fkey', 'shift_route_stops', 'shift_routes',
+        ['shift_route_id'], ['id'], ondelete='CASCADE',
+    )
+    op.create_foreign_key(
+        'fk_shift_route_stops_booking_id', 'shift_route_stops', 'bookings',
+        ['booking_id'], ['booking_id'],
+    )
+    op.drop_column('shift_route_stops', 'route_date')
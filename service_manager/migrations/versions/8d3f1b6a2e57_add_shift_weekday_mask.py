@@ -0,0 +1,42 @@
+"""add shifts.weekday_mask and backfill it from shifts.day
+
+Revision ID: 8d3f1b6a2e57
+Revises: 7c4a9e2b6d18
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f1b6a2e57'
+down_revision: Union[str, Sequence[str], None] = '7c4a9e2b6d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# `day` is "{monday,tuesday}" or "monday,tuesday", possibly with quotes and
+# spaces; bit n is date.weekday() n
+BACKFILL_SQL = "UPDATE shifts SET weekday_mask = {}".format(" | ".join(
+    f"(CASE WHEN '{name}' = ANY (string_to_array(lower(translate(trim(both '{{}}' from day), ' \"', '')), ',')) "
+    f"THEN {1 << index} ELSE 0 END)"
+    for index, name in enumerate(WEEKDAYS)
+))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('shifts', sa.Column('weekday_mask', sa.SmallInteger(), server_default=sa.text('0'), nullable=False))
+    op.execute(BACKFILL_SQL)
+    op.create_index('ix_shifts_tenant_log_type_weekday_mask', 'shifts', ['tenant_id', 'log_type', 'weekday_mask'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_shifts_tenant_log_type_weekday_mask', table_name='shifts')
+    op.drop_column('shifts', 'weekday_mask')
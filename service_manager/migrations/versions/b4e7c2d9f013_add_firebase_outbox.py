@@ -0,0 +1,44 @@
+"""add firebase_outbox for batched Realtime Database sync
+
+Revision ID: b4e7c2d9f013
+Revises: 8d3f1b6a2e57
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7c2d9f013'
+down_revision: Union[str, Sequence[str], None] = '8d3f1b6a2e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'firebase_outbox',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('path', sa.String(length=512), nullable=False),
+        sa.Column('payload', postgresql.JSONB(none_as_null=True, astext_type=sa.Text()), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_firebase_outbox_available', 'firebase_outbox', ['available_at', 'id'],
+                    postgresql_where=sa.text('available_at IS NOT NULL'))
+    op.create_index('ix_firebase_outbox_path', 'firebase_outbox', ['path', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_firebase_outbox_path', table_name='firebase_outbox')
+    op.drop_index('ix_firebase_outbox_available', table_name='firebase_outbox')
+    op.drop_table('firebase_outbox')